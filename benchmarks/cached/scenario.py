@@ -0,0 +1,33 @@
+import random
+
+import bm
+
+from ddtrace.internal.utils.cache import cached
+
+
+class Cached(bm.Scenario):
+    num_keys = bm.var(type=int)
+    maxsize = bm.var(type=int)
+    num_calls = bm.var(type=int)
+    skewed = bm.var_bool()
+
+    def run(self):
+        random.seed(1)
+        keys = ["key-%d" % i for i in range(self.num_keys)]
+        if self.skewed:
+            # Most calls use a few keys, like the services and span names of
+            # an application.
+            calls = [keys[min(int(random.paretovariate(0.5)) - 1, self.num_keys - 1)] for _ in range(self.num_calls)]
+        else:
+            calls = [random.choice(keys) for _ in range(self.num_calls)]
+
+        @cached(self.maxsize)
+        def f(key):
+            return key.upper()
+
+        def _(loops):
+            for _ in range(loops):
+                for key in calls:
+                    f(key)
+
+        yield _
@@ -1,3 +1,5 @@
+import threading
+
 import bm
 import utils
 
@@ -8,13 +10,49 @@ class Encoder(bm.Scenario):
     ntags = bm.var(type=int)
     ltags = bm.var(type=int)
     nmetrics = bm.var(type=int)
+    nsharedtags = bm.var(type=int)
     dd_origin = bm.var_bool()
     encoding = bm.var(type=str)
+    concurrent_flush = bm.var_bool()
+    nbuffers = bm.var(type=int)
+    compression = bm.var(type=str)
 
     def run(self):
-        encoder = utils.init_encoder(self.encoding)
         traces = utils.gen_traces(self)
 
+        if self.concurrent_flush:
+            # Measure the cost of put() while another thread keeps flushing the
+            # buffers, like the AgentWriter periodic thread does.
+            ring = utils.EncoderRing(self.encoding, self.nbuffers)
+            flusher = threading.Thread(target=ring.flush_forever)
+            flusher.start()
+
+            def _(loops):
+                for _ in range(loops):
+                    for trace in traces:
+                        ring.put(trace)
+
+            yield _
+
+            ring.stop()
+            flusher.join()
+            return
+
+        encoder = utils.init_encoder(self.encoding)
+
+        compress = utils.init_compressor(self.compression)
+        if compress is not None:
+            # Measure the extra CPU cost of compressing every encoded payload,
+            # to be compared with the matching uncompressed variant.
+            def _(loops):
+                for _ in range(loops):
+                    for trace in traces:
+                        encoder.put(trace)
+                        compress(encoder.encode())
+
+            yield _
+            return
+
         def _(loops):
             for _ in range(loops):
                 for trace in traces:
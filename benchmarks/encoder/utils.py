@@ -1,6 +1,9 @@
+from collections import deque
 from functools import partial
 import random
 import string
+import threading
+import zlib
 
 from ddtrace import Span
 from ddtrace import __version__ as ddtrace_version
@@ -28,6 +31,65 @@ except ImportError:
         return MSGPACK_ENCODERS[encoding]()
 
 
+def init_compressor(compression):
+    """Returns a function compressing an encoded payload the same way the
+    AgentWriter does, or ``None`` when compression is disabled.
+    """
+    if compression == "none":
+        return None
+
+    if compression == "gzip":
+
+        def _gzip(payload):
+            compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            return compressor.compress(payload) + compressor.flush()
+
+        return _gzip
+
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=1).compress
+
+    raise ValueError("unknown compression %r" % compression)
+
+
+class EncoderRing(object):
+    """Ring of encoder buffers that mimics how the AgentWriter swaps the active
+    buffer on flush when configured with more than one buffer.
+    """
+
+    def __init__(self, encoding, nbuffers):
+        self.encoder = init_encoder(encoding)
+        self.spares = deque(init_encoder(encoding) for _ in range(nbuffers - 1))
+        self._stopped = threading.Event()
+
+    def put(self, trace):
+        encoder = self.encoder
+        try:
+            encoder.put(trace)
+        except Exception:
+            # Buffer full: the trace would be dropped by the writer
+            pass
+
+    def flush(self):
+        encoder = self.encoder
+        if self.spares:
+            self.encoder = self.spares.popleft()
+        try:
+            encoder.encode()
+        finally:
+            if encoder is not self.encoder:
+                self.spares.append(encoder)
+
+    def flush_forever(self):
+        while not self._stopped.wait(0.001):
+            self.flush()
+
+    def stop(self):
+        self._stopped.set()
+
+
 def _rands(size=6, chars=string.ascii_uppercase + string.digits):
     return "".join(random.choice(chars) for _ in range(size))
 
@@ -36,6 +98,22 @@ def _random_values(k, size):
     return list(dict.fromkeys([_rands(size=size) for _ in range(k)]))
 
 
+def _shared_tags_setter(tags):
+    """Returns a function setting the given tags on spans, sharing them
+    between the spans like the tracer does for the global tags when possible.
+    """
+    try:
+        from ddtrace.internal.span_prototype import SpanPrototype
+
+        prototype = SpanPrototype(tags)
+        if hasattr(prototype, "share"):
+            return prototype.share
+    except ImportError:
+        pass
+
+    return lambda span: span.set_tags(tags)
+
+
 def gen_traces(config):
     random.seed(1)
 
@@ -48,6 +126,7 @@ def gen_traces(config):
     tag_keys = _random_values(config.ntags, 16)
     metric_keys = _random_values(config.nmetrics, 16)
     dd_origin_values = ["synthetics", "ciapp-test"]
+    set_shared_tags = _shared_tags_setter({k: _rands(size=16) for k in _random_values(config.nsharedtags, 16)})
 
     for _ in range(config.ntraces):
         trace = []
@@ -63,6 +142,8 @@ def gen_traces(config):
                     # to its children. The encoder only checks the root span's context in a trace for dd_origin, so
                     # here we need to add dd_origin to the root span's context.
                     span.context.dd_origin = random.choice(dd_origin_values)
+                if config.nsharedtags > 0:
+                    set_shared_tags(span)
                 if config.ntags > 0:
                     span.set_tags(dict(zip(tag_keys, [_rands(size=config.ltags) for _ in range(config.ntags)])))
                 if config.nmetrics > 0:
@@ -1,5 +1,6 @@
 import bm
 
+from ddtrace import config
 from ddtrace.context import Context
 from ddtrace.propagation import http
 
@@ -7,8 +8,10 @@ from ddtrace.propagation import http
 class HTTPPropagationInject(bm.Scenario):
     sampling_priority = bm.var(type=str)
     dd_origin = bm.var(type=str)
+    styles = bm.var(type=str)
 
     def run(self):
+        config._propagation_style_inject = {style.strip() for style in self.styles.split(",")}
         sampling_priority = None
         if self.sampling_priority != "":
             sampling_priority = int(self.sampling_priority)
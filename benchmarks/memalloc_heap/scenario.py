@@ -0,0 +1,27 @@
+import bm
+
+from ddtrace.profiling.collector import _memalloc
+
+
+class MemallocHeap(bm.Scenario):
+    ntracked = bm.var(type=int)
+    nobjects = bm.var(type=int)
+    heap_sample_size = bm.var(type=int)
+
+    def run(self):
+        _memalloc.start(64, 16, self.heap_sample_size)
+
+        # Keep allocations large enough to be almost all tracked by the heap profiler
+        tracked = [bytes(self.heap_sample_size * 2) for _ in range(self.ntracked)]
+        nobjects = self.nobjects
+
+        def _(loops):
+            for _ in range(loops):
+                # Most of these objects are too small to be tracked, so freeing them measures the cost of looking up
+                # untracked pointers among the tracked ones.
+                [object() for _ in range(nobjects)]
+
+        yield _
+
+        del tracked
+        _memalloc.stop()
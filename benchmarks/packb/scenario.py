@@ -0,0 +1,51 @@
+import bm
+
+from ddtrace.internal import _encoding
+
+
+def gen_payload(nitems, lvalues):
+    return [
+        {
+            u"Name": u"operation-%d" % i,
+            u"Resource": u"resource-%d" % i,
+            u"Value": u"x" * lvalues,
+            u"Hits": i,
+            u"Duration": i * 1000,
+            u"Error": i % 2 == 0,
+            u"Summary": b"s" * lvalues,
+        }
+        for i in range(nitems)
+    ]
+
+
+class Packb(bm.Scenario):
+    nitems = bm.var(type=int)
+    lvalues = bm.var(type=int)
+    api = bm.var(type=str)
+
+    def run(self):
+        payload = gen_payload(self.nitems, self.lvalues)
+
+        if self.api == "packer":
+            # A new packer for every payload
+            def _(loops):
+                for _ in range(loops):
+                    _encoding.Packer().pack(payload)
+
+        elif self.api == "packb":
+
+            def _(loops):
+                for _ in range(loops):
+                    _encoding.packb(payload)
+
+        elif self.api == "pack_into":
+            buf = bytearray(len(_encoding.packb(payload)))
+
+            def _(loops):
+                for _ in range(loops):
+                    _encoding.pack_into(payload, buf)
+
+        else:
+            raise ValueError("Unknown API: %s" % self.api)
+
+        yield _
@@ -1,10 +1,12 @@
 import itertools
 import random
+import re
 import string
 
 import bm
 
 from ddtrace import Span
+from ddtrace.sampler import DatadogSampler
 from ddtrace.sampler import SamplingRule
 
 
@@ -27,6 +29,7 @@ class SamplingRules(bm.Scenario):
     num_iterations = bm.var(type=int)
     num_services = bm.var(type=int)
     num_operations = bm.var(type=int)
+    num_rules = bm.var(type=int)
 
     def run(self):
         # Generate random service and operation names for the counts we requested
@@ -36,6 +39,26 @@ class SamplingRules(bm.Scenario):
         # Generate all possible permutations of service and operation names
         spans = [Span(service=service, name=name) for service, name in itertools.product(services, operation_names)]
 
+        if self.num_rules > 1:
+            # Let a sampler find the first matching rule among many rules
+            # matching on literal values, with a few regular expressions.
+            rules = []
+            for i in range(self.num_rules - 1):
+                if i % 10 == 0:
+                    rules.append(SamplingRule(service=re.compile("^%s" % rands(2)), sample_rate=1.0))
+                else:
+                    rules.append(SamplingRule(service=rands(), name=rands(), sample_rate=1.0))
+            rules.append(SamplingRule(service=random.choice(services), sample_rate=1.0))
+            sampler = DatadogSampler(rules=rules, rate_limit=DatadogSampler.NO_RATE_LIMIT)
+
+            def _(loops):
+                for _ in range(loops):
+                    for span in iter_n(spans, n=self.num_iterations):
+                        sampler.sample(span)
+
+            yield _
+            return
+
         # Create a single rule to use for all matches
         # Pick a random service/operation name
         rule = SamplingRule(
@@ -0,0 +1,36 @@
+import bm
+import utils
+
+from ddtrace.internal._encoding import packb
+from ddtrace.internal.processor.stats import _serialize_sketch
+
+
+class SpanStats(bm.Scenario):
+    nbuckets = bm.var(type=int)
+    nkeys = bm.var(type=int)
+    nspans = bm.var(type=int)
+    serializer = bm.var(type=str)
+
+    def run(self):
+        buckets = utils.gen_buckets(self.nbuckets, self.nkeys, self.nspans)
+        bucket_size_ns = 10 * 10 ** 9
+
+        if self.serializer == "dict":
+
+            def _(loops):
+                for _ in range(loops):
+                    packb(utils.serialize_buckets(buckets, bucket_size_ns, "hostname", "prod", "1.0"))
+
+        elif self.serializer == "encoder":
+            from ddtrace.internal._encoding import SpanStatsEncoder
+
+            encoder = SpanStatsEncoder()
+
+            def _(loops):
+                for _ in range(loops):
+                    encoder.encode(buckets, bucket_size_ns, "hostname", "prod", "1.0", _serialize_sketch)
+
+        else:
+            raise ValueError("Unknown serializer: %s" % self.serializer)
+
+        yield _
@@ -0,0 +1,78 @@
+from collections import defaultdict
+import random
+
+from ddtrace.internal.processor.stats import SpanAggrStats
+from ddtrace.internal.processor.stats import _serialize_sketch
+
+
+def gen_buckets(nbuckets, nkeys, nspans):
+    """Generate stats buckets with ``nkeys`` aggregation keys each.
+
+    Like in applications, the span names, services and types are shared by
+    many keys, while the resources are mostly distinct.
+    """
+    random.seed(1)
+    buckets = {}
+    for i in range(nbuckets):
+        bucket = defaultdict(SpanAggrStats)
+        for j in range(nkeys):
+            aggr_key = (
+                "operation-%d" % (j % 5),
+                "service-%d" % (j % 3),
+                "GET /resource/%d" % j,
+                "web" if j % 2 else "",
+                200 if j % 7 else 500,
+                False,
+            )
+            stats = bucket[aggr_key]
+            for _ in range(nspans):
+                duration = random.randint(10 ** 3, 10 ** 9)
+                stats.hits += 1
+                stats.top_level_hits += 1
+                stats.duration += duration
+                if aggr_key[4] == 500:
+                    stats.errors += 1
+                    stats.err_distribution.add(duration)
+                else:
+                    stats.ok_distribution.add(duration)
+        buckets[i * 10 ** 10] = bucket
+    return buckets
+
+
+def serialize_buckets(buckets, bucket_size_ns, hostname, env, version):
+    """Serialize the stats buckets into dictionaries, to be packed with ``packb``."""
+    serialized_buckets = []
+    for bucket_time_ns, bucket in buckets.items():
+        bucket_aggr_stats = []
+        for aggr_key, stat_aggr in bucket.items():
+            name, service, resource, _type, http_status, synthetics = aggr_key
+            serialized_bucket = {
+                u"Name": name,
+                u"Resource": resource,
+                u"Synthetics": synthetics,
+                u"HTTPStatusCode": http_status,
+                u"Hits": stat_aggr.hits,
+                u"TopLevelHits": stat_aggr.top_level_hits,
+                u"Duration": stat_aggr.duration,
+                u"Errors": stat_aggr.errors,
+                u"OkSummary": _serialize_sketch(stat_aggr.ok_distribution),
+                u"ErrorSummary": _serialize_sketch(stat_aggr.err_distribution),
+            }
+            if service:
+                serialized_bucket[u"Service"] = service
+            if _type:
+                serialized_bucket[u"Type"] = _type
+            bucket_aggr_stats.append(serialized_bucket)
+        serialized_buckets.append(
+            {
+                u"Start": bucket_time_ns,
+                u"Duration": bucket_size_ns,
+                u"Stats": bucket_aggr_stats,
+            }
+        )
+    payload = {u"Stats": serialized_buckets, u"Hostname": hostname}
+    if env:
+        payload[u"Env"] = env
+    if version:
+        payload[u"Version"] = version
+    return payload
@@ -7,6 +7,7 @@ from typing import Optional
 
 import bm
 
+from ddtrace.internal.encoding import MSGPACK_ENCODERS
 from ddtrace.internal.writer import TraceWriter
 from ddtrace.span import Span
 from ddtrace.tracer import Tracer
@@ -30,11 +31,35 @@ class NoopWriter(TraceWriter):
         pass
 
 
-@bm.register
+class EncodingWriter(NoopWriter):
+    """Writer that encodes traces like the AgentWriter does, but never sends
+    them. This makes writing a trace cost about as much as it does with the
+    default writer.
+    """
+
+    def __init__(self):
+        self._encoder = MSGPACK_ENCODERS["v0.4"](8 << 20, 8 << 20)
+
+    def recreate(self):
+        # type: () -> TraceWriter
+        return EncodingWriter()
+
+    def write(self, spans=None):
+        # type: (Optional[List[Span]]) -> None
+        if not spans:
+            return
+        try:
+            self._encoder.put(spans)
+        except Exception:
+            # Buffer full: drop the payload and start over
+            self._encoder.encode()
+
+
 class Threading(bm.Scenario):
     nthreads = bm.var(type=int)
     ntraces = bm.var(type=int)
     nspans = bm.var(type=int)
+    writer = bm.var(type=str)
 
     def create_trace(self, tracer):
         # type: (Tracer) -> None
@@ -48,8 +73,8 @@ class Threading(bm.Scenario):
         # type: () -> Generator[Callable[[int], None], None, None]
         from ddtrace import tracer
 
-        # configure global tracer to drop traces rather
-        tracer.configure(writer=NoopWriter())
+        # configure global tracer to drop traces rather than sending them to the agent
+        tracer.configure(writer=EncodingWriter() if self.writer == "encoding" else NoopWriter())
 
         def _(loops):
             # type: (int) -> None
@@ -0,0 +1,33 @@
+import threading
+
+import bm
+
+from ddtrace.profiling import recorder
+from ddtrace.profiling.collector import threading as collector_threading
+
+
+class ThreadingLock(bm.Scenario):
+    profiled = bm.var_bool()
+    capture_pct = bm.var(type=float)
+    sample_at_creation = bm.var_bool()
+    nlocks = bm.var(type=int)
+
+    def run(self):
+        if self.profiled:
+            collector = collector_threading.ThreadingLockCollector(
+                recorder.Recorder(), capture_pct=self.capture_pct, sample_at_creation=self.sample_at_creation
+            )
+            collector.start()
+
+        locks = [threading.Lock() for _ in range(self.nlocks)]
+
+        def _(loops):
+            for _ in range(loops):
+                for lock in locks:
+                    lock.acquire()
+                    lock.release()
+
+        yield _
+
+        if self.profiled:
+            collector.stop()
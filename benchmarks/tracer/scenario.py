@@ -10,14 +10,46 @@ class _DropTraces(TraceFilter):
 
 class Tracer(bm.Scenario):
     depth = bm.var(type=int)
+    nqueries = bm.var(type=int)
+    version = bm.var(type=str)
 
     def run(self):
         # configure global tracer to drop traces rather than encoded and sent to
         # an agent
+        from ddtrace import config
         from ddtrace import tracer
 
+        if self.version:
+            # The version tag is only set on the spans of the service, which
+            # requires to look up the active span
+            config.service = "bm"
+            config.version = self.version
+
         tracer.configure(settings={"FILTERS": [_DropTraces()]})
 
+        if self.nqueries:
+            # A request that runs many database queries, with tags on the
+            # tracer and on the connection like in applications
+            import sqlite3
+
+            from ddtrace import Pin
+            from ddtrace import patch
+
+            patch(sqlite3=True)
+            tracer.set_tags({"team": "backend", "region": "us-east-1"})
+            conn = sqlite3.connect(":memory:")
+            Pin.override(conn, tags={"db.instance": "main", "peer.service": "sqlite"})
+            cursor = conn.cursor()
+
+            def _(loops):
+                for _ in range(loops):
+                    with tracer.trace("web.request", service="web"):
+                        for _ in range(self.nqueries):
+                            cursor.execute("SELECT 1")
+
+            yield _
+            return
+
         def _(loops):
             for _ in range(loops):
                 spans = []
@@ -107,6 +107,14 @@ class Hooks(object):
                 self._hooks[hook].remove(func)
             except KeyError:
                 pass
+            # DEV: Hooks without functions are removed so that has_hooks stays cheap
+            if not self._hooks[hook]:
+                del self._hooks[hook]
+
+    def has_hooks(self):
+        # type: () -> bool
+        """Return whether any function is registered for any hook."""
+        return bool(self._hooks)
 
     def emit(
         self,
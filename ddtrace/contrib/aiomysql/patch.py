@@ -59,7 +59,7 @@ class AIOTracedCursor(wrapt.ObjectProxy):
         ) as s:
             s.set_tag(SPAN_MEASURED_KEY)
             s.set_tag(sql.QUERY, resource)
-            s.set_tags(pin.tags)
+            pin._get_span_prototype().apply(s)
             s.set_tags(extra_tags)
 
             # set analytics sample rate
@@ -36,7 +36,7 @@ class AIOTracedCursor(wrapt.ObjectProxy):
         with pin.tracer.trace(self._datadog_name, service=service, resource=resource, span_type=SpanTypes.SQL) as s:
             s.set_tag(SPAN_MEASURED_KEY)
             s.set_tag(sql.QUERY, resource)
-            s.set_tags(pin.tags)
+            pin._get_span_prototype().apply(s)
             s.set_tags(extra_tags)
 
             # set analytics sample rate
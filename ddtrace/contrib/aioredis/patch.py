@@ -124,7 +124,7 @@ def traced_13_execute_command(func, instance, args, kwargs):
     span.resource = query
     span.set_tag(redisx.RAWCMD, query)
     if pin.tags:
-        span.set_tags(pin.tags)
+        pin._get_span_prototype().apply(span)
 
     span.set_tags(
         {
@@ -85,7 +85,7 @@ async def _traced_query(pin, method, query, args, kwargs):
         "postgres.query", resource=query, service=ext_service(pin, config.asyncpg), span_type=SpanTypes.SQL
     ) as span:
         span.set_tag(SPAN_MEASURED_KEY)
-        span.set_tags(pin.tags)
+        pin._get_span_prototype().apply(span)
         return await method(*args, **kwargs)
 
 
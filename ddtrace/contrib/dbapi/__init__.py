@@ -70,7 +70,7 @@ class TracedCursor(wrapt.ObjectProxy):
                 s.set_tag(SPAN_MEASURED_KEY)
             # No reason to tag the query since it is set as the resource by the agent. See:
             # https://github.com/DataDog/datadog-trace-agent/blob/bda1ebbf170dd8c5879be993bdd4dbae70d10fda/obfuscate/sql.go#L232
-            s.set_tags(pin.tags)
+            pin._get_span_prototype().apply(s)
             s.set_tags(extra_tags)
 
             # set analytics sample rate if enabled but only for non-FetchTracedCursor
@@ -240,7 +240,7 @@ class TracedConnection(wrapt.ObjectProxy):
             return method(*args, **kwargs)
 
         with pin.tracer.trace(name, service=ext_service(pin, self._self_config)) as s:
-            s.set_tags(pin.tags)
+            pin._get_span_prototype().apply(s)
             s.set_tags(extra_tags)
 
             return method(*args, **kwargs)
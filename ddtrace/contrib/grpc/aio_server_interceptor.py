@@ -180,7 +180,7 @@ def _create_span(pin, handler_call_details, method_kind):
         span.set_tag(ANALYTICS_SAMPLE_RATE_KEY, sample_rate)
 
     if pin.tags:
-        span.set_tags(pin.tags)
+        pin._get_span_prototype().apply(span)
 
     return span
 
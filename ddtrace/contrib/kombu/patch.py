@@ -117,7 +117,7 @@ def traced_publish(func, instance, args, kwargs):
         s.resource = exchange_name
         s.set_tag(kombux.EXCHANGE, exchange_name)
         if pin.tags:
-            s.set_tags(pin.tags)
+            pin._get_span_prototype().apply(s)
         s.set_tag(kombux.ROUTING_KEY, get_routing_key_from_args(args))
         s.set_tags(extract_conn_tags(instance.channel.connection))
         s.set_metric(kombux.BODY_LEN, get_body_length_from_args(args))
@@ -127,7 +127,7 @@ def pytest_runtest_protocol(item, nextitem):
     ) as span:
         span.context.dd_origin = ci.CI_APP_TEST_ORIGIN
         span.context.sampling_priority = AUTO_KEEP
-        span.set_tags(pin.tags)
+        pin._get_span_prototype().apply(span)
         span.set_tag(SPAN_KIND, KIND)
         span.set_tag(test.FRAMEWORK, FRAMEWORK)
         span.set_tag(test.NAME, item.name)
@@ -35,7 +35,7 @@ def _trace_redis_cmd(pin, config_integration, instance, args):
         span.resource = query
         span.set_tag(redisx.RAWCMD, query)
         if pin.tags:
-            span.set_tags(pin.tags)
+            pin._get_span_prototype().apply(span)
         # some redis clients do not have a connection_pool attribute (ex. aioredis v1.3)
         if hasattr(instance, "connection_pool"):
             span.set_tags(_extract_conn_tags(instance.connection_pool.connection_kwargs))
@@ -24,13 +24,14 @@ from ddtrace.internal.utils.http import normalize_header_name
 from ddtrace.internal.utils.http import strip_query_string
 import ddtrace.internal.utils.wrappers
 from ddtrace.propagation.http import HTTPPropagator
+from ddtrace.settings import IntegrationConfig
 from ddtrace.vendor import wrapt
 
 
 if TYPE_CHECKING:
     from ddtrace import Span
     from ddtrace import Tracer
-    from ddtrace.settings import IntegrationConfig
+    from ddtrace.context import Context
 
 
 log = get_logger(__name__)
@@ -47,6 +48,8 @@ RESPONSE = "response"
 # starting a "new object" on the UI.
 NORMALIZE_PATTERN = re.compile(r"([^a-z0-9_\-:/]){1}")
 
+_MISSING = object()
+
 
 @cached()
 def _normalized_header_name(header_name):
@@ -79,6 +82,10 @@ def _normalize_tag_name(request_or_response, header_name):
     return "http.{}.headers.{}".format(request_or_response, normalized_name)
 
 
+# Maximum number of header names to cache the tag names of, per integration
+_HEADER_TAG_NAMES_CACHE_SIZE = 256
+
+
 def _store_headers(headers, span, integration_config, request_or_response):
     # type: (Dict[str, str], Span, IntegrationConfig, str) -> None
     """
@@ -89,7 +96,7 @@ def _store_headers(headers, span, integration_config, request_or_response):
     :param integration_config: An integration specific config object.
     :type integration_config: ddtrace.settings.IntegrationConfig
     """
-    if not isinstance(headers, dict):
+    if not hasattr(headers, "items"):
         try:
             headers = dict(headers)
         except Exception:
@@ -99,12 +106,24 @@ def _store_headers(headers, span, integration_config, request_or_response):
         log.debug("Skipping headers tracing as no integration config was provided")
         return
 
+    # DEV: The header names are matched case-insensitively with the traced
+    # headers, so the tag name of every header name is cached instead.
+    if isinstance(integration_config, IntegrationConfig):
+        tag_names = integration_config._header_tag_names_cache(request_or_response)
+    else:
+        tag_names = {}
     for header_name, header_value in headers.items():
-        tag_name = integration_config._header_tag_name(header_name)
+        tag_name = tag_names.get(header_name, _MISSING)
+        if tag_name is _MISSING:
+            tag_name = integration_config._header_tag_name(header_name)
+            # An empty tag defaults to a http.<request or response>.headers.<header name> tag
+            if tag_name == "":
+                tag_name = _normalize_tag_name(request_or_response, header_name)
+            if len(tag_names) < _HEADER_TAG_NAMES_CACHE_SIZE:
+                tag_names[header_name] = tag_name
         if tag_name is None:
             continue
-        # An empty tag defaults to a http.<request or response>.headers.<header name> tag
-        span.set_tag(tag_name or _normalize_tag_name(request_or_response, header_name), header_value)
+        span.set_tag(tag_name, header_value)
 
 
 def _store_request_headers(headers, span, integration_config):
@@ -289,10 +308,10 @@ def set_http_meta(
         span._set_str_tag(http.QUERY_STRING, query)
 
     if request_headers is not None and integration_config.is_header_tracing_configured:
-        _store_request_headers(dict(request_headers), span, integration_config)
+        _store_request_headers(request_headers, span, integration_config)
 
     if response_headers is not None and integration_config.is_header_tracing_configured:
-        _store_response_headers(dict(response_headers), span, integration_config)
+        _store_response_headers(response_headers, span, integration_config)
 
     if retries_remain is not None:
         span._set_str_tag(http.RETRIES_REMAIN, str(retries_remain))
@@ -326,11 +345,17 @@ def activate_distributed_headers(tracer, int_config=None, request_headers=None,
     int_config will be used to check if distributed trace headers context will be activated, but
     override will override whatever value is set in int_config if passed any value other than None.
     """
+    _activate_distributed_context(tracer, HTTPPropagator.extract, request_headers, int_config, override)
+
+
+def _activate_distributed_context(tracer, extract, carrier, int_config=None, override=None):
+    # type: (Tracer, Callable[[Any], Context], Any, Optional[IntegrationConfig], Optional[bool]) -> None
+    """Like ``activate_distributed_headers``, with the context extracted from the carrier with ``extract``."""
     if override is False:
         return None
 
     if override or (int_config and distributed_tracing_enabled(int_config)):
-        context = HTTPPropagator.extract(request_headers)
+        context = extract(carrier)
         # Only need to activate the new context if something was propagated
         if context.trace_id:
             tracer.context_provider.activate(context)
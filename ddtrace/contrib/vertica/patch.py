@@ -209,7 +209,7 @@ def _install_routine(patch_routine, patch_class, patch_mod, config):
             ) as span:
                 if conf.get("measured", False):
                     span.set_tag(SPAN_MEASURED_KEY)
-                span.set_tags(pin.tags)
+                pin._get_span_prototype().apply(span)
 
                 if "span_start" in conf:
                     conf["span_start"](instance, span, conf, *args, **kwargs)
@@ -109,7 +109,9 @@ class DDWSGIMiddleware(object):
                 write = start_response(status, response_headers, exc_info)
             return write
 
-        trace_utils.activate_distributed_headers(self.tracer, int_config=config.wsgi, request_headers=environ)
+        trace_utils._activate_distributed_context(
+            self.tracer, HTTPPropagator._extract_from_environ, environ, int_config=config.wsgi
+        )
 
         with self.tracer.trace(
             "wsgi.request",
@@ -135,7 +137,11 @@ class DDWSGIMiddleware(object):
             url = construct_url(environ)
             method = environ.get("REQUEST_METHOD")
             query_string = environ.get("QUERY_STRING")
-            request_headers = get_request_headers(environ)
+            # DEV: The request headers are only needed to tag them on the span
+            if config.wsgi.is_header_tracing_configured or config._appsec:
+                request_headers = get_request_headers(environ)
+            else:
+                request_headers = None
             trace_utils.set_http_meta(
                 span, config.wsgi, method=method, url=url, query=query_string, request_headers=request_headers
             )
@@ -1,4 +1,6 @@
 from typing import Any
+from typing import Callable
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Union
@@ -38,4 +40,23 @@ class MsgpackEncoderBase(BufferedEncoder):
 class MsgpackEncoderV03(MsgpackEncoderBase): ...
 class MsgpackEncoderV05(MsgpackEncoderBase): ...
 
+class SpanStatsEncoder(object):
+    def encode(
+        self,
+        buckets: Dict[int, Dict[Any, Any]],
+        bucket_size_ns: int,
+        hostname: str,
+        env: Optional[str],
+        version: Optional[str],
+        serialize_sketch: Callable[[Any], bytes],
+    ) -> bytes: ...
+
+class Packer(object):
+    def __init__(
+        self, default: Optional[Callable[[Any], Any]] = None, buf_size: int = ..., max_buf_size: int = ...
+    ) -> None: ...
+    def pack(self, obj: Any) -> bytes: ...
+    def pack_into(self, obj: Any, buffer: Union[bytearray, memoryview], offset: int = 0) -> int: ...
+
 def packb(o: Any, **kwargs) -> bytes: ...
+def pack_into(o: Any, buffer: Union[bytearray, memoryview], offset: int = 0) -> int: ...
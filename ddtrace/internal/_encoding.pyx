@@ -1,6 +1,7 @@
 from cpython cimport *
 from cpython.bytearray cimport PyByteArray_CheckExact
 from libc cimport stdint
+from libc.string cimport memcpy
 from libc.string cimport strlen
 import threading
 from ._utils cimport PyBytesLike_Check
@@ -10,6 +11,8 @@ from ddtrace.constants import ORIGIN_KEY
 
 DEF MSGPACK_ARRAY_LENGTH_PREFIX_SIZE = 5
 DEF MSGPACK_STRING_TABLE_LENGTH_PREFIX_SIZE = 6
+DEF PACKER_BUFFER_SIZE = 64 * 1024
+DEF PACKER_MAX_BUFFER_SIZE = 1024 * 1024
 
 
 cdef extern from "Python.h":
@@ -142,6 +145,17 @@ cdef inline int pack_text(msgpack_packer *pk, object text) except? -1:
     raise TypeError("Unhandled text type: %r" % type(text))
 
 
+cdef inline bint is_shadowed(object prototype, dict meta, dict metrics):
+    """Return whether some shared tags are overridden by the tags of a span."""
+    cdef frozenset keys = prototype.keys
+    return not ((not meta or keys.isdisjoint(meta)) and (not metrics or keys.isdisjoint(metrics)))
+
+
+cdef inline dict unshadowed_items(dict shared, dict meta, dict metrics):
+    """Return the shared tags that are not overridden by the tags of a span."""
+    return {k: v for k, v in shared.items() if k not in meta and k not in metrics}
+
+
 cdef class StringTable(object):
     cdef dict _table
     cdef stdint.uint32_t _next_id
@@ -204,6 +218,8 @@ cdef class MsgpackStringTable(StringTable):
     cdef int max_size
     cdef int _sp_len
     cdef stdint.uint32_t _sp_id
+    # Strings added to the table since the savepoint
+    cdef list _sp_strings
     cdef object _lock
     cdef size_t _reset_size
 
@@ -215,6 +231,7 @@ cdef class MsgpackStringTable(StringTable):
         self.max_size = max_size
         self.pk.length = MSGPACK_STRING_TABLE_LENGTH_PREFIX_SIZE
         self._sp_len = 0
+        self._sp_strings = []
         self._lock = threading.RLock()
         super(MsgpackStringTable, self).__init__()
 
@@ -228,6 +245,8 @@ cdef class MsgpackStringTable(StringTable):
     cdef insert(self, object string):
         cdef int ret
 
+        # DEV: The string is already in the table, even if it cannot be packed
+        self._sp_strings.append(string)
         if self.pk.length + len(string) > self.max_size:
             raise ValueError(
                 "Cannot insert '%s': string table is full (current size: %d, max size: %d)." % (
@@ -242,10 +261,16 @@ cdef class MsgpackStringTable(StringTable):
     cdef savepoint(self):
         self._sp_len = self.pk.length
         self._sp_id = self._next_id
+        self._sp_strings = []
 
     cdef rollback(self):
         if self._sp_len > 0:
             self.pk.length = self._sp_len
+            # DEV: Forget the strings added since the savepoint, as their ids
+            # are going to be given to other strings.
+            for string in self._sp_strings:
+                del self._table[string]
+            self._sp_strings = []
             self._next_id = self._sp_id
 
     cdef get_bytes(self):
@@ -290,6 +315,7 @@ cdef class MsgpackStringTable(StringTable):
         self._next_id = 2
         self.pk.length = self._reset_size
         self._sp_len = 0
+        self._sp_strings = []
 
     cpdef flush(self):
         with self._lock:
@@ -371,6 +397,9 @@ cdef class MsgpackEncoderBase(BufferedEncoder):
 
     cdef msgpack_packer pk
     cdef stdint.uint32_t _count
+    # Packed items of the shared tags of the spans in the buffer, by prototype
+    cdef dict _packed_meta
+    cdef dict _packed_metrics
 
     def __cinit__(self, size_t max_size, size_t max_item_size):
         cdef int buf_size = 1024*1024
@@ -400,6 +429,36 @@ cdef class MsgpackEncoderBase(BufferedEncoder):
     cdef _reset_buffer(self):
         self._count = 0
         self.pk.length = MSGPACK_ARRAY_LENGTH_PREFIX_SIZE  # Leave room for array length prefix
+        self._packed_meta = {}
+        self._packed_metrics = {}
+
+    cdef int _pack_tag_string(self, object string) except? -1:
+        return pack_text(&self.pk, string)
+
+    cdef int _pack_shared_items(self, dict items, dict packed, object prototype, bint is_meta) except? -1:
+        """Pack the items of shared tags.
+
+        If the prototype of the tags is given, the items are packed once and
+        copied for the next spans of the buffer that share them.
+        """
+        cdef int ret = 0
+        cdef size_t start = self.pk.length
+        cdef bytes b
+
+        if prototype is not None:
+            b = packed.get(prototype)
+            if b is not None:
+                return msgpack_pack_raw_body(&self.pk, <char *> b, len(b))
+
+        for k, v in items.items():
+            ret = self._pack_tag_string(k)
+            if ret != 0: return ret
+            ret = self._pack_tag_string(v) if is_meta else pack_number(&self.pk, v)
+            if ret != 0: return ret
+
+        if prototype is not None:
+            packed[prototype] = PyBytes_FromStringAndSize(self.pk.buf + start, self.pk.length - start)
+        return ret
 
     cpdef encode(self):
         with self._lock:
@@ -508,7 +567,7 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
     cdef void * get_dd_origin_ref(self, str dd_origin):
         return string_to_buff(dd_origin)
 
-    cdef inline int _pack_meta(self, object meta, char *dd_origin) except? -1:
+    cdef inline int _pack_meta(self, object meta, char *dd_origin, dict shared=None, object prototype=None) except? -1:
         cdef Py_ssize_t L
         cdef int ret
         cdef dict d
@@ -516,6 +575,8 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
         if PyDict_CheckExact(meta):
             d = <dict> meta
             L = len(d)
+            if shared is not None:
+                L += len(shared)
             if dd_origin is not NULL:
                 L += 1
             if L > ITEM_LIMIT:
@@ -528,7 +589,9 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
                     if ret != 0: break
                     ret = pack_text(&self.pk, v)
                     if ret != 0: break
-                if dd_origin is not NULL:
+                if ret == 0 and shared:
+                    ret = self._pack_shared_items(shared, self._packed_meta, prototype, True)
+                if ret == 0 and dd_origin is not NULL:
                     ret = pack_bytes(&self.pk, _ORIGIN_KEY, _ORIGIN_KEY_LEN)
                     if ret == 0:
                         ret = pack_bytes(&self.pk, dd_origin, strlen(dd_origin))
@@ -536,7 +599,7 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
 
         raise TypeError("Unhandled meta type: %r" % type(meta))
 
-    cdef inline int _pack_metrics(self, object metrics) except? -1:
+    cdef inline int _pack_metrics(self, object metrics, dict shared=None, object prototype=None) except? -1:
         cdef Py_ssize_t L
         cdef int ret
         cdef dict d
@@ -544,6 +607,8 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
         if PyDict_CheckExact(metrics):
             d = <dict> metrics
             L = len(d)
+            if shared is not None:
+                L += len(shared)
             if L > ITEM_LIMIT:
                 raise ValueError("dict is too large")
 
@@ -554,6 +619,8 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
                     if ret != 0: break
                     ret = pack_number(&self.pk, v)
                     if ret != 0: break
+                if ret == 0 and shared:
+                    ret = self._pack_shared_items(shared, self._packed_metrics, prototype, False)
             return ret
 
         raise TypeError("Unhandled metrics type: %r" % type(metrics))
@@ -564,11 +631,32 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
         cdef int has_span_type
         cdef int has_meta
         cdef int has_metrics
+        cdef dict shared_meta = None
+        cdef dict shared_metrics = None
+        cdef object meta_prototype = None
+        cdef object metrics_prototype = None
+
+        if span._exc_stack is not None:
+            span._format_exc_stack()
+
+        prototype = span._shared_tags
+        if prototype is not None:
+            # DEV: The shared tags are packed once per payload, unless some
+            # of them are overridden by the span.
+            if is_shadowed(prototype, span._meta, span._metrics):
+                shared_meta = unshadowed_items(prototype.meta, span._meta, span._metrics)
+                shared_metrics = unshadowed_items(prototype.metrics, span._meta, span._metrics)
+            else:
+                shared_meta = prototype.meta
+                shared_metrics = prototype.metrics
+                meta_prototype = metrics_prototype = prototype
 
         has_error = <bint> (span.error != 0)
         has_span_type = <bint> (span.span_type is not None)
-        has_meta = <bint> (len(span._meta) > 0 or dd_origin is not NULL)
-        has_metrics = <bint> (len(span._metrics) > 0)
+        has_meta = <bint> (
+            len(span._meta) > 0 or dd_origin is not NULL or (shared_meta is not None and len(shared_meta) > 0)
+        )
+        has_metrics = <bint> (len(span._metrics) > 0 or (shared_metrics is not None and len(shared_metrics) > 0))
 
         L = 8 + has_span_type + has_meta + has_metrics + has_error
 
@@ -630,13 +718,13 @@ cdef class MsgpackEncoderV03(MsgpackEncoderBase):
             if has_meta:
                 ret = pack_bytes(&self.pk, <char *> b"meta", 4)
                 if ret != 0: return ret
-                ret = self._pack_meta(span._meta, <char *> dd_origin)
+                ret = self._pack_meta(span._meta, <char *> dd_origin, shared_meta, meta_prototype)
                 if ret != 0: return ret
 
             if has_metrics:
                 ret = pack_bytes(&self.pk, <char *> b"metrics", 7)
                 if ret != 0: return ret
-                ret = self._pack_metrics(span._metrics)
+                ret = self._pack_metrics(span._metrics, shared_metrics, metrics_prototype)
                 if ret != 0: return ret
 
         return ret
@@ -669,16 +757,30 @@ cdef class MsgpackEncoderV05(MsgpackEncoderBase):
                 super(MsgpackEncoderV05, self).put(trace)
             except Exception:
                 self._st.rollback()
+                # DEV: The packed shared tags might refer to strings that
+                # are no longer in the table.
+                self._packed_meta = {}
+                self._packed_metrics = {}
                 raise
 
     cdef inline int _pack_string(self, object string):
         return msgpack_pack_uint32(&self.pk, self._st._index(string))
 
+    cdef int _pack_tag_string(self, object string) except? -1:
+        return self._pack_string(string)
+
     cdef void * get_dd_origin_ref(self, str dd_origin):
         return <void *> PyLong_AsLong(self._st._index(dd_origin))
 
     cdef int pack_span(self, object span, void *dd_origin) except? -1:
         cdef int ret
+        cdef Py_ssize_t L
+        cdef dict shared_meta = None
+        cdef dict shared_metrics = None
+        cdef object shared_prototype = None
+
+        if span._exc_stack is not None:
+            span._format_exc_stack()
 
         ret = msgpack_pack_array(&self.pk, 12)
         if ret != 0: return ret
@@ -714,7 +816,18 @@ cdef class MsgpackEncoderV05(MsgpackEncoderBase):
         ret = msgpack_pack_int32(&self.pk, _ if _ is not None else 0)
         if ret != 0: return ret
 
-        ret = msgpack_pack_map(&self.pk, len(span._meta) + (dd_origin is not NULL))
+        prototype = span._shared_tags
+        if prototype is not None:
+            if is_shadowed(prototype, span._meta, span._metrics):
+                shared_meta = unshadowed_items(prototype.meta, span._meta, span._metrics)
+                shared_metrics = unshadowed_items(prototype.metrics, span._meta, span._metrics)
+            else:
+                shared_meta = prototype.meta
+                shared_metrics = prototype.metrics
+                shared_prototype = prototype
+
+        L = len(span._meta) + (dd_origin is not NULL) + (len(shared_meta) if shared_meta else 0)
+        ret = msgpack_pack_map(&self.pk, L)
         if ret != 0: return ret
         if span._meta:
             for k, v in span._meta.items():
@@ -722,13 +835,17 @@ cdef class MsgpackEncoderV05(MsgpackEncoderBase):
                 if ret != 0: return ret
                 ret = self._pack_string(v)
                 if ret != 0: return ret
+        if shared_meta:
+            ret = self._pack_shared_items(shared_meta, self._packed_meta, shared_prototype, True)
+            if ret != 0: return ret
         if dd_origin is not NULL:
             ret = msgpack_pack_uint32(&self.pk, <stdint.uint32_t> 1)
             if ret != 0: return ret
             ret = msgpack_pack_uint32(&self.pk, <stdint.uint32_t> dd_origin)
             if ret != 0: return ret
         
-        ret = msgpack_pack_map(&self.pk, len(span._metrics))
+        L = len(span._metrics) + (len(shared_metrics) if shared_metrics else 0)
+        ret = msgpack_pack_map(&self.pk, L)
         if ret != 0: return ret
         if span._metrics:
             for k, v in span._metrics.items():
@@ -736,6 +853,9 @@ cdef class MsgpackEncoderV05(MsgpackEncoderBase):
                 if ret != 0: return ret
                 ret = pack_number(&self.pk, v)
                 if ret != 0: return ret
+        if shared_metrics:
+            ret = self._pack_shared_items(shared_metrics, self._packed_metrics, shared_prototype, False)
+            if ret != 0: return ret
 
         ret = self._pack_string(span.span_type)
         if ret != 0: return ret
@@ -755,6 +875,10 @@ cdef class Packer(object):
     - use_single_float is removed and assumed to be False
     - autoreset is removed and assumed to be True (bytes are always returned from pack and the buffer reset)
 
+    The internal buffer starts with ``buf_size`` bytes and grows as needed.
+    It is shrunk back after packing an object larger than ``max_buf_size``
+    bytes, so that long-lived packers do not hold on to large buffers.
+
     https://github.com/msgpack/msgpack-python/tree/v0.6.2
     """
     cdef msgpack_packer pk
@@ -762,16 +886,21 @@ cdef class Packer(object):
     cdef object _berrors
     cdef const char *encoding
     cdef const char *unicode_errors
+    cdef size_t _init_buf_size
+    cdef size_t _max_buf_size
 
-    def __cinit__(self):
-        cdef int buf_size = 1024*1024
+    def __cinit__(self, default=None, size_t buf_size=PACKER_BUFFER_SIZE, size_t max_buf_size=PACKER_MAX_BUFFER_SIZE):
+        if buf_size == 0:
+            raise ValueError("buf_size must be positive")
         self.pk.buf = <char*> PyMem_Malloc(buf_size)
         if self.pk.buf == NULL:
             raise MemoryError("Unable to allocate internal buffer.")
         self.pk.buf_size = buf_size
         self.pk.length = 0
+        self._init_buf_size = buf_size
+        self._max_buf_size = max(buf_size, max_buf_size)
 
-    def __init__(self, default=None):
+    def __init__(self, default=None, buf_size=PACKER_BUFFER_SIZE, max_buf_size=PACKER_MAX_BUFFER_SIZE):
         if default is not None:
             if not PyCallable_Check(default):
                 raise TypeError("default must be a callable.")
@@ -786,6 +915,17 @@ cdef class Packer(object):
         PyMem_Free(self.pk.buf)
         self.pk.buf = NULL
 
+    cdef void _reset(self):
+        cdef char *buf
+
+        self.pk.length = 0
+        if self.pk.buf_size > self._max_buf_size:
+            buf = <char*> PyMem_Realloc(self.pk.buf, self._init_buf_size)
+            # Keep the large buffer if it cannot be shrunk
+            if buf != NULL:
+                self.pk.buf = buf
+                self.pk.buf_size = self._init_buf_size
+
     cdef int _pack(self, object o) except -1:
         cdef long long llval
         cdef unsigned long long ullval
@@ -878,30 +1018,285 @@ cdef class Packer(object):
                 PyErr_Format(TypeError, b"can not serialize '%.200s' object", Py_TYPE(o).tp_name)
             return ret
 
-    cpdef pack(self, object obj):
+    cdef int _pack_obj(self, object obj) except -1:
         cdef int ret
         try:
             ret = self._pack(obj)
         except:
-            self.pk.length = 0
-
+            self._reset()
             raise
         if ret:  # should not happen.
+            self._reset()
             raise RuntimeError("internal error")
+        return 0
+
+    cpdef pack(self, object obj):
+        self._pack_obj(obj)
 
         # Reset the buffer.
         buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
-        self.pk.length = 0
+        self._reset()
         return buf
 
+    cpdef Py_ssize_t pack_into(self, object obj, object buffer, Py_ssize_t offset=0) except -1:
+        """Pack ``obj`` into the writable ``buffer`` starting at ``offset``.
+
+        Return the number of bytes written. ``BufferFull`` is raised if the
+        packed object does not fit in the buffer, which is left untouched.
+        """
+        cdef Py_buffer view
+        cdef Py_ssize_t length
+
+        PyObject_GetBuffer(buffer, &view, PyBUF_SIMPLE | PyBUF_WRITABLE)
+        try:
+            if offset < 0 or offset > view.len:
+                raise ValueError("offset out of range")
+
+            self._pack_obj(obj)
+            length = self.pk.length
+            if length > view.len - offset:
+                raise BufferFull("%d bytes needed, %d available" % (length, view.len - offset))
+            memcpy(<char *> view.buf + offset, self.pk.buf, length)
+            return length
+        finally:
+            self._reset()
+            PyBuffer_Release(&view)
+
     def bytes(self):
         """Return internal buffer contents as bytes object"""
         return PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
 
 
+cdef object _packers = threading.local()
+
+
+cdef inline Packer _get_packer():
+    try:
+        return _packers.packer
+    except AttributeError:
+        packer = _packers.packer = Packer()
+        return packer
+
+
 def packb(o, **kwargs):
     """
     Pack object `o` and return packed bytes
     See :class:`Packer` for options.
+
+    Without options, the object is packed with a packer reused by the
+    current thread.
+    """
+    if kwargs:
+        return Packer(**kwargs).pack(o)
+    return _get_packer().pack(o)
+
+
+def pack_into(o, buffer, offset=0):
     """
-    return Packer(**kwargs).pack(o)
+    Pack object `o` into the writable `buffer` starting at `offset`, with the
+    packer of the current thread, and return the number of bytes written.
+    See :meth:`Packer.pack_into`.
+    """
+    return _get_packer().pack_into(o, buffer, offset)
+
+
+cdef class SpanStatsEncoder(object):
+    """Encoder of span stats payloads for the ``/v0.6/stats`` endpoint of the agent.
+
+    The payload is packed straight from the aggregated stats buckets into a
+    buffer that is reused across payloads, without building the intermediate
+    dictionaries. The names, services, resources, types and map keys repeat a
+    lot across the stats entries, so their packed representation is computed
+    once per payload and then copied as is, like a string table would.
+    """
+    cdef msgpack_packer pk
+    cdef dict _packed_strings
+
+    def __cinit__(self):
+        cdef int buf_size = 64 * 1024
+        self.pk.buf = <char*> PyMem_Malloc(buf_size)
+        if self.pk.buf == NULL:
+            raise MemoryError("Unable to allocate internal buffer.")
+        self.pk.buf_size = buf_size
+        self.pk.length = 0
+
+    def __dealloc__(self):
+        PyMem_Free(self.pk.buf)
+        self.pk.buf = NULL
+
+    cdef int _pack_string(self, object string) except -1:
+        cdef int ret
+        cdef size_t start
+        cdef object packed = self._packed_strings.get(string)
+
+        if packed is not None:
+            return msgpack_pack_raw_body(&self.pk, <char *> packed, len(packed))
+
+        start = self.pk.length
+        ret = pack_text(&self.pk, string)
+        if ret == 0:
+            self._packed_strings[string] = PyBytes_FromStringAndSize(self.pk.buf + start, self.pk.length - start)
+        return ret
+
+    cdef int _pack_bin(self, bytes data) except -1:
+        cdef int ret
+        cdef Py_ssize_t L = len(data)
+
+        ret = msgpack_pack_bin(&self.pk, L)
+        if ret == 0:
+            ret = msgpack_pack_raw_body(&self.pk, <char *> data, L)
+        return ret
+
+    cdef int _pack_bool(self, object value) except -1:
+        if value:
+            return msgpack_pack_true(&self.pk)
+        return msgpack_pack_false(&self.pk)
+
+    cdef int _pack_stats(self, object aggr_key, object stats, object serialize_sketch) except -1:
+        cdef int ret
+        name, service, resource, _type, http_status, synthetics = aggr_key
+
+        ret = msgpack_pack_map(&self.pk, 10 + (1 if service else 0) + (1 if _type else 0))
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Name")
+        if ret != 0: return ret
+        ret = self._pack_string(name)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Resource")
+        if ret != 0: return ret
+        ret = self._pack_string(resource)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Synthetics")
+        if ret != 0: return ret
+        ret = self._pack_bool(synthetics)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"HTTPStatusCode")
+        if ret != 0: return ret
+        ret = pack_number(&self.pk, http_status)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Hits")
+        if ret != 0: return ret
+        ret = pack_number(&self.pk, stats.hits)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"TopLevelHits")
+        if ret != 0: return ret
+        ret = pack_number(&self.pk, stats.top_level_hits)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Duration")
+        if ret != 0: return ret
+        ret = pack_number(&self.pk, stats.duration)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Errors")
+        if ret != 0: return ret
+        ret = pack_number(&self.pk, stats.errors)
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"OkSummary")
+        if ret != 0: return ret
+        ret = self._pack_bin(serialize_sketch(stats.ok_distribution))
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"ErrorSummary")
+        if ret != 0: return ret
+        ret = self._pack_bin(serialize_sketch(stats.err_distribution))
+        if ret != 0: return ret
+
+        if service:
+            ret = self._pack_string(u"Service")
+            if ret != 0: return ret
+            ret = self._pack_string(service)
+            if ret != 0: return ret
+
+        if _type:
+            ret = self._pack_string(u"Type")
+            if ret != 0: return ret
+            ret = self._pack_string(_type)
+            if ret != 0: return ret
+
+        return 0
+
+    cdef int _pack_payload(
+        self, object buckets, object bucket_size_ns, object hostname, object env, object version, object serialize_sketch
+    ) except -1:
+        cdef int ret
+
+        ret = msgpack_pack_map(&self.pk, 2 + (1 if env else 0) + (1 if version else 0))
+        if ret != 0: return ret
+
+        ret = self._pack_string(u"Stats")
+        if ret != 0: return ret
+        ret = msgpack_pack_array(&self.pk, len(buckets))
+        if ret != 0: return ret
+        for bucket_time_ns, bucket in buckets.items():
+            ret = msgpack_pack_map(&self.pk, 3)
+            if ret != 0: return ret
+
+            ret = self._pack_string(u"Start")
+            if ret != 0: return ret
+            ret = pack_number(&self.pk, bucket_time_ns)
+            if ret != 0: return ret
+
+            ret = self._pack_string(u"Duration")
+            if ret != 0: return ret
+            ret = pack_number(&self.pk, bucket_size_ns)
+            if ret != 0: return ret
+
+            ret = self._pack_string(u"Stats")
+            if ret != 0: return ret
+            ret = msgpack_pack_array(&self.pk, len(bucket))
+            if ret != 0: return ret
+            for aggr_key, stats in bucket.items():
+                ret = self._pack_stats(aggr_key, stats, serialize_sketch)
+                if ret != 0: return ret
+
+        ret = self._pack_string(u"Hostname")
+        if ret != 0: return ret
+        ret = self._pack_string(hostname)
+        if ret != 0: return ret
+
+        if env:
+            ret = self._pack_string(u"Env")
+            if ret != 0: return ret
+            ret = self._pack_string(env)
+            if ret != 0: return ret
+
+        if version:
+            ret = self._pack_string(u"Version")
+            if ret != 0: return ret
+            ret = self._pack_string(version)
+            if ret != 0: return ret
+
+        return 0
+
+    cpdef encode(
+        self, object buckets, object bucket_size_ns, object hostname, object env, object version, object serialize_sketch
+    ):
+        """Encode the stats buckets into a payload.
+
+        :param buckets: The stats keyed by aggregation key, keyed by bucket start time
+        :param bucket_size_ns: The duration of the buckets
+        :param hostname: The hostname to report the stats for
+        :param env: The environment to report the stats for, if any
+        :param version: The version to report the stats for, if any
+        :param serialize_sketch: Function returning the protobuf representation of a DDSketch as bytes
+        """
+        cdef int ret
+
+        self.pk.length = 0
+        self._packed_strings = {}
+        try:
+            ret = self._pack_payload(buckets, bucket_size_ns, hostname, env, version, serialize_sketch)
+            if ret != 0:
+                raise RuntimeError("Failed to encode span stats payload")
+            return PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
+        finally:
+            self.pk.length = 0
+            self._packed_strings = None
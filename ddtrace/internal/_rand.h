@@ -0,0 +1,20 @@
+#ifndef DDTRACE_RAND_H
+#define DDTRACE_RAND_H
+
+#include "_stdint.h"
+
+#if defined(_MSC_VER)
+#define DD_THREAD_LOCAL __declspec(thread)
+#elif defined(__linux__)
+/* The initial-exec model avoids a call to __tls_get_addr on every access */
+#define DD_THREAD_LOCAL __thread __attribute__((tls_model("initial-exec")))
+#else
+#define DD_THREAD_LOCAL __thread
+#endif
+
+/* State of the generator of the current thread, see _rand.pyx */
+static DD_THREAD_LOCAL uint64_t dd_rand_state = 0;
+/* Seed generation the state of the current thread was seeded from */
+static DD_THREAD_LOCAL uint64_t dd_rand_generation = 0;
+
+#endif
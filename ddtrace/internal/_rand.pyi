@@ -1,2 +1,6 @@
+from typing import List
+
 def seed() -> None: ...
-def rand64bits(check_pid: bool = True) -> int: ...
+def rand64bits() -> int: ...
+def rand128bits() -> int: ...
+def rand64bits_batch(n: int) -> List[int]: ...
@@ -18,14 +18,24 @@ That's 10,000,000 seconds until we hit the period. That's 115 days of
 100k spans/second (with no application restart) until the period is reached.
 
 
-rand64bits() is thread-safe as it is compiled and is interfaced with via a
-single Python step. This is the same mechanism in which CPython achieves
-thread-safety:
-https://github.com/python/cpython/blob/8d21aa21f2cbc6d50aab3f420bb23be1d081dac4/Lib/random.py#L37-L38
+Every thread has its own generator state, so that threads never contend for
+it, even without a global interpreter lock. The state of a thread is seeded
+on its first use from the global seed, the address of the state, which is
+unique among the running threads, and a counter.
 
 
 Warning: this RNG needs to be reseeded on fork() if collisions are to be
-avoided across processes. Reseeding is accomplished simply by calling seed().
+avoided across processes. Reseeding is accomplished simply by calling seed(),
+which makes every thread reseed its state on its next use.
+
+
+rand128bits() generates 128-bit trace ids, made of the current time in unix
+seconds in the 32 high bits, 32 zero bits and 64 random bits.
+
+rand64bits_batch() generates many ids in a single call, which is cheaper than
+calling rand64bits() for each of them. There is deliberately no per-thread
+cache of generated ids: generating an id costs less than retrieving it from a
+cache, and such a cache would have to be discarded on fork().
 
 
 Benchmarks (run on 2019 13-inch macbook pro 2.8 GHz quad-core i7)::
@@ -50,28 +60,83 @@ test_rand64bits_no_pid         59.9690 (1.0)       99.0107 (1.0)       65.1900 (
 test_randbits_stdlib          114.1084 (1.90)     169.3871 (1.71)     125.7419 (1.93)     10.6180 (1.92)     122.7273 (1.93)     5.3290 (1.06)         16;9        7.9528 (0.52)         90      100000
 test_rand64bits_pid_check     121.8156 (2.03)     168.9837 (1.71)     130.3854 (2.00)      8.5097 (1.54)     127.8620 (2.01)     7.8514 (1.56)          9;5        7.6696 (0.50)         81      100000
 -------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+Python 3.9 (Linux x86_64, with per-thread states):
+-------------------------------------------------------------------------------------- benchmark 'span-id': 3 tests --------------------------------------------------------------------------------------
+Name (time in ns)                  Min                   Max                Mean             StdDev              Median                IQR            Outliers  OPS (Mops/s)            Rounds  Iterations
+----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+test_rand64bits_pid_check     133.3553 (1.0)        195.3749 (1.0)      144.3000 (1.0)       7.9474 (1.0)      142.6159 (1.0)       6.3468 (1.0)           8;3        6.9300 (1.0)          70      100000
+test_rand128bits              216.4145 (1.62)       308.3420 (1.58)     248.4155 (1.72)     26.2857 (3.31)     241.6207 (1.69)     37.3805 (5.89)         15;0        4.0255 (0.58)         43      100000
+test_randbits_stdlib          388.0492 (2.91)     1,022.1335 (5.23)     461.7676 (3.20)     58.8190 (7.40)     454.1644 (3.18)     20.2665 (3.19)        11;19        2.1656 (0.31)        192       13742
+----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+--------------------------------------------------------------------------------- benchmark 'span-id-batch': 2 tests --------------------------------------------------------------------------------
+Name (time in us)                    Min                Max               Mean            StdDev             Median               IQR            Outliers  OPS (Kops/s)            Rounds  Iterations
+-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+test_rand64bits_batch_of_100      2.6090 (1.0)       6.6890 (1.0)       3.6613 (1.0)      0.6403 (1.0)       3.6590 (1.0)      0.4286 (1.0)         45;19      273.1273 (1.0)         197        1308
+test_rand64bits_100              11.1757 (4.28)     15.6173 (2.33)     12.8135 (3.50)     1.0273 (1.60)     12.2979 (3.36)     0.8988 (2.10)         13;9       78.0426 (0.29)         66        1000
+-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 """
-import os
+from libc.time cimport time
+
 import random
 
 from ddtrace.internal import compat
 from ddtrace.internal import forksafe
 
 
-cdef extern from "_stdint.h" nogil:
+cdef extern from "_rand.h" nogil:
     ctypedef unsigned long long uint64_t
 
-cdef uint64_t state
+    uint64_t dd_rand_state
+    uint64_t dd_rand_generation
+
+
+cdef uint64_t seed_base
+# DEV: seed() increments the generation, so that the states of the threads,
+# at generation 0, are seeded on their first use
+cdef uint64_t generation = 0
+cdef uint64_t thread_count = 0
+
+
+cdef inline uint64_t splitmix64(uint64_t x):
+    x += <uint64_t>0x9E3779B97F4A7C15
+    x = (x ^ (x >> 30)) * <uint64_t>0xBF58476D1CE4E5B9
+    x = (x ^ (x >> 27)) * <uint64_t>0x94D049BB133111EB
+    return x ^ (x >> 31)
+
+
+cdef inline void seed_thread():
+    global dd_rand_state, dd_rand_generation, thread_count
+    thread_count += 1
+    dd_rand_state = splitmix64(seed_base ^ <uint64_t>&dd_rand_state ^ splitmix64(thread_count))
+    if dd_rand_state == 0:
+        # DEV: xorshift would only generate zeros
+        dd_rand_state = <uint64_t>4101842887655102017
+    dd_rand_generation = generation
+
+
+cdef inline uint64_t next64bits():
+    global dd_rand_state
+    if dd_rand_generation != generation:
+        seed_thread()
+    dd_rand_state ^= dd_rand_state >> 21
+    dd_rand_state ^= dd_rand_state << 35
+    dd_rand_state ^= dd_rand_state >> 4
+    return dd_rand_state * <uint64_t>2685821657736338717
 
 
 cpdef _getstate():
-    return state
+    if dd_rand_generation != generation:
+        seed_thread()
+    return dd_rand_state
 
 
 cpdef seed():
-    global state
+    global seed_base, generation
     random.seed()
-    state = <uint64_t>compat.getrandbits(64) ^ <uint64_t>4101842887655102017
+    seed_base = <uint64_t>compat.getrandbits(64) ^ <uint64_t>4101842887655102017
+    generation += 1
 
 
 # We have to reseed the RNG or we will get collisions between the processes as
@@ -80,11 +145,30 @@ forksafe.register(seed)
 
 
 cpdef rand64bits():
-    global state
-    state ^= state >> 21
-    state ^= state << 35
-    state ^= state >> 4
-    return <uint64_t>(state * <uint64_t>2685821657736338717)
+    return next64bits()
+
+
+# The current time in seconds, with its high bits in 128-bit trace ids
+cdef tuple high_bits = (-1, 0)
+
+
+cpdef rand128bits():
+    global high_bits
+    cdef long long now = time(NULL)
+    # DEV: The time and its high bits are in the same tuple so that they are
+    # always consistent, even when it is updated by several threads at once
+    cached = high_bits
+    if cached[0] != now:
+        cached = high_bits = (now, (now & 0xFFFFFFFF) << 96)
+    return cached[1] | next64bits()
+
+
+cpdef list rand64bits_batch(Py_ssize_t n):
+    cdef Py_ssize_t i
+    cdef list ids = [None] * n
+    for i in range(n):
+        ids[i] = next64bits()
+    return ids
 
 
 seed()
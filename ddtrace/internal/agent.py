@@ -1,9 +1,17 @@
+import contextlib
 import os
+import select
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
 from typing import TypeVar
 from typing import Union
 
+from ddtrace.internal.compat import monotonic
 from ddtrace.internal.compat import parse
 
+from . import forksafe
 from .http import HTTPConnection
 from .http import HTTPSConnection
 from .uds import UDSHTTPConnection
@@ -16,6 +24,8 @@ DEFAULT_UNIX_DSD_PATH = "/var/run/datadog/dsd.socket"
 DEFAULT_STATS_PORT = 8125
 DEFAULT_TRACE_URL = "http://%s:%s" % (DEFAULT_HOSTNAME, DEFAULT_TRACE_PORT)
 DEFAULT_TIMEOUT = 2.0
+DEFAULT_POOL_MAX_IDLE_CONNECTIONS = 4
+DEFAULT_POOL_IDLE_TIMEOUT = 30.0
 
 ConnectionType = Union[HTTPSConnection, HTTPConnection, UDSHTTPConnection]
 
@@ -127,3 +137,144 @@ def get_connection(url, timeout=DEFAULT_TIMEOUT):
         return UDSHTTPConnection(path, hostname, parsed.port, timeout=timeout)
 
     raise ValueError("Unsupported protocol '%s'" % parsed.scheme)
+
+
+def _is_connection_stale(conn):
+    # type: (ConnectionType) -> bool
+    """Return whether the socket of an idle connection can no longer be used.
+
+    An idle keep-alive socket must not have anything to read. If it becomes
+    readable, the agent either closed the connection or sent some unexpected
+    data, and in both cases the socket cannot be used for a new request.
+    """
+    if conn.sock is None:
+        # The connection will be (re-)established on the next request.
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError, TypeError):
+        return True
+    return bool(readable)
+
+
+class ConnectionPool(object):
+    """A fork-safe pool of keep-alive connections to the agent.
+
+    The pool is shared by all the components that send data to the agent, so
+    that the same HTTP or UDS connection can be used e.g. to send traces and
+    then stats, rather than each of them opening a new connection per request.
+
+    Idle connections are checked for staleness before being handed out and are
+    closed after ``idle_timeout`` seconds of inactivity.
+    """
+
+    def __init__(
+        self,
+        max_idle_connections=DEFAULT_POOL_MAX_IDLE_CONNECTIONS,  # type: int
+        idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT,  # type: float
+    ):
+        # type: (...) -> None
+        self.max_idle_connections = max_idle_connections
+        self.idle_timeout = idle_timeout
+        self._idle = {}  # type: Dict[str, List[Tuple[ConnectionType, float]]]
+        self._lock = forksafe.Lock()
+        self._pid = os.getpid()
+
+    def _evict(self, now):
+        # type: (float) -> None
+        # DEV: must be called with the pool lock held.
+        pid = os.getpid()
+        if pid != self._pid:
+            # The sockets are shared with the parent process: drop them without
+            # closing them to leave the parent connections untouched.
+            self._idle.clear()
+            self._pid = pid
+            return
+
+        for url, idle in self._idle.items():
+            expired = [conn for conn, last_used in idle if now - last_used > self.idle_timeout]
+            if expired:
+                for conn in expired:
+                    conn.close()
+                idle[:] = [(conn, last_used) for conn, last_used in idle if now - last_used <= self.idle_timeout]
+
+    def acquire(self, url, timeout=DEFAULT_TIMEOUT):
+        # type: (str, float) -> ConnectionType
+        """Return a connection to the given URL, reusing an idle one if available."""
+        with self._lock:
+            self._evict(monotonic())
+            idle = self._idle.get(url)
+            conn = idle.pop()[0] if idle else None
+
+        if conn is None:
+            return get_connection(url, timeout)
+
+        if _is_connection_stale(conn):
+            # Closing the connection makes it reconnect on the next request.
+            conn.close()
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def release(self, url, conn):
+        # type: (str, ConnectionType) -> None
+        """Give a connection back to the pool.
+
+        The response to the last request made with the connection must have
+        been read entirely.
+        """
+        with self._lock:
+            self._evict(monotonic())
+            idle = self._idle.setdefault(url, [])
+            if len(idle) < self.max_idle_connections:
+                idle.append((conn, monotonic()))
+                return
+
+        conn.close()
+
+    def clear(self):
+        # type: () -> None
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            pid, self._pid = self._pid, os.getpid()
+
+        if pid == self._pid:
+            for conns in idle.values():
+                for conn, _ in conns:
+                    conn.close()
+
+
+_connection_pool = ConnectionPool()
+
+
+def get_connection_pool():
+    # type: () -> ConnectionPool
+    """Return the connection pool shared by all the agent clients."""
+    return _connection_pool
+
+
+@contextlib.contextmanager
+def pooled_connection(url, timeout=DEFAULT_TIMEOUT, reuse=True):
+    # type: (str, float, bool) -> Iterator[ConnectionType]
+    """Context manager that provides a connection to the given URL from the shared pool.
+
+    The connection is returned to the pool on exit, so the response to any
+    request made with it must be read entirely within the context. If an
+    exception is raised, or if ``reuse`` is false, the connection is closed
+    instead.
+    """
+    if reuse:
+        conn = _connection_pool.acquire(url, timeout)
+    else:
+        conn = get_connection(url, timeout)
+    try:
+        yield conn
+    except BaseException:
+        conn.close()
+        raise
+    if reuse:
+        _connection_pool.release(url, conn)
+    else:
+        conn.close()
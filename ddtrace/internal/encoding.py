@@ -76,11 +76,21 @@ class _EncoderBase(object):
         if span.duration_ns:
             d["duration"] = span.duration_ns
 
-        if span._meta:
-            d["meta"] = span._meta
+        if span._exc_stack is not None:
+            span._format_exc_stack()
 
-        if span._metrics:
-            d["metrics"] = span._metrics
+        if span._shared_tags is not None:
+            meta = span.get_tags()
+            metrics = span.get_metrics()
+        else:
+            meta = span._meta
+            metrics = span._metrics
+
+        if meta:
+            d["meta"] = meta
+
+        if metrics:
+            d["metrics"] = metrics
 
         if span.span_type:
             d["type"] = span.span_type
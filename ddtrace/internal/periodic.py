@@ -42,6 +42,7 @@ class PeriodicThread(threading.Thread):
         self._on_shutdown = on_shutdown
         self.interval = interval
         self.quit = forksafe.Event()
+        self._awake = forksafe.Event()
         self.daemon = True
 
     def stop(self):
@@ -52,10 +53,21 @@ class PeriodicThread(threading.Thread):
         #    the Lock might have been locked in a parent process while forking so that'd block forever
         if self.is_alive():
             self.quit.set()
+            self._awake.set()
+
+    def awake(self):
+        """Run the target function as soon as possible, without waiting for the interval to elapse."""
+        # NOTE: see stop() for why we check that the thread is alive.
+        if self.is_alive():
+            self._awake.set()
 
     def run(self):
         """Run the target function periodically."""
-        while not self.quit.wait(self.interval):
+        while True:
+            self._awake.wait(self.interval)
+            if self.quit.is_set():
+                break
+            self._awake.clear()
             # DEV: Some frameworks, like e.g. gevent, seem to resuscitate some
             # of the threads that were running prior to the fork of the worker
             # processes. These threads are normally created via the native API
@@ -95,6 +107,7 @@ class _GeventPeriodicThread(PeriodicThread):
         self._tident = None
         self._periodic_started = False
         self._periodic_stopped = False
+        self._awake = False
 
     def _reset_internal_locks(self, is_alive=False):
         # Called by Python via `threading._after_fork`
@@ -129,6 +142,10 @@ class _GeventPeriodicThread(PeriodicThread):
         """Stop the thread."""
         self.quit = True
 
+    def awake(self):
+        """Run the target function as soon as possible, without waiting for the interval to elapse."""
+        self._awake = True
+
     def run(self):
         """Run the target function periodically."""
         # Do not use the threading._active_limbo_lock here because it's a gevent lock
@@ -138,9 +155,10 @@ class _GeventPeriodicThread(PeriodicThread):
 
         try:
             while self.quit is False:
+                self._awake = False
                 self._target()
                 slept = 0
-                while self.quit is False and slept < self.interval:
+                while self.quit is False and self._awake is False and slept < self.interval:
                     nogevent.sleep(self.SLEEP_INTERVAL)
                     slept += self.SLEEP_INTERVAL
             if self._on_shutdown is not None:
@@ -235,6 +253,12 @@ class PeriodicService(service.Service):
         if self._worker:
             self._worker.join(timeout)
 
+    def awake(self):
+        # type: (...) -> None
+        """Run the periodic function as soon as possible, without waiting for the interval to elapse."""
+        if self._worker:
+            self._worker.awake()
+
     @staticmethod
     def on_shutdown():
         pass
@@ -1,6 +1,9 @@
 # coding: utf-8
+from array import array
 from collections import defaultdict
+from collections import deque
 import os
+import threading
 import typing
 
 from ddsketch import LogCollapsingLowestDenseDDSketch
@@ -14,10 +17,11 @@ from ddtrace.span import _is_top_level
 
 from . import SpanProcessor
 from ...constants import SPAN_MEASURED_KEY
-from .._encoding import packb
-from ..agent import get_connection
+from .._encoding import SpanStatsEncoder
+from ..agent import pooled_connection
 from ..compat import get_connection_response
 from ..compat import httplib
+from ..compat import monotonic
 from ..forksafe import Lock
 from ..hostname import get_hostname
 from ..logger import get_logger
@@ -26,11 +30,13 @@ from ..writer import _human_size
 
 
 if typing.TYPE_CHECKING:
+    from typing import Any
     from typing import DefaultDict
+    from typing import Deque
     from typing import Dict
     from typing import List
     from typing import Optional
-    from typing import Union
+    from typing import Tuple
 
     from ddtrace import Span
 
@@ -61,6 +67,13 @@ SpanAggrKey = typing.Tuple[
 ]
 
 
+def _new_sketch():
+    # type: () -> LogCollapsingLowestDenseDDSketch
+    # Match the relative accuracy of the sketch implementation used in the backend
+    # which is 0.775%.
+    return LogCollapsingLowestDenseDDSketch(0.00775, bin_limit=2048)
+
+
 class SpanAggrStats(object):
     """Aggregated span statistics."""
 
@@ -71,30 +84,95 @@ class SpanAggrStats(object):
         self.top_level_hits = 0
         self.errors = 0
         self.duration = 0
-        # Match the relative accuracy of the sketch implementation used in the backend
-        # which is 0.775%.
-        self.ok_distribution = LogCollapsingLowestDenseDDSketch(0.00775, bin_limit=2048)
-        self.err_distribution = LogCollapsingLowestDenseDDSketch(0.00775, bin_limit=2048)
+        self.ok_distribution = _new_sketch()
+        self.err_distribution = _new_sketch()
+
+
+def _span_aggr_fields(span):
+    # type: (Span) -> Tuple[Any, ...]
+    """Return the raw fields of the span that make its aggregation key."""
+    return (
+        span.name,
+        span.service,
+        span.resource,
+        span.span_type,
+        span.get_tag("http.status_code"),
+        span.context.dd_origin,
+    )
+
+
+def _span_aggr_key(fields):
+    # type: (Tuple[Any, ...]) -> SpanAggrKey
+    """Return a hashable key that can be used to aggregate similar spans from their raw fields."""
+    name, service, resource, _type, status_code, dd_origin = fields
+    return name, service or "", resource or "", _type or "", int(status_code or 0), dd_origin == "synthetics"
+
+
+def _serialize_sketch(sketch):
+    # type: (LogCollapsingLowestDenseDDSketch) -> bytes
+    if not sketch.count:
+        # Most spans are not errors, so most error sketches are empty.
+        return _EMPTY_SKETCH
+    return DDSketchProto.to_proto(sketch).SerializeToString()
+
+
+_EMPTY_SKETCH = DDSketchProto.to_proto(_new_sketch()).SerializeToString()
 
 
-def _span_aggr_key(span):
-    # type: (Span) -> SpanAggrKey
-    """Return a hashable key that can be used to aggregate similar spans."""
-    service = span.service or ""
-    resource = span.resource or ""
-    _type = span.span_type or ""
-    status_code = span.get_tag("http.status_code") or 0
-    synthetics = span.context.dd_origin == "synthetics"
-    return span.name, service, resource, _type, int(status_code), synthetics
+# Flags of the span records
+_ERROR = 1
+_TOP_LEVEL = 2
+
+
+class _SpanRecords(object):
+    """Compact records of the finished spans of a single thread waiting to be
+    aggregated.
+
+    Every record is made of the id of the aggregation fields of the span,
+    interned in the records, and of the end time, duration and flags of the
+    span. The lock is only contended when the records are collected for
+    aggregation.
+    """
+
+    __slots__ = ("key_ids", "keys", "values", "lock", "registered")
+
+    def __init__(self):
+        # type: () -> None
+        self.key_ids = {}  # type: Dict[Tuple[Any, ...], int]
+        self.keys = []  # type: List[Tuple[Any, ...]]
+        self.values = array("q")
+        self.lock = threading.Lock()
+        self.registered = False
+
+    def take(self):
+        # type: () -> Tuple[List[Tuple[Any, ...]], array]
+        """Take all the records, as the list of their interned aggregation
+        fields and the array of their values.
+
+        Records that are still empty are unregistered, so that the records of
+        the threads that are gone are not kept forever. They are registered
+        again on the next span of their thread.
+        """
+        with self.lock:
+            keys, values = self.keys, self.values
+            if values:
+                self.key_ids, self.keys, self.values = {}, [], array("q")
+            else:
+                self.registered = False
+        return keys, values
 
 
 class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
     """SpanProcessor for computing, collecting and submitting span metrics to the Datadog Agent."""
 
-    def __init__(self, agent_url, interval=None, timeout=1.0, retry_attempts=3):
-        # type: (str, Optional[float], float, int) -> None
+    def __init__(self, agent_url, interval=None, timeout=1.0, retry_attempts=3, batch_size=None):
+        # type: (str, Optional[float], float, int, Optional[int]) -> None
         if interval is None:
             interval = float(os.getenv("_DD_TRACE_STATS_WRITER_INTERVAL") or 10.0)
+        if batch_size is None:
+            batch_size = int(os.getenv("_DD_TRACE_STATS_BATCH_SIZE") or 4096)
+        if batch_size < 1:
+            raise ValueError("The span stats batch size must be positive")
         super(SpanStatsProcessorV06, self).__init__(interval=interval)
         self._agent_url = agent_url
         self._endpoint = "/v0.6/stats"
@@ -102,9 +180,10 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
         self._timeout = timeout
         # Have the bucket size match the interval in which flushes occur.
         self._bucket_size_ns = int(interval * 1e9)  # type: int
-        self._buckets = defaultdict(
-            lambda: defaultdict(SpanAggrStats)
-        )  # type: DefaultDict[int, DefaultDict[SpanAggrKey, SpanAggrStats]]
+        self._buckets = self._new_buckets()
+        # The encoder reuses its buffer, so payloads are encoded one at a time.
+        self._encoder = SpanStatsEncoder()
+        self._encoder_lock = threading.Lock()
         self._headers = {
             "Datadog-Meta-Lang": "python",
             "Datadog-Meta-Tracer-Version": ddtrace.__version__,
@@ -112,6 +191,15 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
         }  # type: Dict[str, str]
         self._hostname = six.ensure_text(get_hostname())
         self._lock = Lock()
+        # Spans are recorded in per-thread batches that are aggregated in bulk
+        # when they are full or when the stats are flushed.
+        self._batch_size = batch_size
+        self._records = threading.local()
+        self._all_records = []  # type: List[_SpanRecords]
+        # Full batches waiting for the flush thread
+        self._full_batches = deque()  # type: Deque[Tuple[List[Tuple[Any, ...]], array]]
+        self._configured_interval = interval
+        self._flush_at = monotonic() + interval
         self._enabled = True
         self._retry_request = tenacity.Retrying(
             # Use a Fibonacci policy with jitter, same as AgentWriter.
@@ -136,75 +224,125 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
         if not is_top_level and not _is_measured(span):
             return
 
-        with self._lock:
+        fields = _span_aggr_fields(span)
+        flags = (_ERROR if span.error else 0) | (_TOP_LEVEL if is_top_level else 0)
+        assert span.duration_ns is not None
+
+        try:
+            records = self._records.records
+        except AttributeError:
+            records = self._records.records = _SpanRecords()
+
+        with records.lock:
+            key_id = records.key_ids.get(fields)
+            if key_id is None:
+                key_id = records.key_ids[fields] = len(records.keys)
+                records.keys.append(fields)
+            records.values.extend((key_id, span.start_ns + span.duration_ns, span.duration_ns, flags))
+            full = len(records.values) >= 4 * self._batch_size
+            registered, records.registered = records.registered, True
+
+        if not registered:
+            with self._lock:
+                self._all_records.append(records)
+        if full:
+            # DEV: The batch is aggregated by the flush thread
+            self._full_batches.append(records.take())
+            self.awake()
+
+    def _aggregate(self, keys, values):
+        # type: (List[Tuple[Any, ...]], array) -> None
+        """Fold a batch of span records into the stats buckets.
+
+        The caller must hold the processor lock.
+        """
+        if not values:
+            return
+
+        bucket_size_ns = self._bucket_size_ns
+        buckets = self._buckets
+        # DEV: Spans in the same batch mostly end in the same bucket
+        last_bucket_time_ns = None
+        bucket = None  # type: Optional[DefaultDict[SpanAggrKey, SpanAggrStats]]
+        aggr_keys = [_span_aggr_key(fields) for fields in keys]
+        for key_id, span_end_ns, duration_ns, flags in zip(values[0::4], values[1::4], values[2::4], values[3::4]):
             # Align the span into the corresponding stats bucket
-            assert span.duration_ns is not None
-            span_end_ns = span.start_ns + span.duration_ns
-            bucket_time_ns = span_end_ns - (span_end_ns % self._bucket_size_ns)
-            aggr_key = _span_aggr_key(span)
-            stats = self._buckets[bucket_time_ns][aggr_key]
+            bucket_time_ns = span_end_ns - (span_end_ns % bucket_size_ns)
+            if bucket_time_ns != last_bucket_time_ns:
+                bucket = buckets[bucket_time_ns]
+                last_bucket_time_ns = bucket_time_ns
+            stats = bucket[aggr_keys[key_id]]  # type: ignore[index]
 
             stats.hits += 1
-            stats.duration += span.duration_ns
-            if is_top_level:
+            stats.duration += duration_ns
+            if flags & _TOP_LEVEL:
                 stats.top_level_hits += 1
-            if span.error:
+            if flags & _ERROR:
                 stats.errors += 1
-                stats.err_distribution.add(span.duration_ns)
+                stats.err_distribution.add(duration_ns)
             else:
-                stats.ok_distribution.add(span.duration_ns)
+                stats.ok_distribution.add(duration_ns)
 
-    def _serialize_buckets(self):
-        # type: () -> List[Dict]
-        """Serialize and update the buckets.
+    def _aggregate_all(self):
+        # type: () -> None
+        """Fold the span records of all the threads into the stats buckets.
 
-        The current bucket is left in case any other spans are added.
+        The caller must hold the processor lock.
         """
-        serialized_buckets = []
-        serialized_bucket_keys = []
-        for bucket_time_ns, bucket in self._buckets.items():
-            bucket_aggr_stats = []
-            serialized_bucket_keys.append(bucket_time_ns)
-
-            for aggr_key, stat_aggr in bucket.items():
-                name, service, resource, _type, http_status, synthetics = aggr_key
-                serialized_bucket = {
-                    u"Name": six.ensure_text(name),
-                    u"Resource": six.ensure_text(resource),
-                    u"Synthetics": synthetics,
-                    u"HTTPStatusCode": http_status,
-                    u"Hits": stat_aggr.hits,
-                    u"TopLevelHits": stat_aggr.top_level_hits,
-                    u"Duration": stat_aggr.duration,
-                    u"Errors": stat_aggr.errors,
-                    u"OkSummary": DDSketchProto.to_proto(stat_aggr.ok_distribution).SerializeToString(),
-                    u"ErrorSummary": DDSketchProto.to_proto(stat_aggr.err_distribution).SerializeToString(),
-                }
-                if service:
-                    serialized_bucket[u"Service"] = six.ensure_text(service)
-                if _type:
-                    serialized_bucket[u"Type"] = six.ensure_text(_type)
-                bucket_aggr_stats.append(serialized_bucket)
-            serialized_buckets.append(
-                {
-                    u"Start": bucket_time_ns,
-                    u"Duration": self._bucket_size_ns,
-                    u"Stats": bucket_aggr_stats,
-                }
-            )
+        self._aggregate_full_batches()
+        active = []
+        for records in self._all_records:
+            keys, values = records.take()
+            if values:
+                self._aggregate(keys, values)
+                active.append(records)
+        self._all_records = active
+
+    def _aggregate_full_batches(self):
+        # type: () -> None
+        """Fold the full batches handed over by the threads into the stats buckets.
+
+        The caller must hold the processor lock.
+        """
+        full_batches = self._full_batches
+        while full_batches:
+            self._aggregate(*full_batches.popleft())
 
-        # Clear out buckets that have been serialized
-        for key in serialized_bucket_keys:
-            del self._buckets[key]
+    def _new_buckets(self):
+        # type: () -> DefaultDict[int, DefaultDict[SpanAggrKey, SpanAggrStats]]
+        return defaultdict(lambda: defaultdict(SpanAggrStats))
 
-        return serialized_buckets
+    def _serialize_buckets(self):
+        # type: () -> Optional[bytes]
+        """Aggregate the pending spans and serialize the buckets into a payload.
+
+        The serialized buckets are swapped out under the lock and encoded
+        outside of it, so that spans can be aggregated in the meantime.
+        """
+        with self._lock:
+            self._aggregate_all()
+            buckets = self._buckets
+            if not buckets:
+                return None
+            self._buckets = self._new_buckets()
+
+        with self._encoder_lock:
+            return self._encoder.encode(
+                buckets,
+                self._bucket_size_ns,
+                self._hostname,
+                six.ensure_text(config.env) if config.env else None,
+                six.ensure_text(config.version) if config.version else None,
+                _serialize_sketch,
+            )
 
     def _flush_stats(self, payload):
         # type: (bytes) -> None
         try:
-            conn = get_connection(self._agent_url, self._timeout)
-            conn.request("PUT", self._endpoint, payload, self._headers)
-            resp = get_connection_response(conn)
+            with pooled_connection(self._agent_url, self._timeout) as conn:
+                conn.request("PUT", self._endpoint, payload, self._headers)
+                resp = get_connection_response(conn)
+                body = resp.read()
         except Exception:
             log.error("failed to submit span stats to the Datadog agent at %s", self._agent_endpoint, exc_info=True)
             raise
@@ -220,7 +358,7 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
                     "failed to send stats payload, %s (%s) (%s) response from Datadog agent at %s",
                     resp.status,
                     resp.reason,
-                    resp.read(),
+                    body,
                     self._agent_endpoint,
                 )
             else:
@@ -228,23 +366,26 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
 
     def periodic(self):
         # type: (...) -> None
+        # DEV: The thread is also woken up when batches are full, to aggregate them ahead of the next flush
+        now = monotonic()
+        try:
+            if now < self._flush_at:
+                with self._lock:
+                    self._aggregate_full_batches()
+            else:
+                self._flush_at = now + self._configured_interval
+                self._flush()
+        finally:
+            self.interval = max(0, self._flush_at - monotonic())
 
-        with self._lock:
-            serialized_stats = self._serialize_buckets()
-
-        if not serialized_stats:
+    def _flush(self):
+        # type: (...) -> None
+        """Aggregate the pending spans and submit the stats to the agent."""
+        payload = self._serialize_buckets()
+        if payload is None:
             # No stats to report, short-circuit.
             return
-        raw_payload = {
-            u"Stats": serialized_stats,
-            u"Hostname": self._hostname,
-        }  # type: Dict[str, Union[List[Dict], str]]
-        if config.env:
-            raw_payload[u"Env"] = six.ensure_text(config.env)
-        if config.version:
-            raw_payload[u"Version"] = six.ensure_text(config.version)
-
-        payload = packb(raw_payload)
+
         try:
             self._retry_request(self._flush_stats, payload)
         except tenacity.RetryError:
@@ -252,5 +393,5 @@ class SpanStatsProcessorV06(PeriodicService, SpanProcessor):
 
     def shutdown(self, timeout):
         # type: (Optional[float]) -> None
-        self.periodic()
+        self._flush()
         self.stop(timeout)
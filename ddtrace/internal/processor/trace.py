@@ -1,7 +1,10 @@
 import abc
 from collections import defaultdict
+from collections import deque
+import os
 import threading
 from typing import DefaultDict
+from typing import Deque
 from typing import Iterable
 from typing import List
 from typing import Optional
@@ -9,9 +12,12 @@ from typing import Optional
 import attr
 import six
 
+from ddtrace.internal import periodic
+from ddtrace.internal import service
 from ddtrace.internal.logger import get_logger
 from ddtrace.internal.processor import SpanProcessor
 from ddtrace.internal.service import ServiceStatusError
+from ddtrace.internal.utils.formats import asbool
 from ddtrace.internal.writer import TraceWriter
 from ddtrace.span import Span
 from ddtrace.span import _is_top_level
@@ -19,6 +25,26 @@ from ddtrace.span import _is_top_level
 
 log = get_logger(__name__)
 
+DEFAULT_AGGREGATOR_SHARDS = 16
+DEFAULT_PROCESSING_QUEUE_SIZE = 1000
+DEFAULT_PROCESSING_QUEUE_DROP_POLICY = "drop_newest"
+PROCESSING_QUEUE_DROP_POLICIES = ("drop_newest", "drop_oldest")
+
+
+def get_processing_queue_enabled():
+    # type: () -> bool
+    return asbool(os.getenv("DD_TRACE_PROCESSING_QUEUE_ENABLED", default=False))
+
+
+def get_processing_queue_size():
+    # type: () -> int
+    return int(os.getenv("DD_TRACE_PROCESSING_QUEUE_SIZE", default=DEFAULT_PROCESSING_QUEUE_SIZE))
+
+
+def get_processing_queue_drop_policy():
+    # type: () -> str
+    return os.getenv("DD_TRACE_PROCESSING_QUEUE_DROP_POLICY", default=DEFAULT_PROCESSING_QUEUE_DROP_POLICY)
+
 
 @attr.s
 class TraceProcessor(six.with_metaclass(abc.ABCMeta)):
@@ -131,6 +157,97 @@ class TraceTagsProcessor(TraceProcessor):
         return trace
 
 
+def _process_and_write(trace_processors, writer, spans):
+    # type: (Iterable[TraceProcessor], TraceWriter, Optional[List[Span]]) -> None
+    for tp in trace_processors:
+        try:
+            if spans is None:
+                return
+            spans = tp.process_trace(spans)
+        except Exception:
+            log.error("error applying processor %r", tp, exc_info=True)
+
+    writer.write(spans)
+
+
+@attr.s(eq=False)
+class TraceProcessingQueue(periodic.PeriodicService):
+    """Bounded queue of finished trace chunks that are run through the trace
+    processors and handed over to the writer by a background thread.
+
+    When the queue is full, either the incoming trace chunk
+    (``drop_newest``) or the oldest queued one (``drop_oldest``) is dropped.
+    """
+
+    _trace_processors = attr.ib(type=Iterable[TraceProcessor])
+    _writer = attr.ib(type=TraceWriter)
+    _max_size = attr.ib(type=int, default=DEFAULT_PROCESSING_QUEUE_SIZE)
+    _drop_policy = attr.ib(type=str, default=DEFAULT_PROCESSING_QUEUE_DROP_POLICY)
+    _interval = attr.ib(type=float, default=1.0)
+    _queue = attr.ib(init=False, repr=False, type=Deque[List[Span]])
+    dropped = attr.ib(init=False, default=0, type=int)
+
+    @_max_size.validator
+    def _check_max_size(self, attribute, value):
+        if value < 1:
+            raise ValueError("The trace processing queue size must be positive")
+
+    @_drop_policy.validator
+    def _check_drop_policy(self, attribute, value):
+        if value not in PROCESSING_QUEUE_DROP_POLICIES:
+            raise ValueError(
+                "Unsupported trace processing queue drop policy: '%s'. The supported policies are: %s"
+                % (value, ", ".join(PROCESSING_QUEUE_DROP_POLICIES))
+            )
+
+    @_queue.default
+    def _create_queue(self):
+        # type: () -> Deque[List[Span]]
+        # DEV: With a bounded deque, appending to a full queue atomically
+        # discards the oldest item.
+        return deque(maxlen=self._max_size if self._drop_policy == "drop_oldest" else None)
+
+    def put(self, spans):
+        # type: (List[Span]) -> None
+        # DEV: The size check is not atomic with the append, so the queue might
+        # briefly go over its maximum size when several threads put at once.
+        # This is preferred over taking a lock on the request threads.
+        if len(self._queue) >= self._max_size:
+            self.dropped += 1
+            log.warning("trace processing queue is full (%d trace chunks), dropping trace", self._max_size)
+            if self._drop_policy == "drop_newest":
+                return
+        self._queue.append(spans)
+
+        if self.status != service.ServiceStatus.RUNNING:
+            try:
+                self.start()
+            except service.ServiceStatusError:
+                pass
+        self.awake()
+
+    def periodic(self):
+        # type: () -> None
+        """Process the queued trace chunks until the queue is empty."""
+        queue = self._queue
+        while True:
+            try:
+                spans = queue.popleft()
+            except IndexError:
+                return
+            _process_and_write(self._trace_processors, self._writer, spans)
+
+    on_shutdown = periodic
+
+    def _stop_service(  # type: ignore[override]
+        self,
+        timeout=None,  # type: Optional[float]
+    ):
+        # type: (...) -> None
+        super(TraceProcessingQueue, self)._stop_service()
+        self.join(timeout=timeout)
+
+
 @attr.s
 class SpanAggregator(SpanProcessor):
     """Processor that aggregates spans together by trace_id and writes the
@@ -140,6 +257,15 @@ class SpanAggregator(SpanProcessor):
           the trace_id have finished; or
         - A minimum threshold of spans (``partial_flush_min_spans``) have been
           finished in the collection and ``partial_flush_enabled`` is True.
+
+    Traces are spread by trace_id over ``num_shards`` independently locked
+    shards so that threads working on different traces seldom contend for the
+    same lock. The trace processors and the writer are called outside of any
+    lock.
+
+    With ``processing_queue_enabled``, finished trace chunks are queued and the
+    trace processors and the writer are called from a background thread
+    instead of the thread finishing the last span of the chunk.
     """
 
     @attr.s
@@ -147,69 +273,113 @@ class SpanAggregator(SpanProcessor):
         spans = attr.ib(default=attr.Factory(list))  # type: List[Span]
         num_finished = attr.ib(type=int, default=0)  # type: int
 
+    @attr.s
+    class _Shard(object):
+        traces = attr.ib(
+            factory=lambda: defaultdict(lambda: SpanAggregator._Trace()), type=DefaultDict[int, "SpanAggregator._Trace"]
+        )
+        lock = attr.ib(factory=threading.Lock)
+
     _partial_flush_enabled = attr.ib(type=bool)
     _partial_flush_min_spans = attr.ib(type=int)
     _trace_processors = attr.ib(type=Iterable[TraceProcessor])
     _writer = attr.ib(type=TraceWriter)
-    _traces = attr.ib(
-        factory=lambda: defaultdict(lambda: SpanAggregator._Trace()),
-        init=False,
-        type=DefaultDict[int, "_Trace"],
-        repr=False,
-    )
-    _lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+    _num_shards = attr.ib(type=int, default=DEFAULT_AGGREGATOR_SHARDS)
+    _processing_queue_enabled = attr.ib(type=bool, factory=get_processing_queue_enabled)
+    _processing_queue_size = attr.ib(type=int, factory=get_processing_queue_size)
+    _processing_queue_drop_policy = attr.ib(type=str, factory=get_processing_queue_drop_policy)
+    _shards = attr.ib(init=False, type=List["SpanAggregator._Shard"], repr=False)
+    _processing_queue = attr.ib(init=False, type=Optional[TraceProcessingQueue], repr=False)
+
+    @_num_shards.validator
+    def _check_num_shards(self, attribute, value):
+        if value < 1:
+            raise ValueError("The number of shards must be positive")
+
+    @_shards.default
+    def _create_shards(self):
+        # type: () -> List[SpanAggregator._Shard]
+        return [SpanAggregator._Shard() for _ in range(self._num_shards)]
+
+    @_processing_queue.default
+    def _create_processing_queue(self):
+        # type: () -> Optional[TraceProcessingQueue]
+        if not self._processing_queue_enabled:
+            return None
+        return TraceProcessingQueue(
+            trace_processors=self._trace_processors,
+            writer=self._writer,
+            max_size=self._processing_queue_size,
+            drop_policy=self._processing_queue_drop_policy,
+        )
+
+    def _shard(self, trace_id):
+        # type: (Optional[int]) -> SpanAggregator._Shard
+        return self._shards[(trace_id or 0) % self._num_shards]
 
     def on_span_start(self, span):
         # type: (Span) -> None
-        with self._lock:
-            trace = self._traces[span.trace_id]
-            trace.spans.append(span)
+        shard = self._shard(span.trace_id)
+        with shard.lock:
+            shard.traces[span.trace_id].spans.append(span)
 
     def on_span_finish(self, span):
         # type: (Span) -> None
-        with self._lock:
-            trace = self._traces[span.trace_id]
+        shard = self._shard(span.trace_id)
+        with shard.lock:
+            trace = shard.traces[span.trace_id]
             trace.num_finished += 1
             should_partial_flush = self._partial_flush_enabled and trace.num_finished >= self._partial_flush_min_spans
-            if trace.num_finished == len(trace.spans) or should_partial_flush:
-                trace_spans = trace.spans
-                trace.spans = []
-                if trace.num_finished < len(trace_spans):
-                    finished = []
-                    for s in trace_spans:
-                        if s.finished:
-                            finished.append(s)
-                        else:
-                            trace.spans.append(s)
-
-                else:
-                    finished = trace_spans
-
-                num_finished = len(finished)
-
-                if should_partial_flush:
-                    log.debug("Partially flushing %d spans for trace %d", num_finished, span.trace_id)
-                    finished[0].set_metric("_dd.py.partial_flush", num_finished)
-
-                trace.num_finished -= num_finished
-
-                if len(trace.spans) == 0:
-                    del self._traces[span.trace_id]
-
-                spans = finished  # type: Optional[List[Span]]
-                for tp in self._trace_processors:
-                    try:
-                        if spans is None:
-                            return
-                        spans = tp.process_trace(spans)
-                    except Exception:
-                        log.error("error applying processor %r", tp, exc_info=True)
-
-                self._writer.write(spans)
+            if trace.num_finished != len(trace.spans) and not should_partial_flush:
+                log.debug("trace %d has %d spans, %d finished", span.trace_id, len(trace.spans), trace.num_finished)
                 return
 
-            log.debug("trace %d has %d spans, %d finished", span.trace_id, len(trace.spans), trace.num_finished)
-            return None
+            trace_spans = trace.spans
+            trace.spans = []
+            if trace.num_finished < len(trace_spans):
+                finished = []
+                for s in trace_spans:
+                    if s.finished:
+                        finished.append(s)
+                    else:
+                        trace.spans.append(s)
+
+            else:
+                finished = trace_spans
+
+            num_finished = len(finished)
+            trace.num_finished -= num_finished
+
+            if len(trace.spans) == 0:
+                del shard.traces[span.trace_id]
+
+        # DEV: The spans collected above are no longer reachable from the
+        # shard, so they can be processed and written without holding the lock.
+        if should_partial_flush:
+            log.debug("Partially flushing %d spans for trace %d", num_finished, span.trace_id)
+            finished[0].set_metric("_dd.py.partial_flush", num_finished)
+
+        if self._processing_queue is not None:
+            self._processing_queue.put(finished)
+        else:
+            _process_and_write(self._trace_processors, self._writer, finished)
+
+    def flush_processing_queue(self):
+        # type: () -> None
+        """Process the queued trace chunks, if any, in the calling thread."""
+        if self._processing_queue is not None:
+            self._processing_queue.periodic()
+
+    def stop_processing_queue(self, timeout=None):
+        # type: (Optional[float]) -> None
+        """Stop the background processing thread, if any, once the queued trace chunks have been processed."""
+        if self._processing_queue is None:
+            return
+        try:
+            self._processing_queue.stop(timeout)
+        except ServiceStatusError:
+            # The queue is started on the first trace chunk
+            self._processing_queue.periodic()
 
     def shutdown(self, timeout):
         # type: (Optional[float]) -> None
@@ -221,6 +391,7 @@ class SpanAggregator(SpanProcessor):
             before exiting or :obj:`None` to block until flushing has successfully completed (default: :obj:`None`)
         :type timeout: :obj:`int` | :obj:`float` | :obj:`None`
         """
+        self.stop_processing_queue(timeout)
         try:
             self._writer.stop(timeout)
         except ServiceStatusError:
@@ -0,0 +1,110 @@
+from typing import Any
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+import six
+
+from ..span import Span
+from ..span import _SPECIAL_TAGS
+
+
+if TYPE_CHECKING:
+    from ..span import _MetaDictType
+    from ..span import _MetricDictType
+    from ..span import _TagNameType
+
+
+class SpanPrototype(object):
+    """Constant tags to set on many spans in one shot.
+
+    The tags are converted once into the string tags and the metrics that
+    ``Span.set_tags`` would set, which are then copied to the spans. If some
+    of the tags need special handling, like ``service`` or ``manual.keep``,
+    all the tags are set with ``Span.set_tags`` instead.
+
+    A prototype is built for given tags and an optional key, and is expected
+    to be built again when either of them changes, see ``matches``. This also
+    allows spans to share the tags of a prototype instead of copying them,
+    see ``share``.
+    """
+
+    __slots__ = ("tags", "key", "meta", "metrics", "keys", "_meta_keys", "_metric_keys", "_tags", "_text_tags")
+
+    def __init__(
+        self,
+        tags=None,  # type: Optional[Dict[_TagNameType, Any]]
+        text_tags=None,  # type: Optional[Dict[_TagNameType, str]]
+        key=None,  # type: Hashable
+    ):
+        # type: (...) -> None
+        """
+        :param tags: the tags to set, like with ``Span.set_tags``.
+        :param text_tags: text tags to set after the other tags, like with ``Span._set_str_tag``.
+        :param key: what else the tags depend on.
+        """
+        self.tags = dict(tags) if tags else {}  # type: Dict[_TagNameType, Any]
+        self.key = key
+        # Tags and text tags that need to be set span by span
+        self._tags = None  # type: Optional[Dict[_TagNameType, Any]]
+        self._text_tags = []  # type: List[Tuple[_TagNameType, str]]
+
+        span = Span(None)
+        if any(k in _SPECIAL_TAGS or not isinstance(k, six.string_types) for k in self.tags):
+            self._tags = self.tags
+            if text_tags:
+                self._text_tags = list(text_tags.items())
+        else:
+            span.set_tags(self.tags)
+            if text_tags:
+                for k, v in text_tags.items():
+                    span._set_str_tag(k, v)
+
+        self.meta = span._meta  # type: _MetaDictType
+        self.metrics = span._metrics  # type: _MetricDictType
+        self._meta_keys = frozenset(self.meta)
+        self._metric_keys = frozenset(self.metrics)
+        self.keys = self._meta_keys | self._metric_keys
+
+    def matches(self, tags, key=None):
+        # type: (Optional[Dict[_TagNameType, Any]], Hashable) -> bool
+        """Return whether the prototype was built for the given tags and key."""
+        if tags:
+            return self.key == key and self.tags == tags
+        return self.key == key and not self.tags
+
+    def apply(self, span):
+        # type: (Span) -> None
+        """Set the tags of the prototype on the span."""
+        if self._tags is not None:
+            span.set_tags(self._tags)
+            for k, v in self._text_tags:
+                span._set_str_tag(k, v)
+            return
+
+        meta = span._meta
+        metrics = span._metrics
+        # DEV: Setting a tag removes the metric with the same name and vice versa
+        if self._meta_keys and metrics:
+            for k in self._meta_keys.intersection(metrics):
+                del metrics[k]
+        if self._metric_keys and meta:
+            for k in self._metric_keys.intersection(meta):
+                del meta[k]
+        meta.update(self.meta)
+        metrics.update(self.metrics)
+
+    def share(self, span):
+        # type: (Span) -> None
+        """Set the tags of the prototype on the span without copying them when possible.
+
+        The span keeps a reference to the prototype, whose tags are merged
+        with the tags of the span when they are read or encoded.
+        """
+        if self._tags is not None:
+            self.apply(span)
+        elif self.keys:
+            span._share_tags(self)
@@ -7,8 +7,8 @@ from typing import Optional
 from ...internal import atexit
 from ...internal import forksafe
 from ...settings import _config as config
-from ..agent import get_connection
 from ..agent import get_trace_url
+from ..agent import pooled_connection
 from ..compat import get_connection_response
 from ..compat import httplib
 from ..encoding import JSONEncoderV2
@@ -58,12 +58,13 @@ class TelemetryWriter(PeriodicService):
         # type: (Dict) -> httplib.HTTPResponse
         """Sends a telemetry request to the trace agent"""
         with StopWatch() as sw:
-            try:
-                conn = get_connection(self._agent_url)
+            with pooled_connection(self._agent_url) as conn:
                 rb_json = self._encoder.encode(request)
                 conn.request("POST", self.ENDPOINT, rb_json, self._create_headers(request["request_type"]))
 
                 resp = get_connection_response(conn)
+                # The response must be consumed before the connection is given back to the pool
+                resp.read()
                 log.debug(
                     "sent %d in %.5fs to %s/%s. response: %s",
                     len(rb_json),
@@ -73,8 +74,6 @@ class TelemetryWriter(PeriodicService):
                     resp.status,
                 )
                 return resp
-            finally:
-                conn.close()
 
     def _flush_integrations_queue(self):
         # type () -> List[Dict]
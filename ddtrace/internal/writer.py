@@ -1,16 +1,21 @@
 import abc
 import binascii
 from collections import defaultdict
+from collections import deque
 from json import loads
 import logging
 import os
 import sys
 import threading
+from typing import Deque
 from typing import Dict
 from typing import List
 from typing import Optional
 from typing import TYPE_CHECKING
 from typing import TextIO
+from typing import Tuple
+from typing import Type
+import zlib
 
 import six
 import tenacity
@@ -30,7 +35,7 @@ from ..sampler import BasePrioritySampler
 from ..sampler import BaseSampler
 from ._encoding import BufferFull
 from ._encoding import BufferItemTooLarge
-from .agent import get_connection
+from ._encoding import BufferedEncoder
 from .encoding import JSONEncoderV2
 from .encoding import MSGPACK_ENCODERS
 from .logger import get_logger
@@ -38,11 +43,15 @@ from .runtime import container
 from .sma import SimpleMovingAverage
 
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
 if TYPE_CHECKING:
     from ddtrace import Span
 
-    from .agent import ConnectionType
-
 
 log = get_logger(__name__)
 
@@ -58,6 +67,15 @@ DEFAULT_BUFFER_SIZE = 8 << 20  # 8 MB
 DEFAULT_MAX_PAYLOAD_SIZE = 8 << 20  # 8 MB
 DEFAULT_PROCESSING_INTERVAL = 1.0
 DEFAULT_REUSE_CONNECTIONS = False
+DEFAULT_BUFFER_COUNT = 1
+DEFAULT_BUFFER_FLUSH_THRESHOLD = None
+DEFAULT_COMPRESSION_MIN_SIZE = 1 << 16  # 64 KB
+
+# Favour speed over compression ratio as payloads are compressed on the writer
+# thread, between two flushes.
+GZIP_COMPRESSION_LEVEL = 1
+ZSTD_COMPRESSION_LEVEL = 1
+COMPRESSION_METHODS = ("gzip", "zstd")
 
 
 def get_writer_buffer_size():
@@ -75,6 +93,27 @@ def get_writer_interval_seconds():
     return float(os.getenv("DD_TRACE_WRITER_INTERVAL_SECONDS", default=DEFAULT_PROCESSING_INTERVAL))
 
 
+def get_writer_buffer_count():
+    # type: () -> int
+    return int(os.getenv("DD_TRACE_WRITER_BUFFER_COUNT", default=DEFAULT_BUFFER_COUNT))
+
+
+def get_writer_buffer_flush_threshold():
+    # type: () -> Optional[float]
+    threshold = os.getenv("DD_TRACE_WRITER_BUFFER_FLUSH_THRESHOLD", default=DEFAULT_BUFFER_FLUSH_THRESHOLD)
+    return float(threshold) if threshold is not None else None
+
+
+def get_writer_compression():
+    # type: () -> Optional[str]
+    return os.getenv("DD_TRACE_WRITER_COMPRESSION") or None
+
+
+def get_writer_compression_min_size():
+    # type: () -> int
+    return int(os.getenv("DD_TRACE_WRITER_COMPRESSION_MIN_SIZE_BYTES", default=DEFAULT_COMPRESSION_MIN_SIZE))
+
+
 def get_writer_reuse_connections():
     # type: () -> bool
     return asbool(os.getenv("DD_TRACE_WRITER_REUSE_CONNECTIONS", DEFAULT_REUSE_CONNECTIONS))
@@ -253,6 +292,10 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
         api_version=None,  # type: Optional[str]
         reuse_connections=None,  # type: Optional[bool]
         headers=None,  # type: Optional[Dict[str, str]]
+        buffer_count=None,  # type: Optional[int]
+        buffer_flush_threshold=None,  # type: Optional[float]
+        compression=None,  # type: Optional[str]
+        compression_min_size=None,  # type: Optional[int]
     ):
         # type: (...) -> None
         # Pre-conditions:
@@ -260,11 +303,40 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
             raise ValueError("Writer buffer size must be positive")
         if max_payload_size is not None and max_payload_size <= 0:
             raise ValueError("Max payload size must be positive")
+        if buffer_count is not None and buffer_count <= 0:
+            raise ValueError("Writer buffer count must be positive")
+        if buffer_flush_threshold is not None and not 0 < buffer_flush_threshold <= 1:
+            raise ValueError("Writer buffer flush threshold must be in the range (0, 1]")
+        if compression_min_size is not None and compression_min_size < 0:
+            raise ValueError("Writer compression min size must be non-negative")
 
         super(AgentWriter, self).__init__(interval=processing_interval)
         self.agent_url = agent_url
         self._buffer_size = buffer_size or get_writer_buffer_size()
         self._max_payload_size = max_payload_size or get_writer_max_payload_size()
+        self._buffer_count = buffer_count or get_writer_buffer_count()
+        self._buffer_flush_threshold = (
+            get_writer_buffer_flush_threshold() if buffer_flush_threshold is None else buffer_flush_threshold
+        )
+        # The buffer size above which the periodic thread is woken up to flush
+        # before the end of the current interval.
+        self._buffer_flush_size = (
+            int(self._buffer_size * self._buffer_flush_threshold) if self._buffer_flush_threshold is not None else None
+        )
+        self._early_flush_requested = False
+        self._compression = compression or get_writer_compression()
+        if self._compression is not None:
+            if self._compression not in COMPRESSION_METHODS:
+                raise ValueError(
+                    "Unsupported trace payload compression: '%s'. The supported methods are: %s"
+                    % (self._compression, ", ".join(COMPRESSION_METHODS))
+                )
+            if self._compression == "zstd" and zstandard is None:
+                log.warning("zstd trace payload compression requires the zstandard package, disabling compression")
+                self._compression = None
+        self._compression_min_size = (
+            get_writer_compression_min_size() if compression_min_size is None else compression_min_size
+        )
         self._sampler = sampler
         self._priority_sampler = priority_sampler
         self._headers = {
@@ -298,10 +370,7 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
                 }
             )
 
-        self._encoder = Encoder(
-            max_size=self._buffer_size,
-            max_item_size=self._max_payload_size,
-        )
+        self._create_encoders(Encoder)
         self._headers.update({"Content-Type": self._encoder.content_type})
         additional_header_str = os.environ.get("_DD_TRACE_WRITER_ADDITIONAL_HEADERS")
         if additional_header_str is not None:
@@ -311,11 +380,9 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
         self._metrics_reset()
         self._drop_sma = SimpleMovingAverage(DEFAULT_SMA_WINDOW)
         self._sync_mode = sync_mode
-        self._conn = None  # type: Optional[ConnectionType]
-        # The connection has to be locked since there exists a race between
-        # the periodic thread of AgentWriter and other threads that might
-        # force a flush with `flush_queue()`.
-        self._conn_lck = threading.RLock()  # type: threading.RLock
+        # Flushes swap the active encoder buffer so they must not interleave
+        # with each other. Writes never take this lock.
+        self._flush_lck = threading.Lock()  # type: threading.Lock
         self._retry_upload = tenacity.Retrying(
             # Retry RETRY_ATTEMPTS times within the first half of the processing
             # interval, using a Fibonacci policy with jitter
@@ -328,6 +395,44 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
         self._log_error_payloads = asbool(os.environ.get("_DD_TRACE_WRITER_LOG_ERROR_PAYLOADS", False))
         self._reuse_connections = get_writer_reuse_connections() if reuse_connections is None else reuse_connections
 
+    def _create_encoders(self, encoder_cls):
+        # type: (Type[BufferedEncoder]) -> None
+        """Allocate the ring of encoder buffers.
+
+        The active buffer is ``self._encoder`` and receives all the writes. The
+        spare buffers are swapped in on flush, so that the application threads
+        can keep writing to a fresh buffer while the previous one is encoded
+        and sent to the agent.
+        """
+        self._encoder = encoder_cls(
+            max_size=self._buffer_size,
+            max_item_size=self._max_payload_size,
+        )
+        self._spare_encoders = deque(
+            encoder_cls(
+                max_size=self._buffer_size,
+                max_item_size=self._max_payload_size,
+            )
+            for _ in range(self._buffer_count - 1)
+        )  # type: Deque[BufferedEncoder]
+
+    def _swap_encoder(self):
+        # type: () -> BufferedEncoder
+        """Replace the active encoder with a spare one and return the old one.
+
+        When there are no spare buffers the active encoder is returned and
+        writes will contend with the flush on its buffer lock.
+        """
+        encoder = self._encoder
+        if self._spare_encoders:
+            # DEV: The attribute assignment is atomic, so writers pick up either
+            # the old or the new buffer without the need of any further locking.
+            # A writer that grabbed the old buffer right before the swap will
+            # land its trace there, which is then sent when the buffer comes
+            # around the ring again.
+            self._encoder = self._spare_encoders.popleft()
+        return encoder
+
     @property
     def _agent_endpoint(self):
         return "{}/{}".format(self.agent_url, self._endpoint)
@@ -377,50 +482,33 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
             report_metrics=self._report_metrics,
             sync_mode=self._sync_mode,
             api_version=self._api_version,
+            buffer_count=self._buffer_count,
+            buffer_flush_threshold=self._buffer_flush_threshold,
+            compression=self._compression,
+            compression_min_size=self._compression_min_size,
         )
 
-    def _reset_connection(self):
-        # type: () -> None
-        with self._conn_lck:
-            if self._conn:
-                self._conn.close()
-                self._conn = None
-
     def _put(self, data, headers):
         # type: (bytes, Dict[str, str]) -> Response
         sw = StopWatch()
         sw.start()
-        with self._conn_lck:
-            if self._conn is None:
-                log.debug("creating new agent connection to %s with timeout %d", self.agent_url, self._timeout)
-                self._conn = get_connection(self.agent_url, self._timeout)
-            try:
-                self._conn.request("PUT", self._endpoint, data, headers)
-                resp = compat.get_connection_response(self._conn)
-                t = sw.elapsed()
-                if t >= self.interval:
-                    log_level = logging.WARNING
-                else:
-                    log_level = logging.DEBUG
-                log.log(log_level, "sent %s in %.5fs to %s", _human_size(len(data)), t, self._agent_endpoint)
-            except Exception:
-                # Always reset the connection when an exception occurs
-                self._reset_connection()
-                raise
+        with agent.pooled_connection(self.agent_url, self._timeout, reuse=self._reuse_connections) as conn:
+            conn.request("PUT", self._endpoint, data, headers)
+            resp = compat.get_connection_response(conn)
+            t = sw.elapsed()
+            if t >= self.interval:
+                log_level = logging.WARNING
             else:
-                return Response.from_http_response(resp)
-            finally:
-                # Reset the connection if reusing connections is disabled.
-                if not self._reuse_connections:
-                    self._reset_connection()
+                log_level = logging.DEBUG
+            log.log(log_level, "sent %s in %.5fs to %s", _human_size(len(data)), t, self._agent_endpoint)
+            # DEV: The response must be read before the connection is given
+            # back to the pool.
+            return Response.from_http_response(resp)
 
     def _downgrade(self, payload, response):
         if self._endpoint == "v0.5/traces":
             self._endpoint = "v0.4/traces"
-            self._encoder = MSGPACK_ENCODERS["v0.4"](
-                max_size=self._buffer_size,
-                max_item_size=self._max_payload_size,
-            )
+            self._create_encoders(MSGPACK_ENCODERS["v0.4"])
             # Since we have to change the encoding in this case, the payload
             # would need to be converted to the downgraded encoding before
             # sending it, but we chuck it away instead.
@@ -437,9 +525,26 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
             return payload
         raise ValueError()
 
-    def _send_payload(self, payload, count):
+    def _compress(self, payload):
+        # type: (bytes) -> Tuple[bytes, Optional[str]]
+        """Compress the payload if compression is enabled and the payload is large enough.
+
+        Returns the payload to send along with its content encoding, if any.
+        """
+        if self._compression is None or len(payload) < self._compression_min_size:
+            return payload, None
+
+        if self._compression == "gzip":
+            compressor = zlib.compressobj(GZIP_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            return compressor.compress(payload) + compressor.flush(), "gzip"
+
+        return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).compress(payload), "zstd"
+
+    def _send_payload(self, payload, count, content_encoding=None):
         headers = self._headers.copy()
         headers["X-Datadog-Trace-Count"] = str(count)
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
 
         self._metrics_dist("http.requests")
 
@@ -463,7 +568,7 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
                 )
             else:
                 if payload is not None:
-                    self._send_payload(payload, count)
+                    self._send_payload(payload, count, content_encoding)
         elif response.status >= 400:
             msg = "failed to send traces to Datadog Agent at %s: HTTP error status %s, reason %s"
             log_args = (
@@ -514,14 +619,17 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
         self._metrics_dist("writer.accepted.traces")
         self._set_keep_rate(spans)
 
+        # DEV: Hold a reference to the active buffer as it might be swapped by
+        # a concurrent flush.
+        encoder = self._encoder
         try:
-            self._encoder.put(spans)
+            encoder.put(spans)
         except BufferItemTooLarge as e:
             payload_size = e.args[0]
             log.warning(
                 "trace (%db) larger than payload buffer item limit (%db), dropping",
                 payload_size,
-                self._encoder.max_item_size,
+                encoder.max_item_size,
             )
             self._metrics_dist("buffer.dropped.traces", 1, tags=["reason:t_too_big"])
             self._metrics_dist("buffer.dropped.bytes", payload_size, tags=["reason:t_too_big"])
@@ -529,34 +637,69 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
             payload_size = e.args[0]
             log.warning(
                 "trace buffer (%s traces %db/%db) cannot fit trace of size %db, dropping",
-                len(self._encoder),
-                self._encoder.size,
-                self._encoder.max_size,
+                len(encoder),
+                encoder.size,
+                encoder.max_size,
                 payload_size,
             )
             self._metrics_dist("buffer.dropped.traces", 1, tags=["reason:full"])
             self._metrics_dist("buffer.dropped.bytes", payload_size, tags=["reason:full"])
+            if self._buffer_flush_size is not None:
+                self._request_early_flush("full")
         else:
             self._metrics_dist("buffer.accepted.traces", 1)
             self._metrics_dist("buffer.accepted.spans", len(spans))
             if self._sync_mode:
                 self.flush_queue()
+            elif self._buffer_flush_size is not None and encoder.size >= self._buffer_flush_size:
+                self._request_early_flush("threshold")
+
+    def _request_early_flush(self, reason):
+        # type: (str) -> None
+        """Wake up the periodic thread to flush the buffer before the end of the current interval."""
+        if self._sync_mode or self._early_flush_requested:
+            return
+        self._early_flush_requested = True
+        self._metrics_dist("buffer.flush.early", 1, tags=["reason:%s" % reason])
+        self.awake()
 
     def flush_queue(self, raise_exc=False):
         # type: (bool) -> None
+        with self._flush_lck:
+            self._early_flush_requested = False
+            encoder = self._swap_encoder()
+            try:
+                self._flush_encoder(encoder, raise_exc)
+            finally:
+                # DEV: The buffers might have been recreated by an API downgrade
+                # while flushing, in which case the old one is just discarded.
+                if len(self._spare_encoders) < self._buffer_count - 1:
+                    self._spare_encoders.append(encoder)
+
+    def _flush_encoder(self, encoder, raise_exc=False):
+        # type: (BufferedEncoder, bool) -> None
         try:
             try:
-                n_traces = len(self._encoder)
-                encoded = self._encoder.encode()
+                n_traces = len(encoder)
+                encoded = encoder.encode()
                 if encoded is None:
                     return
             except Exception:
-                log.error("failed to encode trace with encoder %r", self._encoder, exc_info=True)
+                log.error("failed to encode trace with encoder %r", encoder, exc_info=True)
                 self._metrics_dist("encoder.dropped.traces", n_traces)
                 return
 
             try:
-                self._retry_upload(self._send_payload, encoded, n_traces)
+                payload, content_encoding = self._compress(encoded)
+            except Exception:
+                log.warning("failed to compress trace payload, sending it uncompressed", exc_info=True)
+                payload, content_encoding = encoded, None
+            else:
+                if content_encoding is not None:
+                    self._metrics_dist("http.compressed.bytes", len(encoded) - len(payload))
+
+            try:
+                self._retry_upload(self._send_payload, payload, n_traces, content_encoding)
             except tenacity.RetryError as e:
                 self._metrics_dist("http.errors", tags=["type:err"])
                 self._metrics_dist("http.dropped.bytes", len(encoded))
@@ -592,7 +735,7 @@ class AgentWriter(periodic.PeriodicService, TraceWriter):
         self.join(timeout=timeout)
 
     def on_shutdown(self):
-        try:
+        # Go around the whole ring of buffers, as any of them might still hold
+        # traces that were written right before a buffer swap.
+        for _ in range(self._buffer_count):
             self.periodic()
-        finally:
-            self._reset_connection()
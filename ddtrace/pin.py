@@ -10,6 +10,7 @@ from .vendor import wrapt
 
 
 if TYPE_CHECKING:
+    from .internal.span_prototype import SpanPrototype
     from .tracer import Tracer
 
 
@@ -34,7 +35,7 @@ class Pin(object):
         >>> conn = sqlite.connect('/tmp/image.db')
     """
 
-    __slots__ = ["tags", "tracer", "_target", "_config", "_initialized"]
+    __slots__ = ["tags", "tracer", "_target", "_config", "_initialized", "_span_prototype"]
 
     def __init__(
         self,
@@ -53,6 +54,7 @@ class Pin(object):
         self._config = _config or {}  # type: Dict[str, Any]
         # [Backward compatibility]: service argument updates the `Pin` config
         self._config["service_name"] = service
+        self._span_prototype = None  # type: Optional[SpanPrototype]
         self._initialized = True
 
     @property
@@ -64,10 +66,24 @@ class Pin(object):
         return self._config["service_name"]
 
     def __setattr__(self, name, value):
-        if getattr(self, "_initialized", False) and name != "_target":
+        if getattr(self, "_initialized", False) and name not in ("_target", "_span_prototype"):
             raise AttributeError("can't mutate a pin, use override() or clone() instead")
         super(Pin, self).__setattr__(name, value)
 
+    def _get_span_prototype(self):
+        # type: () -> SpanPrototype
+        """Return the prototype of the spans with the tags of the pin.
+
+        The prototype is built again if the tags have changed since.
+        """
+        prototype = self._span_prototype
+        if prototype is None or not prototype.matches(self.tags):
+            # DEV: Imported here to avoid a circular import, the spans depend on the configuration
+            from .internal.span_prototype import SpanPrototype
+
+            prototype = self._span_prototype = SpanPrototype(self.tags)
+        return prototype
+
     def __repr__(self):
         return "Pin(service=%s, tags=%s, tracer=%s)" % (self.service, self.tags, self.tracer)
 
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import abc
 import os.path
+import random
 import sys
 import typing
 
@@ -66,12 +67,16 @@ class _ProfiledLock(wrapt.ObjectProxy):
     ACQUIRE_EVENT_CLASS = LockAcquireEvent
     RELEASE_EVENT_CLASS = LockReleaseEvent
 
-    def __init__(self, wrapped, recorder, tracer, max_nframes, capture_sampler, endpoint_collection_enabled):
+    def __init__(
+        self, wrapped, recorder, tracer, max_nframes, capture_sampler, endpoint_collection_enabled, capture_all=False
+    ):
         wrapt.ObjectProxy.__init__(self, wrapped)
         self._self_recorder = recorder
         self._self_tracer = tracer
         self._self_max_nframes = max_nframes
         self._self_capture_sampler = capture_sampler
+        # The lock was sampled when it was created: capture all its events
+        self._self_capture_all = capture_all
         self._self_endpoint_collection_enabled = endpoint_collection_enabled
         frame = sys._getframe(2 if WRAPT_C_EXT else 3)
         code = frame.f_code
@@ -84,7 +89,7 @@ class _ProfiledLock(wrapt.ObjectProxy):
         return self.__wrapped__.__aexit__(*args, **kwargs)
 
     def acquire(self, *args, **kwargs):
-        if not self._self_capture_sampler.capture():
+        if not self._self_capture_all and not self._self_capture_sampler.capture():
             return self.__wrapped__.acquire(*args, **kwargs)
 
         start = compat.monotonic_ns()
@@ -101,12 +106,13 @@ class _ProfiledLock(wrapt.ObjectProxy):
                 else:
                     frame = task_frame
 
-                frames, nframes = _traceback.pyframe_to_frames(frame, self._self_max_nframes)
+                stack_id, frames, nframes = _traceback.pyframe_to_stack(frame, self._self_max_nframes)
 
                 event = self.ACQUIRE_EVENT_CLASS(
                     lock_name=self._self_name,
                     frames=frames,
                     nframes=nframes,
+                    stack_id=stack_id,
                     thread_id=thread_id,
                     thread_name=thread_name,
                     task_id=task_id,
@@ -143,12 +149,13 @@ class _ProfiledLock(wrapt.ObjectProxy):
                         else:
                             frame = task_frame
 
-                        frames, nframes = _traceback.pyframe_to_frames(frame, self._self_max_nframes)
+                        stack_id, frames, nframes = _traceback.pyframe_to_stack(frame, self._self_max_nframes)
 
                         event = self.RELEASE_EVENT_CLASS(  # type: ignore[call-arg]
                             lock_name=self._self_name,
                             frames=frames,
                             nframes=nframes,
+                            stack_id=stack_id,
                             thread_id=thread_id,
                             thread_name=thread_name,
                             task_id=task_id,
@@ -187,6 +194,9 @@ class LockCollector(collector.CaptureSamplerCollector):
     endpoint_collection_enabled = attr.ib(
         factory=attr_utils.from_env("DD_PROFILING_ENDPOINT_COLLECTION_ENABLED", True, formats.asbool)
     )
+    sample_at_creation = attr.ib(
+        factory=attr_utils.from_env("DD_PROFILING_LOCK_SAMPLE_AT_CREATION", False, formats.asbool)
+    )
     tracer = attr.ib(default=None)
 
     _original = attr.ib(init=False, repr=False, type=typing.Any, cmp=False)
@@ -222,10 +232,24 @@ class LockCollector(collector.CaptureSamplerCollector):
         # Nobody should use locks from `_thread`; if they do so, then it's deliberate and we don't profile.
         self.original = self._get_original()
 
+        # When sampling at creation, the locks are sampled rather than their events: the locks that are not sampled
+        # are not wrapped so using them costs nothing, and all the events of the locks that are sampled are captured.
+        # Each lock is drawn independently so that locks created in a fixed pattern are not always picked or skipped.
+        sample_at_creation = self.sample_at_creation
+        capture_pct = self._capture_sampler.capture_pct
+
         def _allocate_lock(wrapped, instance, args, kwargs):
             lock = wrapped(*args, **kwargs)
+            if sample_at_creation and random.random() * 100 >= capture_pct:
+                return lock
             return self.PROFILED_LOCK_CLASS(
-                lock, self.recorder, self.tracer, self.nframes, self._capture_sampler, self.endpoint_collection_enabled
+                lock,
+                self.recorder,
+                self.tracer,
+                self.nframes,
+                self._capture_sampler,
+                self.endpoint_collection_enabled,
+                capture_all=sample_at_creation,
             )
 
         self._set_original(FunctionWrapper(self.original, _allocate_lock))
@@ -1,10 +1,194 @@
 #include <math.h>
 #include <stdlib.h>
+#include <string.h>
 
 #define PY_SSIZE_T_CLEAN
 #include "_memalloc_heap.h"
 #include "_memalloc_tb.h"
 
+/* A hash table that maps the pointers of the tracked allocations to their index in the array of tracked allocations.
+
+   The table uses open addressing with linear probing and is kept at most half full, so that looking up a pointer is
+   O(1). Most of the freed pointers are not tracked though, so the table is backed by a Bloom filter that rejects them
+   without probing the table: the filter is 16 times smaller than the table, which keeps it in the CPU caches. */
+typedef struct
+{
+    void* ptr;
+    TRACEBACK_ARRAY_COUNT_TYPE index;
+} heap_map_slot_t;
+
+typedef struct
+{
+    /* Slots of the table, a slot is empty if its ptr is NULL */
+    heap_map_slot_t* slots;
+    /* Number of slots, a power of 2 */
+    size_t capacity;
+    /* Bloom filter of the pointers in the table, of `capacity` bytes */
+    uint8_t* filter;
+    /* Number of pointers removed from the table since the filter was built: their bits cannot be cleared */
+    size_t filter_removals;
+} heap_map_t;
+
+/* The smallest number of slots of the table */
+#define HEAP_MAP_MIN_CAPACITY 64
+
+static inline uint64_t
+heap_map_hash(void* ptr)
+{
+    /* Finalizer of MurmurHash3: allocations are aligned, so the low bits of the pointers need to be mixed */
+    uint64_t h = (uint64_t)(uintptr_t)ptr;
+    h ^= h >> 33;
+    h *= UINT64_C(0xff51afd7ed558ccd);
+    h ^= h >> 33;
+    h *= UINT64_C(0xc4ceb9fe1a85ec53);
+    h ^= h >> 33;
+    return h;
+}
+
+/* The two bits of the filter are taken from the bits of the hash that are not used to find the slot */
+#define HEAP_MAP_FILTER_BIT1(map, h) (((h) >> 20) & ((map)->capacity * 8 - 1))
+#define HEAP_MAP_FILTER_BIT2(map, h) (((h) >> 42) & ((map)->capacity * 8 - 1))
+
+static inline bool
+heap_map_filter_test(heap_map_t* map, uint64_t bit)
+{
+    return map->filter[bit >> 3] & (1 << (bit & 7));
+}
+
+static inline void
+heap_map_filter_add(heap_map_t* map, uint64_t h)
+{
+    uint64_t bit1 = HEAP_MAP_FILTER_BIT1(map, h);
+    uint64_t bit2 = HEAP_MAP_FILTER_BIT2(map, h);
+    map->filter[bit1 >> 3] |= 1 << (bit1 & 7);
+    map->filter[bit2 >> 3] |= 1 << (bit2 & 7);
+}
+
+static void
+heap_map_init(heap_map_t* map)
+{
+    map->slots = NULL;
+    map->capacity = 0;
+    map->filter = NULL;
+    map->filter_removals = 0;
+}
+
+static void
+heap_map_wipe(heap_map_t* map)
+{
+    PyMem_RawFree(map->slots);
+    PyMem_RawFree(map->filter);
+    heap_map_init(map);
+}
+
+/* Look up the slot of a pointer, or the empty slot where it should be inserted. */
+static inline heap_map_slot_t*
+heap_map_probe(heap_map_t* map, void* ptr, uint64_t h)
+{
+    size_t mask = map->capacity - 1;
+
+    for (size_t i = h & mask;; i = (i + 1) & mask) {
+        heap_map_slot_t* slot = &map->slots[i];
+        if (slot->ptr == ptr || slot->ptr == NULL)
+            return slot;
+    }
+}
+
+/* Return the slot of a pointer, or NULL if the pointer is not in the table. */
+static inline heap_map_slot_t*
+heap_map_find(heap_map_t* map, void* ptr)
+{
+    if (map->capacity == 0 || ptr == NULL)
+        return NULL;
+
+    uint64_t h = heap_map_hash(ptr);
+
+    if (!heap_map_filter_test(map, HEAP_MAP_FILTER_BIT1(map, h)) ||
+        !heap_map_filter_test(map, HEAP_MAP_FILTER_BIT2(map, h)))
+        return NULL;
+
+    heap_map_slot_t* slot = heap_map_probe(map, ptr, h);
+    return slot->ptr ? slot : NULL;
+}
+
+/* Set the index of a pointer. The table must have room for it, see heap_map_reserve. */
+static void
+heap_map_set(heap_map_t* map, void* ptr, TRACEBACK_ARRAY_COUNT_TYPE index)
+{
+    uint64_t h = heap_map_hash(ptr);
+    heap_map_slot_t* slot = heap_map_probe(map, ptr, h);
+
+    slot->ptr = ptr;
+    slot->index = index;
+    heap_map_filter_add(map, h);
+}
+
+/* Remove a slot from the table. */
+static void
+heap_map_remove(heap_map_t* map, heap_map_slot_t* slot)
+{
+    size_t mask = map->capacity - 1;
+    size_t hole = slot - map->slots;
+
+    /* Move back the following slots that cannot be reached anymore once the slot is emptied, so that there is no
+       need for tombstones */
+    for (size_t i = (hole + 1) & mask; map->slots[i].ptr; i = (i + 1) & mask) {
+        size_t home = heap_map_hash(map->slots[i].ptr) & mask;
+        /* Move the slot unless its home is cyclically in ]hole, i] */
+        if (((i - home) & mask) >= ((i - hole) & mask)) {
+            map->slots[hole] = map->slots[i];
+            hole = i;
+        }
+    }
+
+    map->slots[hole].ptr = NULL;
+    map->filter_removals++;
+}
+
+/* Rebuild the table and its filter from the array of tracked allocations. */
+static void
+heap_map_build(heap_map_t* map, traceback_array_t* allocs)
+{
+    memset(map->slots, 0, map->capacity * sizeof(heap_map_slot_t));
+    memset(map->filter, 0, map->capacity);
+    map->filter_removals = 0;
+
+    for (TRACEBACK_ARRAY_COUNT_TYPE i = 0; i < allocs->count; i++)
+        heap_map_set(map, allocs->tab[i]->ptr, i);
+}
+
+/* Make sure that the table can hold `count` pointers.
+
+   Returns false if the table needs to grow but cannot be allocated. */
+static bool
+heap_map_reserve(heap_map_t* map, traceback_array_t* allocs, size_t count)
+{
+    if (count * 2 <= map->capacity)
+        return true;
+
+    size_t capacity = map->capacity ? map->capacity : HEAP_MAP_MIN_CAPACITY;
+    while (count * 2 > capacity)
+        capacity *= 2;
+
+    heap_map_slot_t* slots = PyMem_RawMalloc(capacity * sizeof(heap_map_slot_t));
+    uint8_t* filter = PyMem_RawMalloc(capacity);
+
+    if (slots == NULL || filter == NULL) {
+        PyMem_RawFree(slots);
+        PyMem_RawFree(filter);
+        return false;
+    }
+
+    PyMem_RawFree(map->slots);
+    PyMem_RawFree(map->filter);
+    map->slots = slots;
+    map->filter = filter;
+    map->capacity = capacity;
+    heap_map_build(map, allocs);
+
+    return true;
+}
+
 typedef struct
 {
     /* Granularity of the heap profiler in bytes */
@@ -13,6 +197,8 @@ typedef struct
     uint32_t current_sample_size;
     /* Tracked allocations */
     traceback_array_t allocs;
+    /* Index of the tracked allocations by pointer */
+    heap_map_t allocs_map;
     /* Allocated memory counter in bytes */
     uint32_t allocated_memory;
     /* True if the heap tracker is frozen */
@@ -41,6 +227,7 @@ static void
 heap_tracker_init(heap_tracker_t* heap_tracker)
 {
     traceback_array_init(&heap_tracker->allocs);
+    heap_map_init(&heap_tracker->allocs_map);
     traceback_array_init(&heap_tracker->freezer.allocs);
     ptr_array_init(&heap_tracker->freezer.frees);
     heap_tracker->allocated_memory = 0;
@@ -53,6 +240,7 @@ static void
 heap_tracker_wipe(heap_tracker_t* heap_tracker)
 {
     traceback_array_wipe(&heap_tracker->allocs);
+    heap_map_wipe(&heap_tracker->allocs_map);
     traceback_array_wipe(&heap_tracker->freezer.allocs);
     ptr_array_wipe(&heap_tracker->freezer.frees);
 }
@@ -66,38 +254,48 @@ heap_tracker_freeze(heap_tracker_t* heap_tracker)
 static void
 heap_tracker_untrack_thawed(heap_tracker_t* heap_tracker, void* ptr)
 {
-    /* This search is O(n) where `n` is the number of tracked traceback,
-       which is linearly linked to the heap size. This search could probably be
-       optimized in a couple of ways:
-
-       - sort the traceback in allocs by ptr so we can find the ptr in O(log2 n)
-       - use a Bloom filter?
-
-       That being said, we start iterating at the end of the array because most
-       of the time this is where the untracked ptr is (the most recent object
-       get de-allocated first usually). This might be a good enough
-       trade-off. */
-    for (TRACEBACK_ARRAY_COUNT_TYPE i = heap_tracker->allocs.count; i > 0; i--) {
-        traceback_t** tb = &heap_tracker->allocs.tab[i - 1];
-
-        if (ptr == (*tb)->ptr) {
-            /* Free the traceback */
-            traceback_free(*tb);
-            traceback_array_remove(&heap_tracker->allocs, tb);
-            break;
-        }
+    heap_map_t* map = &heap_tracker->allocs_map;
+    heap_map_slot_t* slot = heap_map_find(map, ptr);
+
+    if (slot == NULL)
+        return;
+
+    TRACEBACK_ARRAY_COUNT_TYPE index = slot->index;
+    traceback_t* tb = heap_tracker->allocs.tab[index];
+    heap_map_remove(map, slot);
+
+    /* Replace the traceback with the last one, so the array does not have to be shifted */
+    heap_tracker->allocs.count--;
+    if (index != heap_tracker->allocs.count) {
+        traceback_t* last = heap_tracker->allocs.tab[heap_tracker->allocs.count];
+        heap_tracker->allocs.tab[index] = last;
+        heap_map_find(map, last->ptr)->index = index;
     }
+
+    /* Rebuild the filter once enough pointers were removed, before it rejects too few untracked pointers */
+    if (map->filter_removals >= map->capacity / 4)
+        heap_map_build(map, &heap_tracker->allocs);
+
+    /* Free the traceback last: releasing its frames can free memory, and get back here */
+    traceback_free(tb);
+}
+
+/* Add a traceback to the tracked allocations. The index must have room for it, see heap_map_reserve. */
+static void
+heap_tracker_track_thawed(heap_tracker_t* heap_tracker, traceback_t* tb)
+{
+    /* If the pointer is already tracked, its previous allocation was freed without being untracked: drop it */
+    heap_tracker_untrack_thawed(heap_tracker, tb->ptr);
+    traceback_array_append(&heap_tracker->allocs, tb);
+    heap_map_set(&heap_tracker->allocs_map, tb->ptr, heap_tracker->allocs.count - 1);
 }
 
 static void
 heap_tracker_thaw(heap_tracker_t* heap_tracker)
 {
     /* Add the frozen allocs at the end */
-    traceback_array_splice(&heap_tracker->allocs,
-                           heap_tracker->allocs.count,
-                           0,
-                           heap_tracker->freezer.allocs.tab,
-                           heap_tracker->freezer.allocs.count);
+    for (TRACEBACK_ARRAY_COUNT_TYPE i = 0; i < heap_tracker->freezer.allocs.count; i++)
+        heap_tracker_track_thawed(heap_tracker, heap_tracker->freezer.allocs.tab[i]);
 
     /* Handle the frees: we need to handle the frees after we merge the allocs
        array together to be sure that there's no free in the freezer matching
@@ -168,12 +366,18 @@ memalloc_heap_track(uint16_t max_nframe, void* ptr, size_t size)
     if ((global_heap_tracker.freezer.allocs.count + global_heap_tracker.allocs.count) >= TRACEBACK_ARRAY_MAX_COUNT)
         return false;
 
+    /* Make room in the index for the allocs in the freezer too, so that thawing never needs to allocate it */
+    if (!heap_map_reserve(&global_heap_tracker.allocs_map,
+                          &global_heap_tracker.allocs,
+                          global_heap_tracker.freezer.allocs.count + global_heap_tracker.allocs.count + 1))
+        return false;
+
     traceback_t* tb = memalloc_get_traceback(max_nframe, ptr, global_heap_tracker.allocated_memory);
     if (tb) {
         if (global_heap_tracker.frozen)
             traceback_array_append(&global_heap_tracker.freezer.allocs, tb);
         else
-            traceback_array_append(&global_heap_tracker.allocs, tb);
+            heap_tracker_track_thawed(&global_heap_tracker, tb);
 
         /* Reset the counter to 0 */
         global_heap_tracker.allocated_memory = 0;
@@ -7,3 +7,12 @@ def traceback_to_frames(
     traceback: types.TracebackType, max_nframes: int
 ) -> typing.Tuple[typing.List[event.FrameType], int]: ...
 def pyframe_to_frames(frame: types.FrameType, max_nframes: int) -> typing.Tuple[typing.List[event.FrameType], int]: ...
+def traceback_to_stack(
+    traceback: types.TracebackType, max_nframes: int
+) -> typing.Tuple[int, typing.Tuple[event.FrameType, ...], int]: ...
+def pyframe_to_stack(
+    frame: types.FrameType, max_nframes: int
+) -> typing.Tuple[int, typing.Tuple[event.FrameType, ...], int]: ...
+def frames_to_stack(
+    frames: typing.Iterable[event.FrameType],
+) -> typing.Tuple[int, typing.Tuple[event.FrameType, ...]]: ...
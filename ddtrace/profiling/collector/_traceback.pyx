@@ -35,3 +35,131 @@ cpdef pyframe_to_frames(frame, max_nframes):
             frames.append((code.co_filename, lineno, code.co_name))
         frame = frame.f_back
     return frames, nframes
+
+
+# Maximum number of frames or stacks interned before the table is replaced by an empty one.
+DEF MAX_INTERNED = 65536
+
+
+cdef class _StackTable(object):
+    """Interning table for frames and stacks.
+
+    Frames captured from Python frame objects are keyed by their code object and last instruction, frames coming from
+    elsewhere by their (filename, lineno, function_name) tuple; both map to the same id for the same frame. Stacks are
+    keyed by the sequence of their frame ids and are stored once as a tuple of (filename, lineno, function_name) that
+    every event captured with this stack shares.
+    """
+
+    cdef dict frame_ids
+    cdef list frames
+    cdef list codes
+    cdef dict stacks
+
+    def __cinit__(self):
+        self.frame_ids = {}
+        self.frames = []
+        self.codes = []
+        self.stacks = {}
+
+    cdef bint full(self):
+        return len(self.frame_ids) >= MAX_INTERNED or len(self.stacks) >= MAX_INTERNED
+
+    cdef object code_frame_id(self, frame):
+        cdef unsigned long long address
+        cdef long lasti
+
+        code = frame.f_code
+        lasti = frame.f_lasti
+        # DEV: Hashing code objects is slow, so they are keyed by address and kept alive by the table. The line number
+        # is only computed the first time an instruction is seen, as this is the slowest part of walking a stack.
+        address = <size_t><void*>code
+        # Pack the address and the instruction in a single integer when they fit, which saves allocating a tuple
+        if address >> 48 == 0 and 0 <= lasti < 0x10000:
+            key = address | (<unsigned long long>lasti << 48)
+        else:
+            key = (address, lasti)
+        frame_id = self.frame_ids.get(key)
+        if frame_id is None:
+            lineno = 0 if frame.f_lineno is None else frame.f_lineno
+            frame_id = self.frame_ids[key] = self.frame_id((code.co_filename, lineno, code.co_name))
+            self.codes.append(code)
+        return frame_id
+
+    cdef object frame_id(self, frame):
+        frame_id = self.frame_ids.get(frame)
+        if frame_id is None:
+            frame_id = self.frame_ids[frame] = len(self.frames)
+            self.frames.append(tuple(frame))
+        return frame_id
+
+    cdef tuple stack(self, list frame_ids):
+        global _next_stack_id
+
+        key = tuple(frame_ids)
+        stack = self.stacks.get(key)
+        if stack is None:
+            # DEV: No Python code can run between these two statements, so stack ids are unique across threads.
+            stack_id = _next_stack_id
+            _next_stack_id += 1
+            frames = self.frames
+            stack = self.stacks[key] = (stack_id, tuple([frames[frame_id] for frame_id in frame_ids]))
+        return stack
+
+
+# Stack ids keep increasing when the table is replaced, so that events captured before and after never share one.
+cdef unsigned long long _next_stack_id = 1
+cdef _StackTable _table = _StackTable()
+
+
+cdef _StackTable _get_table():
+    global _table
+
+    if _table.full():
+        _table = _StackTable()
+    return _table
+
+
+cpdef traceback_to_stack(traceback, max_nframes):
+    """Intern the stack of a Python traceback object.
+
+    :param traceback: The traceback object to intern.
+    :param max_nframes: The maximum number of frames to intern.
+    :return: The stack id, the interned frames and the number of frames present in the original traceback.
+    """
+    cdef _StackTable table = _get_table()
+    tb = traceback
+    frame_ids = []
+    nframes = 0
+    while tb is not None:
+        if nframes < max_nframes:
+            frame_ids.append(table.code_frame_id(tb.tb_frame))
+        nframes += 1
+        tb = tb.tb_next
+    frame_ids.reverse()
+    return table.stack(frame_ids) + (nframes,)
+
+
+cpdef pyframe_to_stack(frame, max_nframes):
+    """Intern the stack of a Python frame.
+
+    :param frame: The frame object to intern.
+    :param max_nframes: The maximum number of frames to intern.
+    :return: The stack id, the interned frames and the number of frames present in the original traceback."""
+    cdef _StackTable table = _get_table()
+    frame_ids = []
+    nframes = 0
+    while frame is not None:
+        nframes += 1
+        if len(frame_ids) < max_nframes:
+            frame_ids.append(table.code_frame_id(frame))
+        frame = frame.f_back
+    return table.stack(frame_ids) + (nframes,)
+
+
+cpdef frames_to_stack(frames):
+    """Intern a list of tuple of (filename, lineno, function_name).
+
+    :param frames: The frames to intern.
+    :return: The stack id and the interned frames."""
+    cdef _StackTable table = _get_table()
+    return table.stack([table.frame_id(frame) for frame in frames])
@@ -24,13 +24,14 @@ random_range(uint64_t max)
         (p) = PyMem_RawRealloc((p), sizeof(*p) * (count));                                                             \
     } while (0)
 
+// If the new allocation size does not fit in the size type of the array, fall back to the requested size.
 #define p_grow(p, goalnb, allocnb)                                                                                     \
     do {                                                                                                               \
         if ((goalnb) > *(allocnb)) {                                                                                   \
-            if (p_alloc_nr(*(allocnb)) < (goalnb)) {                                                                   \
+            size_t alloc_nr = p_alloc_nr((size_t) * (allocnb));                                                        \
+            *(allocnb) = alloc_nr;                                                                                     \
+            if (*(allocnb) != alloc_nr || alloc_nr < (goalnb)) {                                                       \
                 *(allocnb) = (goalnb);                                                                                 \
-            } else {                                                                                                   \
-                *(allocnb) = p_alloc_nr(*(allocnb));                                                                   \
             }                                                                                                          \
             p_realloc(p, *(allocnb));                                                                                  \
         }                                                                                                              \
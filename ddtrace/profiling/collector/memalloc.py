@@ -18,6 +18,7 @@ from ddtrace.internal.utils import formats
 from ddtrace.profiling import _threading
 from ddtrace.profiling import collector
 from ddtrace.profiling import event
+from ddtrace.profiling.collector import _traceback
 
 
 LOG = logging.getLogger(__name__)
@@ -125,21 +126,23 @@ class MemoryCollector(collector.PeriodicCollector):
 
     def snapshot(self):
         thread_id_ignore_set = self._get_thread_id_ignore_set()
-        return (
-            tuple(
-                MemoryHeapSampleEvent(
-                    thread_id=thread_id,
-                    thread_name=_threading.get_thread_name(thread_id),
-                    thread_native_id=_threading.get_thread_native_id(thread_id),
-                    frames=stack,
-                    nframes=nframes,
-                    size=size,
-                    sample_size=self.heap_sample_size,
+        heap_events = []
+        for (stack, nframes, thread_id), size in _memalloc.heap():
+            if not self.ignore_profiler or thread_id not in thread_id_ignore_set:
+                stack_id, frames = _traceback.frames_to_stack(stack)
+                heap_events.append(
+                    MemoryHeapSampleEvent(
+                        thread_id=thread_id,
+                        thread_name=_threading.get_thread_name(thread_id),
+                        thread_native_id=_threading.get_thread_native_id(thread_id),
+                        frames=frames,
+                        nframes=nframes,
+                        stack_id=stack_id,
+                        size=size,
+                        sample_size=self.heap_sample_size,
+                    )
                 )
-                for (stack, nframes, thread_id), size in _memalloc.heap()
-                if not self.ignore_profiler or thread_id not in thread_id_ignore_set
-            ),
-        )
+        return (tuple(heap_events),)
 
     def collect(self):
         events, count, alloc_count = _memalloc.iter_events()
@@ -148,19 +151,21 @@ class MemoryCollector(collector.PeriodicCollector):
         # TODO: The event timestamp is slightly off since it's going to be the time we copy the data from the
         # _memalloc buffer to our Recorder. This is fine for now, but we might want to store the nanoseconds
         # timestamp in C and then return it via iter_events.
-        return (
-            tuple(
-                MemoryAllocSampleEvent(
-                    thread_id=thread_id,
-                    thread_name=_threading.get_thread_name(thread_id),
-                    thread_native_id=_threading.get_thread_native_id(thread_id),
-                    frames=stack,
-                    nframes=nframes,
-                    size=size,
-                    capture_pct=capture_pct,
-                    nevents=alloc_count,
+        alloc_events = []
+        for (stack, nframes, thread_id), size in events:
+            if not self.ignore_profiler or thread_id not in thread_id_ignore_set:
+                stack_id, frames = _traceback.frames_to_stack(stack)
+                alloc_events.append(
+                    MemoryAllocSampleEvent(
+                        thread_id=thread_id,
+                        thread_name=_threading.get_thread_name(thread_id),
+                        thread_native_id=_threading.get_thread_native_id(thread_id),
+                        frames=frames,
+                        nframes=nframes,
+                        stack_id=stack_id,
+                        size=size,
+                        capture_pct=capture_pct,
+                        nevents=alloc_count,
+                    )
                 )
-                for (stack, nframes, thread_id), size in events
-                if not self.ignore_profiler or thread_id not in thread_id_ignore_set
-            ),
-        )
+        return (tuple(alloc_events),)
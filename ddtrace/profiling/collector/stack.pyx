@@ -312,7 +312,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
             if task_id in thread_id_ignore_list:
                 continue
 
-            frames, nframes = _traceback.pyframe_to_frames(task_pyframes, max_nframes)
+            stack_id, frames, nframes = _traceback.pyframe_to_stack(task_pyframes, max_nframes)
 
             event = stack_event.StackSampleEvent(
                 thread_id=thread_id,
@@ -320,7 +320,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
                 thread_name=thread_name,
                 task_id=task_id,
                 task_name=task_name,
-                nframes=nframes, frames=frames,
+                nframes=nframes, frames=frames, stack_id=stack_id,
                 wall_time_ns=wall_time,
                 sampling_period=int(interval * 1e9),
             )
@@ -338,7 +338,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
 
         # If a thread has no task, we inject the "regular" thread samples
         if not cpu_time_accounted_for:
-            frames, nframes = _traceback.pyframe_to_frames(thread_pyframes, max_nframes)
+            stack_id, frames, nframes = _traceback.pyframe_to_stack(thread_pyframes, max_nframes)
 
             event = stack_event.StackSampleEvent(
                 thread_id=thread_id,
@@ -348,6 +348,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
                 task_name=thread_task_name,
                 nframes=nframes,
                 frames=frames,
+                stack_id=stack_id,
                 wall_time_ns=wall_time,
                 cpu_time_ns=cpu_time,
                 sampling_period=int(interval * 1e9),
@@ -359,7 +360,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
 
         if exception is not None:
             exc_type, exc_traceback = exception
-            frames, nframes = _traceback.traceback_to_frames(exc_traceback, max_nframes)
+            stack_id, frames, nframes = _traceback.traceback_to_stack(exc_traceback, max_nframes)
             exc_event = stack_event.StackExceptionSampleEvent(
                 thread_id=thread_id,
                 thread_name=thread_name,
@@ -368,6 +369,7 @@ cdef stack_collect(ignore_profiler, thread_time, max_nframes, interval, wall_tim
                 task_name=thread_task_name,
                 nframes=nframes,
                 frames=frames,
+                stack_id=stack_id,
                 sampling_period=int(interval * 1e9),
                 exc_type=exc_type,
             )
@@ -10,7 +10,7 @@ _T = typing.TypeVar("_T")
 
 # (filename, line number, function name)
 FrameType = typing.Tuple[str, int, str]
-StackTraceType = typing.List[FrameType]
+StackTraceType = typing.Sequence[FrameType]
 
 
 def event_class(
@@ -56,6 +56,8 @@ class StackBasedEvent(SampleEvent):
     task_name = attr.ib(default=None, type=typing.Optional[str])
     frames = attr.ib(default=None, type=StackTraceType)
     nframes = attr.ib(default=0, type=int)
+    # Id of the frames in the stack table of ddtrace.profiling.collector._traceback
+    stack_id = attr.ib(default=None, type=typing.Optional[int])
     local_root_span_id = attr.ib(default=None, type=typing.Optional[int])
     span_id = attr.ib(default=None, type=typing.Optional[int])
     trace_type = attr.ib(default=None, type=typing.Optional[str])
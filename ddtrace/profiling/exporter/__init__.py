@@ -15,6 +15,22 @@ class ExportError(Exception):
 class Exporter(object):
     """Exporter base class."""
 
+    aggregates = False
+    """Whether the exporter implements `aggregate`."""
+
+    def aggregate(
+        self, events  # type: recorder.EventsType
+    ):
+        # type: (...) -> None
+        """Aggregate events ahead of their export.
+
+        The events are folded into the data exported by the next call to `export`, so that they do not have to be kept
+        until then.
+
+        :param events: List of events to aggregate.
+        """
+        raise NotImplementedError
+
     def export(
         self,
         events,  # type: recorder.EventsType
@@ -1,4 +1,3 @@
-import gzip
 import os
 
 import attr
@@ -21,7 +20,7 @@ class PprofFileExporter(pprof.PprofExporter):
         start_time_ns,  # type: int
         end_time_ns,  # type: int
     ):
-        # type: (...) -> pprof.pprof_ProfileType
+        # type: (...) -> None
         """Export events to pprof file.
 
         The file name is based on the prefix passed to init. The process ID number and type of export is then added as a
@@ -31,8 +30,7 @@ class PprofFileExporter(pprof.PprofExporter):
         :param start_time_ns: The start time of recording.
         :param end_time_ns: The end time of recording.
         """
-        profile = super(PprofFileExporter, self).export(events, start_time_ns, end_time_ns)
-        with gzip.open(self.prefix + (".%d.%d" % (os.getpid(), self._increment)), "wb") as f:
-            f.write(profile.SerializeToString())
+        profile = self._serialize(events, start_time_ns, end_time_ns, compress=True)
+        with open(self.prefix + (".%d.%d" % (os.getpid(), self._increment)), "wb") as f:
+            f.write(profile)
         self._increment += 1
-        return profile
@@ -1,7 +1,6 @@
 # -*- encoding: utf-8 -*-
 import binascii
 import datetime
-import gzip
 import itertools
 import os
 import platform
@@ -150,7 +149,7 @@ class PprofHTTPExporter(pprof.PprofExporter):
         start_time_ns,  # type: int
         end_time_ns,  # type: int
     ):
-        # type: (...) -> pprof.pprof_ProfileType
+        # type: (...) -> None
         """Export events to an HTTP endpoint.
 
         :param events: The event dictionary from a `ddtrace.profiling.recorder.Recorder`.
@@ -167,10 +166,7 @@ class PprofHTTPExporter(pprof.PprofExporter):
         if self._container_info and self._container_info.container_id:
             headers["Datadog-Container-Id"] = self._container_info.container_id
 
-        profile = super(PprofHTTPExporter, self).export(events, start_time_ns, end_time_ns)
-        s = six.BytesIO()
-        with gzip.GzipFile(fileobj=s, mode="wb") as gz:
-            gz.write(profile.SerializeToString())
+        profile = self._serialize(events, start_time_ns, end_time_ns, compress=True)
         fields = {
             "version": b"3",
             "family": b"python",
@@ -183,30 +179,25 @@ class PprofHTTPExporter(pprof.PprofExporter):
             ).encode(),
         }
 
-        service = self.service or os.path.basename(profile.string_table[profile.mapping[0].filename])
+        service = self.service or os.path.basename(pprof._get_program_name())
 
         content_type, body = self._encode_multipart_formdata(
             fields,
             tags=self._get_tags(service),
-            data={b"auto.pprof": s.getvalue()},
+            data={b"auto.pprof": profile},
         )
         headers["Content-Type"] = content_type
 
-        client = agent.get_connection(self.endpoint, self.timeout)
-        self._upload(client, self.endpoint_path, body, headers)
+        self._upload(self.endpoint_path, body, headers)
 
-        return profile
+    def _upload(self, path, body, headers):
+        self._retry_upload(self._upload_once, path, body, headers)
 
-    def _upload(self, client, path, body, headers):
-        self._retry_upload(self._upload_once, client, path, body, headers)
-
-    def _upload_once(self, client, path, body, headers):
-        try:
+    def _upload_once(self, path, body, headers):
+        with agent.pooled_connection(self.endpoint, self.timeout) as client:
             client.request("POST", path, body=body, headers=headers)
             response = client.getresponse()
             response.read()  # reading is mandatory
-        finally:
-            client.close()
 
         if 200 <= response.status < 300:
             return
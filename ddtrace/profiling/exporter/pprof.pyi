@@ -3,9 +3,6 @@ from typing import Any
 
 from ddtrace.profiling import exporter
 from ddtrace.profiling import recorder as recorder
-from ddtrace.profiling.collector import memalloc
-from ddtrace.profiling.collector import stack_event
-from ddtrace.profiling.collector import threading
 
 class _Sequence:
     start_at: Any = ...
@@ -28,21 +25,17 @@ class _StringTable:
     def __gt__(self, other: Any) -> Any: ...
     def __ge__(self, other: Any) -> Any: ...
 
-class pprof_LocationType:
-    id: int
-
 class pprof_Mapping:
     filename: int
 
+def _get_program_name() -> str: ...
+
 class pprof_ProfileType:
     id: int
     string_table: typing.Dict[int, str]
     mapping: typing.List[pprof_Mapping]
     def SerializeToString(self) -> bytes: ...
 
-class pprof_FunctionType:
-    id: int
-
 HashableStackTraceType: Any
 
 class _PprofConverter:
@@ -59,7 +52,9 @@ class _PprofConverter:
         trace_type: str,
         frames: HashableStackTraceType,
         nframes: int,
-        samples: typing.List[stack_event.StackSampleEvent],
+        nb_samples: int,
+        cpu_time_ns: int,
+        wall_time_ns: int,
     ) -> None: ...
     def convert_memalloc_event(
         self,
@@ -68,9 +63,18 @@ class _PprofConverter:
         thread_name: str,
         frames: HashableStackTraceType,
         nframes: int,
-        events: typing.List[memalloc.MemoryAllocSampleEvent],
+        nb_samples: float,
+        size: float,
+    ) -> None: ...
+    def convert_memalloc_heap_event(
+        self,
+        thread_id: str,
+        thread_native_id: str,
+        thread_name: str,
+        frames: HashableStackTraceType,
+        nframes: int,
+        size: int,
     ) -> None: ...
-    def convert_memalloc_heap_event(self, event: memalloc.MemoryHeapSampleEvent) -> None: ...
     def convert_lock_acquire_event(
         self,
         lock_name: str,
@@ -84,7 +88,8 @@ class _PprofConverter:
         trace_type: str,
         frames: HashableStackTraceType,
         nframes: int,
-        events: typing.List[threading.ThreadingLockAcquireEvent],
+        nb_events: int,
+        wait_time_ns: int,
         sampling_ratio: float,
     ) -> None: ...
     def convert_lock_release_event(
@@ -100,7 +105,8 @@ class _PprofConverter:
         trace_type: str,
         frames: HashableStackTraceType,
         nframes: int,
-        events: typing.List[threading.ThreadingLockReleaseEvent],
+        nb_events: int,
+        locked_for_ns: int,
         sampling_ratio: float,
     ) -> None: ...
     def convert_stack_exception_event(
@@ -115,7 +121,7 @@ class _PprofConverter:
         frames: HashableStackTraceType,
         nframes: int,
         exc_type_name: str,
-        events: typing.List[stack_event.StackExceptionSampleEvent],
+        nb_events: int,
     ) -> None: ...
     def __init__(
         self,
@@ -136,7 +142,12 @@ LockEventGroupKey: Any
 StackExceptionEventGroupKey: Any
 
 class PprofExporter(exporter.Exporter):
+    aggregates: bool
+    def aggregate(self, events: recorder.EventsType) -> None: ...
     def export(self, events: recorder.EventsType, start_time_ns: int, end_time_ns: int) -> pprof_ProfileType: ...
+    def _serialize(
+        self, events: recorder.EventsType, start_time_ns: int, end_time_ns: int, compress: bool = ...
+    ) -> bytes: ...
     def __init__(self) -> None: ...
     def __lt__(self, other: Any) -> Any: ...
     def __le__(self, other: Any) -> Any: ...
@@ -1,7 +1,15 @@
 import collections
-import itertools
 import operator
 import typing
+import zlib
+
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.mem cimport PyMem_Free
+from cpython.mem cimport PyMem_Malloc
+from cpython.mem cimport PyMem_Realloc
+from libc.stdint cimport int64_t
+from libc.stdint cimport uint64_t
+from libc.string cimport memcpy
 
 import attr
 import six
@@ -37,7 +45,9 @@ else:
 
 _ITEMGETTER_ZERO = operator.itemgetter(0)
 _ITEMGETTER_ONE = operator.itemgetter(1)
-_ATTRGETTER_ID = operator.attrgetter("id")
+
+# Sample types whose values are estimated from the sampled events, and rounded once summed
+_ROUNDED_SAMPLE_TYPES = frozenset(("alloc-samples", "alloc-space"))
 
 
 @attr.s
@@ -81,17 +91,16 @@ def _none_to_str(value: typing.Any) -> str:
     return str(value)
 
 
+def _get_program_name() -> str:
+    return config.get_application_name() or "<unknown program>"
+
+
 def _get_thread_name(thread_id: typing.Optional[int], thread_name: typing.Optional[str]) -> str:
     if thread_name is None:
         return "Anonymous Thread %s" % ("?" if thread_id is None else str(thread_id))
     return thread_name
 
 
-class pprof_LocationType(object):
-    # pprof_pb2.Location
-    id: int
-
-
 class pprof_Mapping(object):
     filename: int
 
@@ -106,9 +115,217 @@ class pprof_ProfileType(object):
         ...
 
 
-class pprof_FunctionType(object):
-    # pprof_pb2.Function
-    id: int
+DEF WRITER_BUFFER_SIZE = 64 * 1024
+
+# Wire types of the protobuf encoding
+DEF VARINT = 0
+DEF LENGTH_DELIMITED = 2
+
+
+cdef inline size_t _varint_size(uint64_t value):
+    cdef size_t size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+cdef inline size_t _int_field_size(int field, int64_t value):
+    # DEV: Fields with a default value are not serialized with proto3
+    if value == 0:
+        return 0
+    return _varint_size(field << 3) + _varint_size(<uint64_t>value)
+
+
+cdef inline size_t _message_field_size(int field, size_t size):
+    return _varint_size(field << 3) + _varint_size(size) + size
+
+
+cdef class _ProtobufWriter(object):
+    """Write the fields of a protobuf message in the wire format into a growable buffer.
+
+    Nested messages are written by writing their key and size first, so their size has to be computed beforehand.
+    """
+
+    cdef char *data
+    cdef size_t length
+    cdef size_t capacity
+
+    def __cinit__(self):
+        self.data = <char*> PyMem_Malloc(WRITER_BUFFER_SIZE)
+        if self.data == NULL:
+            raise MemoryError("Unable to allocate internal buffer.")
+        self.capacity = WRITER_BUFFER_SIZE
+        self.length = 0
+
+    def __dealloc__(self):
+        PyMem_Free(self.data)
+
+    cdef int reserve(self, size_t size) except -1:
+        cdef size_t capacity = self.capacity
+        cdef char *data
+
+        if self.length + size <= capacity:
+            return 0
+        while self.length + size > capacity:
+            capacity *= 2
+        data = <char*> PyMem_Realloc(self.data, capacity)
+        if data == NULL:
+            raise MemoryError("Unable to grow internal buffer.")
+        self.data = data
+        self.capacity = capacity
+        return 0
+
+    cdef int varint(self, uint64_t value) except -1:
+        # A varint is at most 10 bytes long
+        self.reserve(10)
+        while value >= 0x80:
+            self.data[self.length] = <char>((value & 0x7F) | 0x80)
+            self.length += 1
+            value >>= 7
+        self.data[self.length] = <char>value
+        self.length += 1
+        return 0
+
+    cdef int key(self, int field, int wire_type) except -1:
+        return self.varint((field << 3) | wire_type)
+
+    cdef int int_field(self, int field, int64_t value) except -1:
+        if value != 0:
+            self.key(field, VARINT)
+            self.varint(<uint64_t>value)
+        return 0
+
+    cdef int message_field(self, int field, size_t size) except -1:
+        self.key(field, LENGTH_DELIMITED)
+        return self.varint(size)
+
+    cdef int bytes_field(self, int field, bytes value) except -1:
+        cdef size_t size = len(value)
+
+        self.message_field(field, size)
+        self.reserve(size)
+        memcpy(self.data + self.length, <char*>value, size)
+        self.length += size
+        return 0
+
+    cdef int packed_field(self, int field, tuple values) except -1:
+        cdef size_t size = 0
+
+        if not values:
+            return 0
+        for value in values:
+            size += _varint_size(<uint64_t><int64_t>value)
+        self.message_field(field, size)
+        for value in values:
+            self.varint(<uint64_t><int64_t>value)
+        return 0
+
+    cdef bytes flush(self):
+        """Return the content of the buffer and empty it."""
+        value = PyBytes_FromStringAndSize(self.data, self.length)
+        self.length = 0
+        return value
+
+
+cdef size_t _packed_field_size(int field, tuple values):
+    cdef size_t size = 0
+
+    if not values:
+        return 0
+    for value in values:
+        size += _varint_size(<uint64_t><int64_t>value)
+    return _message_field_size(field, size)
+
+
+cdef class _ProfileWriter(object):
+    """Write a pprof profile, optionally compressed with gzip.
+
+    The profile is compressed as it is written, so that only a bounded part of it is kept uncompressed in memory.
+    """
+
+    cdef _ProtobufWriter writer
+    cdef object compressor
+    cdef list chunks
+
+    def __cinit__(self, bint compress):
+        self.writer = _ProtobufWriter()
+        # DEV: 31 is the window size of zlib with a gzip header and trailer
+        self.compressor = zlib.compressobj(9, zlib.DEFLATED, 31) if compress else None
+        self.chunks = []
+
+    cdef int _maybe_compress(self) except -1:
+        if self.compressor is not None and self.writer.length >= WRITER_BUFFER_SIZE:
+            self.chunks.append(self.compressor.compress(self.writer.flush()))
+        return 0
+
+    cdef int value_type(self, int field, int64_t type_, int64_t unit) except -1:
+        self.writer.message_field(field, _int_field_size(1, type_) + _int_field_size(2, unit))
+        self.writer.int_field(1, type_)
+        self.writer.int_field(2, unit)
+        return 0
+
+    cdef int sample(self, tuple location_ids, tuple values, list labels) except -1:
+        cdef size_t size
+        cdef size_t label_size
+        cdef list label_sizes = []
+
+        size = _packed_field_size(1, location_ids) + _packed_field_size(2, values)
+        for key, str_ in labels:
+            label_size = _int_field_size(1, key) + _int_field_size(2, str_)
+            label_sizes.append(label_size)
+            size += _message_field_size(3, label_size)
+
+        self.writer.message_field(2, size)
+        self.writer.packed_field(1, location_ids)
+        self.writer.packed_field(2, values)
+        for (key, str_), label_size in zip(labels, label_sizes):
+            self.writer.message_field(3, label_size)
+            self.writer.int_field(1, key)
+            self.writer.int_field(2, str_)
+        return self._maybe_compress()
+
+    cdef int mapping(self, int64_t id_, int64_t filename) except -1:
+        self.writer.message_field(3, _int_field_size(1, id_) + _int_field_size(5, filename))
+        self.writer.int_field(1, id_)
+        self.writer.int_field(5, filename)
+        return self._maybe_compress()
+
+    cdef int location(self, int64_t id_, int64_t function_id, int64_t line) except -1:
+        cdef size_t line_size = _int_field_size(1, function_id) + _int_field_size(2, line)
+
+        self.writer.message_field(4, _int_field_size(1, id_) + _message_field_size(4, line_size))
+        self.writer.int_field(1, id_)
+        self.writer.message_field(4, line_size)
+        self.writer.int_field(1, function_id)
+        self.writer.int_field(2, line)
+        return self._maybe_compress()
+
+    cdef int function(self, int64_t id_, int64_t name, int64_t filename) except -1:
+        self.writer.message_field(
+            5, _int_field_size(1, id_) + _int_field_size(2, name) + _int_field_size(4, filename)
+        )
+        self.writer.int_field(1, id_)
+        self.writer.int_field(2, name)
+        self.writer.int_field(4, filename)
+        return self._maybe_compress()
+
+    cdef int string(self, str string) except -1:
+        IF PY_MAJOR_VERSION >= 3:
+            self.writer.bytes_field(6, string.encode("utf-8", "backslashreplace"))
+        ELSE:
+            self.writer.bytes_field(6, string)
+        return self._maybe_compress()
+
+    cdef int int_field(self, int field, int64_t value) except -1:
+        return self.writer.int_field(field, value)
+
+    cdef bytes getvalue(self):
+        if self.compressor is None:
+            return self.writer.flush()
+        self.chunks.append(self.compressor.compress(self.writer.flush()))
+        self.chunks.append(self.compressor.flush())
+        return b"".join(self.chunks)
 
 
 _Label_T = typing.Tuple[str, str]
@@ -123,11 +340,13 @@ HashableStackTraceType = typing.Tuple[event.FrameType, ...]
 class _PprofConverter(object):
     """Convert stacks generated by a Profiler to pprof format."""
 
-    # Those attributes will be serialize in a `pprof_pb2.Profile`
+    # Those attributes will be serialized as the functions and locations of a pprof profile.
+    # A function is stored as (id, name string id, filename string id).
     _functions = attr.ib(
-        init=False, factory=dict, type=typing.Dict[typing.Tuple[str, typing.Optional[str]], pprof_FunctionType]
+        init=False, factory=dict, type=typing.Dict[typing.Tuple[str, typing.Optional[str]], typing.Tuple[int, int, int]]
     )
-    _locations = attr.ib(init=False, factory=dict, type=typing.Dict[event.FrameType, pprof_LocationType])
+    # A location is stored as (id, function id, line number).
+    _locations = attr.ib(init=False, factory=dict, type=typing.Dict[event.FrameType, typing.Tuple[int, int, int]])
     _string_table = attr.ib(init=False, factory=_StringTable)
 
     _last_location_id = attr.ib(init=False, factory=_Sequence)
@@ -141,43 +360,37 @@ class _PprofConverter(object):
         repr=False,
         type=typing.DefaultDict[_Location_Key_T, typing.DefaultDict[str, int]],
     )
+    # The sampling ratio of the sample types whose sums are scaled when the profile is built.
+    _sampling_ratios = attr.ib(init=False, factory=dict, repr=False, type=typing.Dict[str, float])
 
-    def _to_Function(
+    def _to_function_id(
         self,
         filename: str,
         funcname: str,
-    ) -> pprof_FunctionType:
+    ) -> int:
         try:
-            return self._functions[(filename, funcname)]
+            return self._functions[(filename, funcname)][0]
         except KeyError:
-            func = pprof_pb2.Function(  # type: ignore[attr-defined]
-                id=self._last_func_id.generate(),
-                name=self._str(funcname),
-                filename=self._str(filename),
-            )
-            self._functions[(filename, funcname)] = func
-            return func
+            function_id = self._last_func_id.generate()
+            self._functions[(filename, funcname)] = (function_id, self._str(funcname), self._str(filename))
+            return function_id
 
-    def _to_Location(
+    def _to_location_id(
         self,
         filename: str,
         lineno: int,
         funcname: str,
-    ) -> pprof_LocationType:
+    ) -> int:
         try:
-            return self._locations[(filename, lineno, funcname)]
+            return self._locations[(filename, lineno, funcname)][0]
         except KeyError:
-            location = pprof_pb2.Location(  # type: ignore[attr-defined]
-                id=self._last_location_id.generate(),
-                line=[
-                    pprof_pb2.Line(  # type: ignore[attr-defined]
-                        function_id=self._to_Function(filename, funcname).id,
-                        line=lineno,
-                    ),
-                ],
+            location_id = self._last_location_id.generate()
+            self._locations[(filename, lineno, funcname)] = (
+                location_id,
+                self._to_function_id(filename, funcname),
+                lineno,
             )
-            self._locations[(filename, lineno, funcname)] = location
-            return location
+            return location_id
 
     def _str(self, string: str) -> int:
         """Convert a string to an id from the string table."""
@@ -189,12 +402,12 @@ class _PprofConverter(object):
         nframes,  # type: int
     ):
         # type: (...) -> typing.Tuple[int, ...]
-        locations = [self._to_Location(filename, lineno, funcname).id for filename, lineno, funcname in frames]
+        locations = [self._to_location_id(filename, lineno, funcname) for filename, lineno, funcname in frames]
 
         omitted = nframes - len(frames)
         if omitted:
             locations.append(
-                self._to_Location("", 0, "<%d frame%s omitted>" % (omitted, ("s" if omitted > 1 else ""))).id
+                self._to_location_id("", 0, "<%d frame%s omitted>" % (omitted, ("s" if omitted > 1 else "")))
             )
 
         return tuple(locations)
@@ -212,7 +425,9 @@ class _PprofConverter(object):
         trace_type,  # type: str
         frames,  # type: HashableStackTraceType
         nframes,  # type: int
-        samples,  # type: typing.List[stack_event.StackSampleEvent]
+        nb_samples,  # type: int
+        cpu_time_ns,  # type: int
+        wall_time_ns,  # type: int
     ):
         # type: (...) -> None
         location_key = (
@@ -230,9 +445,9 @@ class _PprofConverter(object):
             ),
         )
 
-        self._location_values[location_key]["cpu-samples"] = len(samples)
-        self._location_values[location_key]["cpu-time"] = sum(s.cpu_time_ns for s in samples)
-        self._location_values[location_key]["wall-time"] = sum(s.wall_time_ns for s in samples)
+        self._location_values[location_key]["cpu-samples"] += nb_samples
+        self._location_values[location_key]["cpu-time"] += cpu_time_ns
+        self._location_values[location_key]["wall-time"] += wall_time_ns
 
     def convert_memalloc_event(
         self,
@@ -241,7 +456,8 @@ class _PprofConverter(object):
         thread_name,  # type: str
         frames,  # type: HashableStackTraceType
         nframes,  # type: int
-        events,  # type: typing.List[memalloc.MemoryAllocSampleEvent]
+        nb_samples,  # type: float
+        size,  # type: float
     ):
         # type: (...) -> None
         location_key = (
@@ -253,26 +469,32 @@ class _PprofConverter(object):
             ),
         )
 
-        self._location_values[location_key]["alloc-samples"] = round(
-            sum(event.nevents * (event.capture_pct / 100.0) for event in events)
-        )
-        self._location_values[location_key]["alloc-space"] = round(
-            sum(event.size / event.capture_pct * 100.0 for event in events)
-        )
+        # DEV: The sums are rounded when the profile is built, see _sample_value
+        self._location_values[location_key]["alloc-samples"] += nb_samples
+        self._location_values[location_key]["alloc-space"] += size
 
-    def convert_memalloc_heap_event(self, event: memalloc.MemoryHeapSampleEvent) -> None:
+    def convert_memalloc_heap_event(
+        self,
+        thread_id,  # type: str
+        thread_native_id,  # type: str
+        thread_name,  # type: str
+        frames,  # type: HashableStackTraceType
+        nframes,  # type: int
+        size,  # type: int
+    ):
+        # type: (...) -> None
         location_key = (
-            self._to_locations(tuple(event.frames), event.nframes),
+            self._to_locations(frames, nframes),
             (
-                ("thread id", _none_to_str(event.thread_id)),
-                ("thread native id", _none_to_str(event.thread_native_id)),
-                ("thread name", _get_thread_name(event.thread_id, event.thread_name)),
+                ("thread id", thread_id),
+                ("thread native id", thread_native_id),
+                ("thread name", thread_name),
             ),
         )
 
-        self._location_values[location_key]["heap-space"] += event.size
+        self._location_values[location_key]["heap-space"] += size
 
-    def convert_lock_acquire_event(
+    def _convert_lock_event(
         self,
         lock_name,  # type: str
         thread_id,  # type: str
@@ -285,8 +507,11 @@ class _PprofConverter(object):
         trace_type,  # type: str
         frames,  # type: HashableStackTraceType
         nframes,  # type: int
-        events,  # type: typing.List[_lock.LockAcquireEvent]
+        nb_events,  # type: int
+        time_ns,  # type: int
         sampling_ratio,  # type: float
+        count_type,  # type: str
+        time_type,  # type: str
     ):
         # type: (...) -> None
         location_key = (
@@ -304,12 +529,11 @@ class _PprofConverter(object):
             ),
         )
 
-        self._location_values[location_key]["lock-acquire"] = len(events)
-        self._location_values[location_key]["lock-acquire-wait"] = int(
-            sum(e.wait_time_ns for e in events) / sampling_ratio
-        )
+        self._location_values[location_key][count_type] += nb_events
+        self._location_values[location_key][time_type] += time_ns
+        self._sampling_ratios[time_type] = sampling_ratio
 
-    def convert_lock_release_event(
+    def convert_lock_acquire_event(
         self,
         lock_name,  # type: str
         thread_id,  # type: str
@@ -322,28 +546,65 @@ class _PprofConverter(object):
         trace_type,  # type: str
         frames,  # type: HashableStackTraceType
         nframes,  # type: int
-        events,  # type: typing.List[_lock.LockReleaseEvent]
+        nb_events,  # type: int
+        wait_time_ns,  # type: int
         sampling_ratio,  # type: float
     ):
         # type: (...) -> None
-        location_key = (
-            self._to_locations(frames, nframes),
-            (
-                ("thread id", thread_id),
-                ("thread name", thread_name),
-                ("task id", task_id),
-                ("task name", task_name),
-                ("local root span id", local_root_span_id),
-                ("span id", span_id),
-                ("trace endpoint", trace_resource),
-                ("trace type", trace_type),
-                ("lock name", lock_name),
-            ),
+        self._convert_lock_event(
+            lock_name,
+            thread_id,
+            thread_name,
+            task_id,
+            task_name,
+            local_root_span_id,
+            span_id,
+            trace_resource,
+            trace_type,
+            frames,
+            nframes,
+            nb_events,
+            wait_time_ns,
+            sampling_ratio,
+            "lock-acquire",
+            "lock-acquire-wait",
         )
 
-        self._location_values[location_key]["lock-release"] = len(events)
-        self._location_values[location_key]["lock-release-hold"] = int(
-            sum(e.locked_for_ns for e in events) / sampling_ratio
+    def convert_lock_release_event(
+        self,
+        lock_name,  # type: str
+        thread_id,  # type: str
+        thread_name,  # type: str
+        task_id,  # type: str
+        task_name,  # type: str
+        local_root_span_id,  # type: str
+        span_id,  # type: str
+        trace_resource,  # type: str
+        trace_type,  # type: str
+        frames,  # type: HashableStackTraceType
+        nframes,  # type: int
+        nb_events,  # type: int
+        locked_for_ns,  # type: int
+        sampling_ratio,  # type: float
+    ):
+        # type: (...) -> None
+        self._convert_lock_event(
+            lock_name,
+            thread_id,
+            thread_name,
+            task_id,
+            task_name,
+            local_root_span_id,
+            span_id,
+            trace_resource,
+            trace_type,
+            frames,
+            nframes,
+            nb_events,
+            locked_for_ns,
+            sampling_ratio,
+            "lock-release",
+            "lock-release-hold",
         )
 
     def convert_stack_exception_event(
@@ -358,7 +619,7 @@ class _PprofConverter(object):
         frames: HashableStackTraceType,
         nframes: int,
         exc_type_name: str,
-        events: typing.List[stack_event.StackExceptionSampleEvent],
+        nb_events: int,
     ) -> None:
         location_key = (
             self._to_locations(frames, nframes),
@@ -374,7 +635,16 @@ class _PprofConverter(object):
             ),
         )
 
-        self._location_values[location_key]["exception-samples"] = len(events)
+        self._location_values[location_key]["exception-samples"] += nb_events
+
+    def _sample_value(self, sample_type: str, values: typing.Dict[str, int]) -> int:
+        """Return the value of a sample type, once all the events of a sample have been summed."""
+        value = values.get(sample_type, 0)
+        if sample_type in self._sampling_ratios:
+            return int(value / self._sampling_ratios[sample_type])
+        if sample_type in _ROUNDED_SAMPLE_TYPES:
+            return round(value)
+        return value
 
     def _build_profile(
         self,
@@ -383,42 +653,238 @@ class _PprofConverter(object):
         period: typing.Optional[int],
         sample_types: typing.Tuple[typing.Tuple[str, str], ...],
         program_name: str,
-    ) -> pprof_ProfileType:
-        pprof_sample_type = [
-            pprof_pb2.ValueType(type=self._str(type_), unit=self._str(unit)) for type_, unit in sample_types  # type: ignore[attr-defined]
-        ]
-
-        sample = [
-            pprof_pb2.Sample(  # type: ignore[attr-defined]
-                location_id=locations,
-                value=[values.get(sample_type_name, 0) for sample_type_name, unit in sample_types],
-                label=[pprof_pb2.Label(key=self._str(key), str=self._str(s)) for key, s in labels],  # type: ignore[attr-defined]
+        compress: bool = False,
+    ) -> bytes:
+        """Serialize the profile in the pprof format.
+
+        The profile is written field by field in the protobuf wire format, without building any message object.
+
+        :param compress: Whether to compress the profile with gzip.
+        :return: The serialized profile.
+        """
+        cdef _ProfileWriter writer = _ProfileWriter(compress)
+
+        # DEV: All the strings have to be in the string table before it is written, and they are added in the same
+        # order as when the profile was built with protobuf messages so that the output does not change.
+        pprof_sample_type = [(self._str(type_), self._str(unit)) for type_, unit in sample_types]
+
+        # Labels are shared by many samples, so their string ids are looked up once
+        label_ids = {}
+        sample = []
+        for (locations, labels), values in sorted(six.iteritems(self._location_values), key=_ITEMGETTER_ZERO):
+            pprof_labels = []
+            for label in labels:
+                try:
+                    pprof_labels.append(label_ids[label])
+                except KeyError:
+                    label_id = label_ids[label] = (self._str(label[0]), self._str(label[1]))
+                    pprof_labels.append(label_id)
+            sample.append(
+                (
+                    locations,
+                    tuple(self._sample_value(sample_type_name, values) for sample_type_name, unit in sample_types),
+                    pprof_labels,
+                )
             )
-            for (locations, labels), values in sorted(six.iteritems(self._location_values), key=_ITEMGETTER_ZERO)
-        ]
-
-        period_type = pprof_pb2.ValueType(type=self._str("time"), unit=self._str("nanoseconds"))  # type: ignore[attr-defined]
-
-        # WARNING: no code should use _str() here as once the _string_table is serialized below,
-        # it won't be updated if you call _str later in the code here
-        return pprof_pb2.Profile(  # type: ignore[attr-defined]
-            sample_type=pprof_sample_type,
-            sample=sample,
-            mapping=[
-                pprof_pb2.Mapping(  # type: ignore[attr-defined]
-                    id=1,
-                    filename=self._str(program_name),
-                ),
-            ],
-            # Sort location and function by id so the output is reproducible
-            location=sorted(self._locations.values(), key=_ATTRGETTER_ID),
-            function=sorted(self._functions.values(), key=_ATTRGETTER_ID),
-            string_table=list(self._string_table),
-            time_nanos=start_time_ns,
-            duration_nanos=duration_ns,
-            period=period,
-            period_type=period_type,
-        )
+
+        period_type = (self._str("time"), self._str("nanoseconds"))
+        mapping_filename = self._str(program_name)
+
+        # Fields are written in the order of their number, like protobuf does
+        for type_, unit in pprof_sample_type:
+            writer.value_type(1, type_, unit)
+        for locations, values, labels in sample:
+            writer.sample(locations, values, labels)
+        writer.mapping(1, mapping_filename)
+        # Sort location and function by id so the output is reproducible
+        for location_id, function_id, lineno in sorted(self._locations.values(), key=_ITEMGETTER_ZERO):
+            writer.location(location_id, function_id, lineno)
+        for function_id, name, filename in sorted(self._functions.values(), key=_ITEMGETTER_ZERO):
+            writer.function(function_id, name, filename)
+        # WARNING: no code should use _str() from here as the _string_table is serialized
+        for string in self._string_table:
+            writer.string(string)
+        writer.int_field(9, start_time_ns)
+        writer.int_field(10, duration_ns)
+        writer.value_type(11, period_type[0], period_type[1])
+        if period is not None:
+            writer.int_field(12, period)
+
+        return writer.getvalue()
+
+
+def _stack_key(event: event.StackBasedEvent) -> typing.Hashable:
+    # Events captured by the collectors carry the id of their interned stack
+    if event.stack_id is None:
+        return tuple(event.frames)
+    return event.stack_id
+
+
+def _stack_event_id_key(event: event.StackBasedEvent) -> typing.Tuple[typing.Any, ...]:
+    return (
+        event.thread_id,
+        event.thread_native_id,
+        event.thread_name,
+        event.task_id,
+        event.task_name,
+        event.local_root_span_id,
+        event.span_id,
+        event.trace_type,
+        id(event.trace_resource_container),
+        _stack_key(event),
+        event.nframes,
+    )
+
+
+def _lock_event_id_key(event: _lock.LockEventBase) -> typing.Tuple[typing.Any, ...]:
+    return (
+        event.lock_name,
+        event.thread_id,
+        event.thread_name,
+        event.task_id,
+        event.task_name,
+        event.local_root_span_id,
+        event.span_id,
+        event.trace_type,
+        id(event.trace_resource_container),
+        _stack_key(event),
+        event.nframes,
+    )
+
+
+def _stack_exception_event_id_key(event: stack_event.StackExceptionSampleEvent) -> typing.Tuple[typing.Any, ...]:
+    return (
+        event.thread_id,
+        event.thread_native_id,
+        event.thread_name,
+        event.local_root_span_id,
+        event.span_id,
+        event.trace_type,
+        id(event.trace_resource_container),
+        _stack_key(event),
+        event.nframes,
+        event.exc_type,
+    )
+
+
+def _memalloc_event_id_key(event: memalloc.MemoryHeapSampleEvent) -> typing.Tuple[typing.Any, ...]:
+    return (
+        event.thread_id,
+        event.thread_native_id,
+        event.thread_name,
+        _stack_key(event),
+        event.nframes,
+    )
+
+
+# A bucket is a list made of the first event folded into it, followed by the sums of the values of its events
+_Bucket_T = typing.List[typing.Any]
+_Buckets_T = typing.Dict[typing.Hashable, _Bucket_T]
+
+
+@attr.s
+class _PprofAggregator(object):
+    """Fold recorder events into buckets of events with the same attributes and stack.
+
+    Events are folded as they are aggregated, so they do not need to be kept until they are exported. The labels of a
+    bucket are only computed at export time, from the first event folded into it: this keeps the aggregation cheap and
+    lets the trace endpoint of a sample be resolved as late as possible.
+    """
+
+    sum_period = attr.ib(init=False, default=0, type=int)
+    nb_event = attr.ib(init=False, default=0, type=int)
+    stack_buckets = attr.ib(init=False, factory=dict, type=_Buckets_T)
+    exception_buckets = attr.ib(init=False, factory=dict, type=_Buckets_T)
+    # {lock event class: buckets}
+    lock_buckets = attr.ib(init=False, factory=dict, type=typing.Dict[typing.Type[_lock.LockEventBase], _Buckets_T])
+    # {lock event class: [sum of sampling percentages, number of events]}
+    lock_sampling = attr.ib(
+        init=False, factory=dict, type=typing.Dict[typing.Type[_lock.LockEventBase], typing.List[int]]
+    )
+    alloc_buckets = attr.ib(init=False, factory=dict, type=_Buckets_T)
+    heap_buckets = attr.ib(init=False, factory=dict, type=_Buckets_T)
+
+    def aggregate(self, events: recorder.EventsType) -> None:
+        """Fold events from a `ddtrace.profiling.recorder.Recorder` into the buckets."""
+        buckets = self.stack_buckets
+        stack_events = events.get(stack_event.StackSampleEvent, ())  # type: ignore[call-overload]
+        self.nb_event += len(stack_events)
+        for e in stack_events:
+            self.sum_period += e.sampling_period
+            key = _stack_event_id_key(e)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [e, 1, e.cpu_time_ns, e.wall_time_ns]
+            else:
+                bucket[1] += 1
+                bucket[2] += e.cpu_time_ns
+                bucket[3] += e.wall_time_ns
+
+        for event_class, time_attr in (
+            (_lock.LockAcquireEvent, "wait_time_ns"),
+            (_lock.LockReleaseEvent, "locked_for_ns"),
+        ):
+            lock_events = events.get(event_class)  # type: ignore[call-overload]
+            if not lock_events:
+                continue
+            get_time = operator.attrgetter(time_attr)
+            buckets = self.lock_buckets.setdefault(event_class, {})
+            sampling = self.lock_sampling.setdefault(event_class, [0, 0])
+            for e in lock_events:
+                sampling[0] += e.sampling_pct
+                sampling[1] += 1
+                key = _lock_event_id_key(e)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [e, 1, get_time(e)]
+                else:
+                    bucket[1] += 1
+                    bucket[2] += get_time(e)
+
+        buckets = self.exception_buckets
+        for e in events.get(stack_event.StackExceptionSampleEvent, ()):  # type: ignore[call-overload]
+            key = _stack_exception_event_id_key(e)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [e, 1]
+            else:
+                bucket[1] += 1
+
+        if memalloc._memalloc:
+            buckets = self.alloc_buckets
+            for e in events.get(memalloc.MemoryAllocSampleEvent, ()):  # type: ignore[call-overload]
+                key = _stack_event_id_key(e)
+                nb_samples = e.nevents * (e.capture_pct / 100.0)
+                size = e.size / e.capture_pct * 100.0
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [e, nb_samples, size]
+                else:
+                    bucket[1] += nb_samples
+                    bucket[2] += size
+
+            buckets = self.heap_buckets
+            for e in events.get(memalloc.MemoryHeapSampleEvent, ()):  # type: ignore[call-overload]
+                key = _memalloc_event_id_key(e)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [e, e.size]
+                else:
+                    bucket[1] += e.size
+
+
+_K = typing.TypeVar("_K")
+
+
+def _sorted_buckets(
+    buckets: _Buckets_T,
+    group_key: typing.Callable[[typing.Any], _K],
+) -> typing.List[typing.Tuple[_K, _Bucket_T]]:
+    """Return the buckets along with their exported key, sorted by exported key.
+
+    Buckets whose exported keys are equal are converted into the same pprof sample.
+    """
+    return sorted(((group_key(bucket[0]), bucket) for bucket in buckets.values()), key=_ITEMGETTER_ZERO)
 
 
 # Use this format because CPython does not support the class style declaration
@@ -479,6 +945,10 @@ StackExceptionEventGroupKey = typing.NamedTuple(
 class PprofExporter(exporter.Exporter):
     """Export recorder events to pprof format."""
 
+    aggregates = True
+
+    _aggregator = attr.ib(init=False, factory=_PprofAggregator, repr=False, eq=False, type=_PprofAggregator)
+
     def _stack_event_group_key(self, event: event.StackBasedEvent) -> StackEventGroupKey:
         return StackEventGroupKey(
             _none_to_str(event.thread_id),
@@ -490,19 +960,10 @@ class PprofExporter(exporter.Exporter):
             _none_to_str(event.span_id),
             self._get_event_trace_resource(event),
             _none_to_str(event.trace_type),
-            # TODO: store this as a tuple directly?
             tuple(event.frames),
             event.nframes,
         )
 
-    def _group_stack_events(
-        self, events: typing.Iterable[event.StackBasedEvent]
-    ) -> typing.Iterator[typing.Tuple[StackEventGroupKey, typing.Iterator[event.StackBasedEvent]]]:
-        return itertools.groupby(
-            sorted(events, key=self._stack_event_group_key),
-            key=self._stack_event_group_key,
-        )
-
     def _lock_event_group_key(
         self,
         event: _lock.LockEventBase,
@@ -521,14 +982,6 @@ class PprofExporter(exporter.Exporter):
             event.nframes,
         )
 
-    def _group_lock_events(
-        self, events: typing.Iterable[_lock.LockEventBase]
-    ) -> typing.Iterator[typing.Tuple[LockEventGroupKey, typing.Iterator[_lock.LockEventBase]]]:
-        return itertools.groupby(
-            sorted(events, key=self._lock_event_group_key),
-            key=self._lock_event_group_key,
-        )
-
     def _stack_exception_group_key(self, event: stack_event.StackExceptionSampleEvent) -> StackExceptionEventGroupKey:
         exc_type = event.exc_type
         exc_type_name = exc_type.__module__ + "." + exc_type.__name__
@@ -546,16 +999,6 @@ class PprofExporter(exporter.Exporter):
             exc_type_name,
         )
 
-    def _group_stack_exception_events(
-        self, events: typing.Iterable[stack_event.StackExceptionSampleEvent]
-    ) -> typing.Iterator[
-        typing.Tuple[StackExceptionEventGroupKey, typing.Iterator[stack_event.StackExceptionSampleEvent]]
-    ]:
-        return itertools.groupby(
-            sorted(events, key=self._stack_exception_group_key),
-            key=self._stack_exception_group_key,
-        )
-
     def _get_event_trace_resource(self, event: event.StackBasedEvent) -> str:
         trace_resource = ""
         # Do not export trace_resource for non Web spans for privacy concerns.
@@ -563,27 +1006,43 @@ class PprofExporter(exporter.Exporter):
             (trace_resource,) = event.trace_resource_container
         return ensure_str(trace_resource, errors="backslashreplace")
 
+    def aggregate(self, events: recorder.EventsType) -> None:
+        """Fold events into the next profile to export.
+
+        :param events: The event dictionary from a `ddtrace.profiling.recorder.Recorder`.
+        """
+        self._aggregator.aggregate(events)
+
     def export(self, events: recorder.EventsType, start_time_ns: int, end_time_ns: int) -> pprof_ProfileType:
         """Convert events to pprof format.
 
+        The events previously passed to `aggregate` are exported along with the given events.
+
         :param events: The event dictionary from a `ddtrace.profiling.recorder.Recorder`.
         :param start_time_ns: The start time of recording.
         :param end_time_ns: The end time of recording.
         :return: A protobuf Profile object.
         """
-        program_name = config.get_application_name() or "<unknown program>"
+        profile = self._serialize(events, start_time_ns, end_time_ns)
+        return pprof_pb2.Profile.FromString(profile)  # type: ignore[attr-defined]
 
-        sum_period = 0
-        nb_event = 0
+    def _serialize(
+        self, events: recorder.EventsType, start_time_ns: int, end_time_ns: int, compress: bool = False
+    ) -> bytes:
+        """Convert events to a serialized pprof profile.
 
-        converter = _PprofConverter()
+        :param events: The event dictionary from a `ddtrace.profiling.recorder.Recorder`.
+        :param start_time_ns: The start time of recording.
+        :param end_time_ns: The end time of recording.
+        :param compress: Whether to compress the profile with gzip.
+        :return: The serialized profile.
+        """
+        program_name = _get_program_name()
+
+        aggregator, self._aggregator = self._aggregator, _PprofAggregator()
+        aggregator.aggregate(events)
 
-        # Handle StackSampleEvent
-        stack_events = []
-        for event in events.get(stack_event.StackSampleEvent, []):  # type: ignore[call-overload]
-            stack_events.append(event)
-            sum_period += event.sampling_period
-            nb_event += 1
+        converter = _PprofConverter()
 
         for (
             (
@@ -599,8 +1058,8 @@ class PprofExporter(exporter.Exporter):
                 frames,
                 nframes,
             ),
-            grouped_stack_events,
-        ) in self._group_stack_events(stack_events):
+            (_, nb_samples, cpu_time_ns, wall_time_ns),
+        ) in _sorted_buckets(aggregator.stack_buckets, self._stack_event_group_key):
             converter.convert_stack_event(
                 thread_id,
                 thread_native_id,
@@ -613,7 +1072,9 @@ class PprofExporter(exporter.Exporter):
                 trace_type,
                 frames,
                 nframes,
-                list(typing.cast(typing.Iterator[stack_event.StackSampleEvent], grouped_stack_events)),
+                nb_samples,
+                cpu_time_ns,
+                wall_time_ns,
             )
 
         # Handle Lock events
@@ -621,11 +1082,11 @@ class PprofExporter(exporter.Exporter):
             (_lock.LockAcquireEvent, converter.convert_lock_acquire_event),
             (_lock.LockReleaseEvent, converter.convert_lock_release_event),
         ):
-            lock_events = events.get(event_class, [])  # type: ignore[call-overload]
-            sampling_sum_pct = sum(event.sampling_pct for event in lock_events)
+            lock_buckets = aggregator.lock_buckets.get(event_class)
 
-            if lock_events:
-                sampling_ratio_avg = sampling_sum_pct / (len(lock_events) * 100.0)
+            if lock_buckets:
+                sampling_sum_pct, nb_lock_events = aggregator.lock_sampling[event_class]
+                sampling_ratio_avg = sampling_sum_pct / (nb_lock_events * 100.0)
 
                 for (
                     lock_name,
@@ -639,7 +1100,7 @@ class PprofExporter(exporter.Exporter):
                     trace_type,
                     frames,
                     nframes,
-                ), l_events in self._group_lock_events(lock_events):
+                ), (_, nb_events, time_ns) in _sorted_buckets(lock_buckets, self._lock_event_group_key):
                     convert_fn(  # type: ignore[operator]
                         lock_name,
                         thread_id,
@@ -652,7 +1113,8 @@ class PprofExporter(exporter.Exporter):
                         trace_type,
                         frames,
                         nframes,
-                        list(l_events),
+                        nb_events,
+                        time_ns,
                         sampling_ratio_avg,
                     )
 
@@ -669,10 +1131,8 @@ class PprofExporter(exporter.Exporter):
                 nframes,
                 exc_type_name,
             ),
-            se_events,
-        ) in self._group_stack_exception_events(
-            events.get(stack_event.StackExceptionSampleEvent, [])  # type: ignore[call-overload]
-        ):
+            (_, nb_events),
+        ) in _sorted_buckets(aggregator.exception_buckets, self._stack_exception_group_key):
             converter.convert_stack_exception_event(
                 thread_id,
                 thread_native_id,
@@ -684,44 +1144,49 @@ class PprofExporter(exporter.Exporter):
                 frames,
                 nframes,
                 exc_type_name,
-                list(typing.cast(typing.Iterator[stack_event.StackExceptionSampleEvent], se_events)),
+                nb_events,
             )
 
-        if memalloc._memalloc:
-            for (
-                (
-                    thread_id,
-                    thread_native_id,
-                    thread_name,
-                    task_id,
-                    task_name,
-                    local_root_span_id,
-                    span_id,
-                    trace_resource,
-                    trace_type,
-                    frames,
-                    nframes,
-                ),
-                memalloc_events,
-            ) in self._group_stack_events(
-                events.get(memalloc.MemoryAllocSampleEvent, [])  # type: ignore[call-overload]
-            ):
-                converter.convert_memalloc_event(
-                    thread_id,
-                    thread_native_id,
-                    thread_name,
-                    frames,
-                    nframes,
-                    list(typing.cast(typing.Iterator[memalloc.MemoryAllocSampleEvent], memalloc_events)),
-                )
+        for (
+            (
+                thread_id,
+                thread_native_id,
+                thread_name,
+                task_id,
+                task_name,
+                local_root_span_id,
+                span_id,
+                trace_resource,
+                trace_type,
+                frames,
+                nframes,
+            ),
+            (_, nb_samples, size),
+        ) in _sorted_buckets(aggregator.alloc_buckets, self._stack_event_group_key):
+            converter.convert_memalloc_event(
+                thread_id,
+                thread_native_id,
+                thread_name,
+                frames,
+                nframes,
+                nb_samples,
+                size,
+            )
 
-            for event in events.get(memalloc.MemoryHeapSampleEvent, []):  # type: ignore[call-overload]
-                converter.convert_memalloc_heap_event(event)
+        for heap_event, size in aggregator.heap_buckets.values():
+            converter.convert_memalloc_heap_event(
+                _none_to_str(heap_event.thread_id),
+                _none_to_str(heap_event.thread_native_id),
+                _get_thread_name(heap_event.thread_id, heap_event.thread_name),
+                tuple(heap_event.frames),
+                heap_event.nframes,
+                size,
+            )
 
         # Compute some metadata
         period = None  # type: typing.Optional[int]
-        if nb_event:
-            period = int(sum_period / nb_event)
+        if aggregator.nb_event:
+            period = int(aggregator.sum_period / aggregator.nb_event)
 
         duration_ns = end_time_ns - start_time_ns
 
@@ -745,4 +1210,5 @@ class PprofExporter(exporter.Exporter):
             period=period,
             sample_types=sample_types,
             program_name=program_name,
+            compress=compress,
         )
@@ -21,17 +21,24 @@ class Scheduler(periodic.PeriodicService):
     exporters = attr.ib()
     before_flush = attr.ib(default=None, eq=False)
     _interval = attr.ib(factory=attr_utils.from_env("DD_PROFILING_UPLOAD_INTERVAL", 60.0, float))
+    _aggregation_interval = attr.ib(default=10.0, type=float)
     _configured_interval = attr.ib(init=False)
+    _aggregates = attr.ib(init=False, type=bool)
     _last_export = attr.ib(init=False, default=None, eq=False)
+    _flush_at = attr.ib(init=False, default=None, eq=False)
 
     def __attrs_post_init__(self):
         # Copy the value to use it later since we're going to adjust the real interval
         self._configured_interval = self.interval
+        # Events can only be taken from the recorder before the flush if every exporter can aggregate them
+        self._aggregates = bool(self.exporters) and all(exp.aggregates for exp in self.exporters)
 
     def _start_service(self):  # type: ignore[override]
         # type: (...) -> None
         """Start the scheduler."""
         LOG.debug("Starting scheduler")
+        self._flush_at = compat.monotonic() + self._configured_interval
+        self.interval = self._next_interval()
         super(Scheduler, self)._start_service()
         self._last_export = compat.time_ns()
         LOG.debug("Scheduler started")
@@ -59,9 +66,33 @@ class Scheduler(periodic.PeriodicService):
                         "Please report this bug to https://github.com/DataDog/dd-trace-py/issues"
                     )
 
+    def aggregate(self):
+        """Aggregate the events recorded so far in the exporters, ahead of the next flush."""
+        LOG.debug("Aggregating events")
+        events = self.recorder.reset()
+        for exp in self.exporters:
+            try:
+                exp.aggregate(events)
+            except Exception:
+                LOG.exception(
+                    "Unexpected error while aggregating events. "
+                    "Please report this bug to https://github.com/DataDog/dd-trace-py/issues"
+                )
+
+    def _next_interval(self):
+        # type: (...) -> float
+        interval = max(0, self._flush_at - compat.monotonic())
+        if self._aggregates:
+            return min(interval, self._aggregation_interval)
+        return interval
+
     def periodic(self):
         start_time = compat.monotonic()
         try:
-            self.flush()
+            if self._aggregates and self._flush_at is not None and start_time < self._flush_at:
+                self.aggregate()
+            else:
+                self.flush()
+                self._flush_at = start_time + self._configured_interval
         finally:
-            self.interval = max(0, self._configured_interval - (compat.monotonic() - start_time))
+            self.interval = self._next_interval()
@@ -1,6 +1,15 @@
+from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import FrozenSet
+from typing import Iterable
+from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Type
+from typing import Union
 
 from ddtrace import config
 
@@ -49,15 +58,6 @@ _POSSIBLE_HTTP_HEADER_B3_SAMPLEDS = _possible_header(_HTTP_HEADER_B3_SAMPLED)
 _POSSIBLE_HTTP_HEADER_B3_FLAGS = _possible_header(_HTTP_HEADER_B3_FLAGS)
 
 
-def _extract_header_value(possible_header_names, headers, default=None):
-    # type: (FrozenSet[str], Dict[str, str], Optional[str]) -> Optional[str]
-    for header in possible_header_names:
-        if header in headers:
-            return headers[header]
-
-    return default
-
-
 def _b3_id_to_dd_id(b3_id):
     # type: (str) -> int
     """Helper to convert B3 trace/span hex ids into Datadog compatible ints
@@ -89,6 +89,8 @@ class _DatadogMultiHeader:
       - ``x-datadog-origin`` optional name of origin Datadog product which initiated the request
     """
 
+    _HEADERS = (HTTP_HEADER_TRACE_ID, HTTP_HEADER_PARENT_ID, HTTP_HEADER_SAMPLING_PRIORITY, HTTP_HEADER_ORIGIN)
+
     @staticmethod
     def _inject(span_context, headers):
         # type: (Context, Dict[str, str]) -> None
@@ -109,26 +111,13 @@ class _DatadogMultiHeader:
     @staticmethod
     def _extract(headers):
         # type: (Dict[str, str]) -> Optional[Context]
-        trace_id = _extract_header_value(
-            POSSIBLE_HTTP_HEADER_TRACE_IDS,
-            headers,
-        )
+        trace_id = headers.get(HTTP_HEADER_TRACE_ID)
         if trace_id is None:
             return None
 
-        parent_span_id = _extract_header_value(
-            POSSIBLE_HTTP_HEADER_PARENT_IDS,
-            headers,
-            default="0",
-        )
-        sampling_priority = _extract_header_value(
-            POSSIBLE_HTTP_HEADER_SAMPLING_PRIORITIES,
-            headers,
-        )
-        origin = _extract_header_value(
-            POSSIBLE_HTTP_HEADER_ORIGIN,
-            headers,
-        )
+        parent_span_id = headers.get(HTTP_HEADER_PARENT_ID, "0")
+        sampling_priority = headers.get(HTTP_HEADER_SAMPLING_PRIORITY)
+        origin = headers.get(HTTP_HEADER_ORIGIN)
 
         # Try to parse values into their expected types
         try:
@@ -193,6 +182,8 @@ class _B3MultiHeader:
       - ``X-B3-SpanId`` is not required, will use ``None`` when not present
     """
 
+    _HEADERS = (_HTTP_HEADER_B3_TRACE_ID, _HTTP_HEADER_B3_SPAN_ID, _HTTP_HEADER_B3_SAMPLED, _HTTP_HEADER_B3_FLAGS)
+
     @staticmethod
     def _inject(span_context, headers):
         # type: (Context, Dict[str, str]) -> None
@@ -215,25 +206,13 @@ class _B3MultiHeader:
     @staticmethod
     def _extract(headers):
         # type: (Dict[str, str]) -> Optional[Context]
-        trace_id_val = _extract_header_value(
-            _POSSIBLE_HTTP_HEADER_B3_TRACE_IDS,
-            headers,
-        )
+        trace_id_val = headers.get(_HTTP_HEADER_B3_TRACE_ID)
         if trace_id_val is None:
             return None
 
-        span_id_val = _extract_header_value(
-            _POSSIBLE_HTTP_HEADER_B3_SPAN_IDS,
-            headers,
-        )
-        sampled = _extract_header_value(
-            _POSSIBLE_HTTP_HEADER_B3_SAMPLEDS,
-            headers,
-        )
-        flags = _extract_header_value(
-            _POSSIBLE_HTTP_HEADER_B3_FLAGS,
-            headers,
-        )
+        span_id_val = headers.get(_HTTP_HEADER_B3_SPAN_ID)
+        sampled = headers.get(_HTTP_HEADER_B3_SAMPLED)
+        flags = headers.get(_HTTP_HEADER_B3_FLAGS)
 
         # Try to parse values into their expected types
         try:
@@ -310,6 +289,8 @@ class _B3SingleHeader:
       - ``SpanId`` is not required, will use ``None`` when not present
     """
 
+    _HEADERS = (_HTTP_HEADER_B3_SINGLE,)
+
     @staticmethod
     def _inject(span_context, headers):
         # type: (Context, Dict[str, str]) -> None
@@ -331,7 +312,7 @@ class _B3SingleHeader:
     @staticmethod
     def _extract(headers):
         # type: (Dict[str, str]) -> Optional[Context]
-        single_header = _extract_header_value(_POSSIBLE_HTTP_HEADER_B3_SINGLE_HEADER, headers)
+        single_header = headers.get(_HTTP_HEADER_B3_SINGLE)
         if not single_header:
             return None
 
@@ -386,9 +367,94 @@ class _B3SingleHeader:
         return None
 
 
+_StyleType = Union[Type[_DatadogMultiHeader], Type[_B3MultiHeader], Type[_B3SingleHeader]]
+
+# The propagation styles, in the order in which they are extracted
+_STYLES = (
+    (PROPAGATION_STYLE_DATADOG, _DatadogMultiHeader),
+    (PROPAGATION_STYLE_B3, _B3MultiHeader),
+    (PROPAGATION_STYLE_B3_SINGLE_HEADER, _B3SingleHeader),
+)  # type: Tuple[Tuple[str, _StyleType], ...]
+
+
+class _PropagationPlan(object):
+    """How to inject and extract the given propagation styles.
+
+    The plan is built once for the styles set in the configuration. It maps
+    the lowercase names of the headers of the styles, with their WSGI
+    variants, to the header names the styles extract from, so that the
+    carrier is scanned once whatever the number of styles.
+
+    The names of the headers in WSGI environs and ASGI scopes are known in
+    advance, so they are looked up as they are.
+    """
+
+    __slots__ = ("styles", "headers", "environ_headers", "asgi_headers", "extractors", "injectors")
+
+    def __init__(self, styles):
+        # type: (Set[str]) -> None
+        self.styles = frozenset(styles)
+        self.headers = {}  # type: Dict[str, str]
+        self.environ_headers = []  # type: List[Tuple[str, str]]
+        self.asgi_headers = {}  # type: Dict[Union[str, bytes], str]
+        self.extractors = []  # type: List[Callable[[Dict[str, str]], Optional[Context]]]
+        self.injectors = []  # type: List[Callable[[Context, Dict[str, str]], None]]
+        for style, helper in _STYLES:
+            if style not in self.styles:
+                continue
+            for header in helper._HEADERS:
+                for name in _possible_header(header):
+                    self.headers[name] = header
+                self.environ_headers.append((get_wsgi_header(header), header))
+                # DEV: ASGI header names are lowercase byte strings, some servers use strings
+                self.asgi_headers[header] = self.asgi_headers[header.encode("ascii")] = header
+            self.extractors.append(helper._extract)
+            self.injectors.append(helper._inject)
+
+    def _extract_values(self, values):
+        # type: (Dict[str, str]) -> Optional[Context]
+        if not values:
+            return None
+
+        # Check all styles until we find the first valid match
+        for extract in self.extractors:
+            context = extract(values)
+            if context is not None:
+                return context
+        return None
+
+    def extract(self, headers):
+        # type: (Mapping[str, str]) -> Optional[Context]
+        known_headers = self.headers
+        values = {}  # type: Dict[str, str]
+        for name, value in headers.items():
+            header = known_headers.get(name.lower())
+            if header is not None:
+                values[header] = value
+        return self._extract_values(values)
+
+    def extract_environ(self, environ):
+        # type: (Mapping[str, Any]) -> Optional[Context]
+        values = {header: environ[name] for name, header in self.environ_headers if name in environ}
+        return self._extract_values(values)
+
+    def extract_asgi(self, headers):
+        # type: (Iterable[Tuple[Union[str, bytes], Union[str, bytes]]]) -> Optional[Context]
+        known_headers = self.asgi_headers
+        values = {}  # type: Dict[str, str]
+        for name, value in headers:
+            header = known_headers.get(name)
+            if header is not None:
+                values[header] = ensure_text(value)
+        return self._extract_values(values)
+
+
 class HTTPPropagator(object):
     """A HTTP Propagator using HTTP headers as carrier."""
 
+    _extract_plan = None  # type: Optional[_PropagationPlan]
+    _inject_plan = None  # type: Optional[_PropagationPlan]
+
     @staticmethod
     def inject(span_context, headers):
         # type: (Context, Dict[str, str]) -> None
@@ -414,12 +480,11 @@ class HTTPPropagator(object):
             log.debug("tried to inject invalid context %r", span_context)
             return
 
-        if PROPAGATION_STYLE_DATADOG in config._propagation_style_inject:
-            _DatadogMultiHeader._inject(span_context, headers)
-        if PROPAGATION_STYLE_B3 in config._propagation_style_inject:
-            _B3MultiHeader._inject(span_context, headers)
-        if PROPAGATION_STYLE_B3_SINGLE_HEADER in config._propagation_style_inject:
-            _B3SingleHeader._inject(span_context, headers)
+        plan = HTTPPropagator._inject_plan
+        if plan is None or plan.styles != config._propagation_style_inject:
+            plan = HTTPPropagator._inject_plan = _PropagationPlan(config._propagation_style_inject)
+        for inject in plan.injectors:
+            inject(span_context, headers)
 
     @staticmethod
     def extract(headers):
@@ -444,22 +509,38 @@ class HTTPPropagator(object):
         if not headers:
             return Context()
 
+        return HTTPPropagator._extract(_PropagationPlan.extract, headers)
+
+    @staticmethod
+    def _extract_from_environ(environ):
+        # type: (Mapping[str, Any]) -> Context
+        """Extract a Context from the HTTP headers of a WSGI environ.
+
+        Unlike with ``extract``, only the ``HTTP_*`` variables of the
+        propagated headers are looked up in the environ.
+        """
+        return HTTPPropagator._extract(_PropagationPlan.extract_environ, environ)
+
+    @staticmethod
+    def _extract_from_asgi_headers(headers):
+        # type: (Iterable[Tuple[Union[str, bytes], Union[str, bytes]]]) -> Context
+        """Extract a Context from the headers of an ASGI scope.
+
+        The headers are the ``(name, value)`` byte string pairs of the scope,
+        only the values of the propagated headers are decoded.
+        """
+        return HTTPPropagator._extract(_PropagationPlan.extract_asgi, headers)
+
+    @staticmethod
+    def _extract(extract, carrier):
+        # type: (Callable[[_PropagationPlan, Any], Optional[Context]], Any) -> Context
         try:
-            normalized_headers = {name.lower(): v for name, v in headers.items()}
-            # Check all styles until we find the first valid match
-            # DEV: We want to check them in this specific priority order
-            if PROPAGATION_STYLE_DATADOG in config._propagation_style_extract:
-                context = _DatadogMultiHeader._extract(normalized_headers)
-                if context is not None:
-                    return context
-            if PROPAGATION_STYLE_B3 in config._propagation_style_extract:
-                context = _B3MultiHeader._extract(normalized_headers)
-                if context is not None:
-                    return context
-            if PROPAGATION_STYLE_B3_SINGLE_HEADER in config._propagation_style_extract:
-                context = _B3SingleHeader._extract(normalized_headers)
-                if context is not None:
-                    return context
+            plan = HTTPPropagator._extract_plan
+            if plan is None or plan.styles != config._propagation_style_extract:
+                plan = HTTPPropagator._extract_plan = _PropagationPlan(config._propagation_style_extract)
+            context = extract(plan, carrier)
+            if context is not None:
+                return context
         except Exception:
             log.debug("error while extracting context propagation headers", exc_info=True)
         return Context()
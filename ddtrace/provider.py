@@ -42,7 +42,9 @@ class BaseContextProvider(six.with_metaclass(abc.ABCMeta)):
     @abc.abstractmethod
     def activate(self, ctx):
         # type: (Optional[Union[Context, Span]]) -> None
-        self._hooks.emit(self.activate, ctx)
+        # DEV: Spans are activated twice per span, skip the hooks when there are none
+        if self._hooks.has_hooks():
+            self._hooks.emit(self.activate, ctx)
 
     @abc.abstractmethod
     def active(self):
@@ -133,6 +135,9 @@ class DefaultContextProvider(BaseContextProvider, DatadogContextMixin):
         # type: () -> Optional[Union[Context, Span]]
         """Returns the active span or context for the current execution."""
         item = _DD_CONTEXTVAR.get()
-        if isinstance(item, Span):
+        # DEV: The tracer activates the parent of the active span when it
+        # finishes, so the active span is only finished when it was finished
+        # in another execution context.
+        if isinstance(item, Span) and item.duration_ns is not None:
             return self._update_active(item)
         return item
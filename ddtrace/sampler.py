@@ -26,6 +26,7 @@ from .internal.compat import iteritems
 from .internal.compat import pattern_type
 from .internal.logger import get_logger
 from .internal.rate_limiter import RateLimiter
+from .internal.utils.cache import LRUCache
 from .internal.utils.cache import cachedmethod
 
 
@@ -172,6 +173,84 @@ class RateByServiceSampler(BasePrioritySampler):
         self._by_service_samplers = new_by_service_samplers
 
 
+class _SamplingRules(list):
+    """The list of the rules of a :class:`DatadogSampler`, which rebuilds its rule matcher when it is changed."""
+
+    __slots__ = ("_sampler",)
+
+    def __init__(self, sampler, *args):
+        # type: (DatadogSampler, Any) -> None
+        self._sampler = sampler
+        super(_SamplingRules, self).__init__(*args)
+
+    def __reduce__(self):
+        # DEV: Copies are built with __init__, as changing their items would rebuild a sampler that is not copied yet
+        return _SamplingRules, (self._sampler, list(self))
+
+    def _changed(self):
+        # type: () -> None
+        self._sampler._rule_matcher = SamplingRuleMatcher(self)
+
+    def __setitem__(self, *args):
+        super(_SamplingRules, self).__setitem__(*args)
+        self._changed()
+
+    def __delitem__(self, *args):
+        super(_SamplingRules, self).__delitem__(*args)
+        self._changed()
+
+    # Python 2 calls these for simple slices
+    def __setslice__(self, *args):
+        super(_SamplingRules, self).__setslice__(*args)  # type: ignore[misc]
+        self._changed()
+
+    def __delslice__(self, *args):
+        super(_SamplingRules, self).__delslice__(*args)  # type: ignore[misc]
+        self._changed()
+
+    def __iadd__(self, *args):
+        result = super(_SamplingRules, self).__iadd__(*args)
+        self._changed()
+        return result
+
+    def __imul__(self, *args):
+        result = super(_SamplingRules, self).__imul__(*args)
+        self._changed()
+        return result
+
+    def append(self, *args):
+        super(_SamplingRules, self).append(*args)
+        self._changed()
+
+    def extend(self, *args):
+        super(_SamplingRules, self).extend(*args)
+        self._changed()
+
+    def insert(self, *args):
+        super(_SamplingRules, self).insert(*args)
+        self._changed()
+
+    def pop(self, *args):
+        result = super(_SamplingRules, self).pop(*args)
+        self._changed()
+        return result
+
+    def remove(self, *args):
+        super(_SamplingRules, self).remove(*args)
+        self._changed()
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        super(_SamplingRules, self).sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super(_SamplingRules, self).reverse()
+        self._changed()
+
+
 class DatadogSampler(RateByServiceSampler):
     """
     Default sampler used by Tracer for determining if a trace should be kept or dropped.
@@ -203,7 +282,7 @@ class DatadogSampler(RateByServiceSampler):
     provided. It is not used when the agent supplied sample rates are used.
     """
 
-    __slots__ = ("limiter", "rules")
+    __slots__ = ("limiter", "_rules", "_rule_matcher")
 
     NO_RATE_LIMIT = -1
     DEFAULT_RATE_LIMIT = 100
@@ -239,8 +318,6 @@ class DatadogSampler(RateByServiceSampler):
         if rate_limit is None:
             rate_limit = int(os.getenv("DD_TRACE_RATE_LIMIT", default=self.DEFAULT_RATE_LIMIT))
 
-        # Ensure rules is a list
-        self.rules = []  # type: List[SamplingRule]
         if rules is None:
             env_sampling_rules = os.getenv("DD_TRACE_SAMPLING_RULES")
             if env_sampling_rules:
@@ -270,6 +347,21 @@ class DatadogSampler(RateByServiceSampler):
 
     __repr__ = __str__
 
+    @property
+    def rules(self):
+        # type: () -> List[SamplingRule]
+        """The sampling rules, in the order they are evaluated.
+
+        The rule matcher is rebuilt whenever the rules are set or changed.
+        """
+        return self._rules
+
+    @rules.setter
+    def rules(self, rules):
+        # type: (List[SamplingRule]) -> None
+        self._rules = _SamplingRules(self, rules)
+        self._rules._changed()
+
     def _parse_rules_from_env_variable(self, rules):
         sampling_rules = []
         if rules is not None:
@@ -303,23 +395,13 @@ class DatadogSampler(RateByServiceSampler):
         :returns: Whether the span was sampled or not
         :rtype: :obj:`bool`
         """
-        # If there are rules defined, then iterate through them and find one that wants to sample
-        matching_rule = None  # type: Optional[SamplingRule]
-
-        # Go through all rules and grab the first one that matched
+        # Grab the first rule that matches
         # DEV: This means rules should be ordered by the user from most specific to least specific
-        for rule in self.rules:
-            if rule.matches(span):
-                matching_rule = rule
-                break
-        else:
+        matching_rule = self._rule_matcher.match(span)
+        if matching_rule is None:
             # No rules matches so use agent based sampling
             return super(DatadogSampler, self).sample(span)
 
-        # DEV: This should never happen, but since the type is Optional we have to check
-        if not matching_rule:
-            raise SamplingError("No sampling rule found for span {!r} from {!r}".format(span, self))
-
         # Sample with the matching sampling rule
         span.set_metric(SAMPLING_RULE_DECISION, matching_rule.sample_rate)
         if not matching_rule.sample(span):
@@ -496,3 +578,136 @@ class SamplingRule(BaseSampler):
             raise TypeError("Cannot compare SamplingRule to {}".format(type(other)))
 
         return self.sample_rate == other.sample_rate and self.service == other.service and self.name == other.name
+
+
+class SamplingRuleMatcher(object):
+    """
+    Find the first :class:`SamplingRule` of a list of rules that matches a span.
+
+    Rules comparing the service and the name of spans to literal values are
+    indexed by these values. Only the rules with a function or a regular
+    expression pattern that come before the first indexed match need to be
+    evaluated. The position of the matching rule is cached for every service
+    and name pair in a bounded LRU cache.
+
+    Rules overriding ``SamplingRule.matches`` can match spans on anything else
+    than their service and name, so they are evaluated for every span.
+    """
+
+    __slots__ = (
+        "rules",
+        "num_rules",
+        "_exact",
+        "_by_service",
+        "_by_name",
+        "_catch_all",
+        "_dynamic",
+        "_opaque",
+        "_decisions",
+    )
+
+    DEFAULT_CACHE_SIZE = 1024
+
+    _ANY = 0
+    _LITERAL = 1
+    _DYNAMIC = 2
+
+    def __init__(
+        self,
+        rules,  # type: List[SamplingRule]
+        cache_size=DEFAULT_CACHE_SIZE,  # type: int
+    ):
+        # type: (...) -> None
+        self.rules = rules
+        self.num_rules = len(rules)
+        self._exact = {}  # type: Dict[Tuple[Any, Any], int]
+        self._by_service = {}  # type: Dict[Any, int]
+        self._by_name = {}  # type: Dict[Any, int]
+        # DEV: The number of rules is used as the position of the missing rule
+        self._catch_all = self.num_rules
+        self._dynamic = []  # type: List[int]
+        self._opaque = []  # type: List[int]
+        self._decisions = LRUCache(cache_size)  # type: LRUCache[Tuple[Optional[str], str], int]
+
+        for i, rule in enumerate(rules):
+            if self._is_opaque(rule):
+                self._opaque.append(i)
+                continue
+
+            service_kind = self._pattern_kind(rule.service)
+            name_kind = self._pattern_kind(rule.name)
+            if self._DYNAMIC in (service_kind, name_kind):
+                self._dynamic.append(i)
+            elif service_kind == self._LITERAL and name_kind == self._LITERAL:
+                self._exact.setdefault((rule.service, rule.name), i)
+            elif service_kind == self._LITERAL:
+                self._by_service.setdefault(rule.service, i)
+            elif name_kind == self._LITERAL:
+                self._by_name.setdefault(rule.name, i)
+            else:
+                self._catch_all = min(self._catch_all, i)
+
+    @staticmethod
+    def _is_opaque(rule):
+        # type: (SamplingRule) -> bool
+        for cls in type(rule).__mro__:
+            if cls is SamplingRule:
+                return False
+            if "matches" in vars(cls) or "_matches" in vars(cls) or "_pattern_matches" in vars(cls):
+                return True
+        return False
+
+    @classmethod
+    def _pattern_kind(cls, pattern):
+        # type: (Any) -> int
+        if pattern is SamplingRule.NO_RULE:
+            return cls._ANY
+        if callable(pattern) or isinstance(pattern, pattern_type):
+            return cls._DYNAMIC
+        try:
+            hash(pattern)
+        except TypeError:
+            return cls._DYNAMIC
+        return cls._LITERAL
+
+    def _first_match(self, key):
+        # type: (Tuple[Optional[str], str]) -> int
+        service, name = key
+        first = self._catch_all
+        try:
+            for i in (self._exact.get(key), self._by_service.get(service), self._by_name.get(name)):
+                if i is not None and i < first:
+                    first = i
+        except TypeError:
+            # Unhashable service or name, only the dynamic rules can match
+            pass
+
+        for i in self._dynamic:
+            if i >= first:
+                break
+            rule = self.rules[i]
+            if rule._pattern_matches(service, rule.service) and rule._pattern_matches(name, rule.name):
+                return i
+
+        return first
+
+    def match(self, span):
+        # type: (Span) -> Optional[SamplingRule]
+        """Return the first rule that matches the span, if any."""
+        key = (span.service, span.name)
+        try:
+            first = self._decisions.get(key)
+            if first is None:
+                first = self._first_match(key)
+                self._decisions.set(key, first)
+        except TypeError:
+            # Unhashable service or name
+            first = self._first_match(key)
+
+        for i in self._opaque:
+            if i >= first:
+                break
+            if self.rules[i].matches(span):
+                return self.rules[i]
+
+        return self.rules[first] if first < self.num_rules else None
@@ -1,3 +1,5 @@
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Mapping
 from typing import Optional
@@ -13,6 +15,53 @@ from ..internal.utils.http import normalize_header_name
 log = get_logger(__name__)
 
 
+class _HeaderTags(dict):
+    """Tag names of the traced headers by header name, that tell their config when they change."""
+
+    __slots__ = ("_config",)
+
+    def __init__(self, config, *args, **kwargs):
+        # type: (HttpConfig, Any, Any) -> None
+        self._config = config
+        super(_HeaderTags, self).__init__(*args, **kwargs)
+
+    def __reduce__(self):
+        # DEV: Copies are built with __init__, as setting their items would tell a config that is not copied yet
+        return _HeaderTags, (self._config, dict(self))
+
+    def __setitem__(self, key, value):
+        super(_HeaderTags, self).__setitem__(key, value)
+        self._config._header_tags_changed()
+
+    def __delitem__(self, key):
+        super(_HeaderTags, self).__delitem__(key)
+        self._config._header_tags_changed()
+
+    def clear(self):
+        super(_HeaderTags, self).clear()
+        self._config._header_tags_changed()
+
+    def pop(self, *args):
+        value = super(_HeaderTags, self).pop(*args)
+        self._config._header_tags_changed()
+        return value
+
+    def popitem(self):
+        item = super(_HeaderTags, self).popitem()
+        self._config._header_tags_changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        super(_HeaderTags, self).update(*args, **kwargs)
+        self._config._header_tags_changed()
+
+
 class HttpConfig(object):
     """
     Configuration object that expose an API to set and retrieve both global and integration specific settings
@@ -21,9 +70,28 @@ class HttpConfig(object):
 
     def __init__(self, header_tags=None):
         # type: (Optional[Mapping[str, str]]) -> None
+        # Incremented whenever the traced headers change, so that caches of their tag names can be emptied
+        self._header_tags_version = 0
         self._header_tags = {normalize_header_name(k): v for k, v in header_tags.items()} if header_tags else {}
         self.trace_query_string = None
 
+    @property
+    def _header_tags(self):
+        # type: () -> Dict[str, str]
+        return self._traced_header_tags
+
+    @_header_tags.setter
+    def _header_tags(self, header_tags):
+        # type: (Dict[str, str]) -> None
+        self._traced_header_tags = _HeaderTags(self, header_tags)
+        self._header_tags_changed()
+
+    def _header_tags_changed(self):
+        # type: () -> None
+        self._header_tags_version += 1
+        # Mypy can't catch cached method's invalidate()
+        self._header_tag_name.invalidate()  # type: ignore[attr-defined]
+
     @cachedmethod()
     def _header_tag_name(self, header_name):
         # type: (str) -> Optional[str]
@@ -62,8 +130,7 @@ class HttpConfig(object):
             #  Host on the request defaults to http.request.headers.host
             self._header_tags.setdefault(normalized_header_name, "")
 
-        # Mypy can't catch cached method's invalidate()
-        self._header_tag_name.invalidate()  # type: ignore[attr-defined]
+        self._header_tags_changed()
 
         return self
 
@@ -1,4 +1,6 @@
 import os
+from typing import Any
+from typing import Dict
 from typing import Optional
 from typing import Tuple
 
@@ -39,6 +41,8 @@ class IntegrationConfig(AttrDict):
         object.__setattr__(self, "integration_name", name)
         object.__setattr__(self, "hooks", Hooks())
         object.__setattr__(self, "http", HttpConfig())
+        object.__setattr__(self, "_header_tag_names_key", None)
+        object.__setattr__(self, "_header_tag_names", {})
 
         analytics_enabled, analytics_sample_rate = self._get_analytics_settings()
         self.setdefault("analytics_enabled", analytics_enabled)
@@ -109,6 +113,24 @@ class IntegrationConfig(AttrDict):
             return self.global_config._header_tag_name(header_name)
         return tag_name
 
+    def _header_tag_names_cache(self, request_or_response):
+        # type: (str) -> Dict[Any, Optional[str]]
+        """Returns a cache for the tag names of the request or response headers by header name.
+
+        The cache is emptied when the headers traced for the integration or
+        globally change.
+        """
+        http = self.http
+        global_http = self.global_config.http
+        key = (http, http._header_tags_version, global_http, global_http._header_tags_version)
+        if key != self._header_tag_names_key:
+            object.__setattr__(self, "_header_tag_names_key", key)
+            object.__setattr__(self, "_header_tag_names", {})
+        cache = self._header_tag_names.get(request_or_response)
+        if cache is None:
+            cache = self._header_tag_names[request_or_response] = {}
+        return cache
+
     def _is_analytics_enabled(self, use_global_config):
         # DEV: analytics flag can be None which should not be taken as
         # enabled when global flag is disabled
@@ -1,13 +1,19 @@
+import linecache
 import math
 import pprint
 import sys
 import traceback
+from types import CodeType
+from types import TracebackType
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
 from typing import Text
+from typing import Tuple
 from typing import Union
 
 import six
@@ -30,17 +36,32 @@ from .ext import http
 from .ext import net
 from .internal import _rand
 from .internal.compat import NumericType
+from .internal.compat import PY2
 from .internal.compat import StringIO
 from .internal.compat import ensure_text
 from .internal.compat import is_integer
 from .internal.compat import iteritems
+from .internal.compat import monotonic_ns
 from .internal.compat import numeric_types
 from .internal.compat import stringify
+from .internal.compat import text_type
 from .internal.compat import time_ns
 from .internal.logger import get_logger
+from .internal.rate_limiter import RateLimiter
+from .internal.utils.cache import LRUCache
+
+
+if TYPE_CHECKING:
+    from .internal.span_prototype import SpanPrototype
 
 
 _NUMERIC_TAGS = (ANALYTICS_SAMPLE_RATE_KEY,)
+# Tags expected to be integers
+_INT_TAGS = frozenset([net.TARGET_PORT])
+_MAX_INT_METRIC = 2 ** 53
+# Maximum number of entries of the stacks of the exceptions
+_EXC_STACK_LIMIT = 20
+_EXC_STACK_RATE_LIMIT = 100
 _TagNameType = Union[Text, bytes]
 _MetaDictType = Dict[_TagNameType, Text]
 _MetricDictType = Dict[_TagNameType, NumericType]
@@ -73,6 +94,8 @@ class Span(object):
         "_parent",
         "_ignored_exceptions",
         "_on_finish_callbacks",
+        "_exc_stack",
+        "_shared_tags",
         "__weakref__",
     ]
 
@@ -138,7 +161,7 @@ class Span(object):
         self.trace_id = trace_id or _rand.rand64bits()  # type: int
         self.span_id = span_id or _rand.rand64bits()  # type: int
         self.parent_id = parent_id  # type: Optional[int]
-        self._on_finish_callbacks = [] if on_finish is None else on_finish
+        self._on_finish_callbacks = () if on_finish is None else on_finish  # type: Sequence[Callable[[Span], None]]
 
         # sampling
         self.sampled = True  # type: bool
@@ -146,6 +169,9 @@ class Span(object):
         self._context = context._with_span(self) if context else None  # type: Optional[Context]
         self._parent = None  # type: Optional[Span]
         self._ignored_exceptions = None  # type: Optional[List[Exception]]
+        self._exc_stack = None  # type: Optional[_PendingExcStack]
+        # Tags shared with the other spans of the tracer, see ``_share_tags``
+        self._shared_tags = None  # type: Optional[SpanPrototype]
         self._local_root = None  # type: Optional[Span]
         self._store = None  # type: Optional[Dict[str, Any]]
 
@@ -252,6 +278,13 @@ class Span(object):
             log.warning("Ignoring tag pair %s:%s. Key must be a string.", key, value)
             return
 
+        # Fast path for text values of tags without special handling
+        if type(value) is text_type and key not in _SPECIAL_TAGS:
+            self._meta[key] = value
+            if key in self._metrics:
+                del self._metrics[key]
+            return
+
         # Special case, force `http.status_code` as a string
         # DEV: `http.status_code` *has* to be in `meta` for metrics
         #   calculated in the trace agent
@@ -263,8 +296,7 @@ class Span(object):
 
         # Explicitly try to convert expected integers to `int`
         # DEV: Some integrations parse these values from strings, but don't call `int(value)` themselves
-        INT_TYPES = (net.TARGET_PORT,)
-        if key in INT_TYPES and not val_is_an_int:
+        if key in _INT_TAGS and not val_is_an_int:
             try:
                 value = int(value)
                 val_is_an_int = True
@@ -272,7 +304,7 @@ class Span(object):
                 pass
 
         # Set integers that are less than equal to 2^53 as metrics
-        if value is not None and val_is_an_int and abs(value) <= 2 ** 53:
+        if value is not None and val_is_an_int and abs(value) <= _MAX_INT_METRIC:
             self.set_metric(key, value)
             return
 
@@ -281,38 +313,8 @@ class Span(object):
             self.set_metric(key, value)
             return
 
-        # Key should explicitly be converted to a float if needed
-        elif key in _NUMERIC_TAGS:
-            if value is None:
-                log.debug("ignoring not number metric %s:%s", key, value)
-                return
-
-            try:
-                # DEV: `set_metric` will try to cast to `float()` for us
-                self.set_metric(key, value)
-            except (TypeError, ValueError):
-                log.warning("error setting numeric metric %s:%s", key, value)
-
-            return
-
-        elif key == MANUAL_KEEP_KEY:
-            self.context.sampling_priority = USER_KEEP
-            return
-        elif key == MANUAL_DROP_KEY:
-            self.context.sampling_priority = USER_REJECT
-            return
-        elif key == SERVICE_KEY:
-            self.service = value
-        elif key == SERVICE_VERSION_KEY:
-            # Also set the `version` tag to the same value
-            # DEV: Note that we do no return, we want to set both
-            self.set_tag(VERSION_KEY, value)
-        elif key == SPAN_MEASURED_KEY:
-            # Set `_dd.measured` tag as a metric
-            # DEV: `set_metric` will ensure it is an integer 0 or 1
-            if value is None:
-                value = 1
-            self.set_metric(key, value)
+        set_special_tag = _SPECIAL_TAG_SETTERS.get(key)
+        if set_special_tag is not None and set_special_tag(self, key, value):
             return
 
         try:
@@ -337,18 +339,65 @@ class Span(object):
 
     def _remove_tag(self, key):
         # type: (_TagNameType) -> None
+        if key == ERROR_STACK:
+            self._exc_stack = None
+        if self._shared_tags is not None and key in self._shared_tags.meta:
+            self._unshare_tags()
         if key in self._meta:
             del self._meta[key]
 
+    def _share_tags(self, prototype):
+        # type: (SpanPrototype) -> None
+        """Set the tags of the prototype on the span without copying them.
+
+        The tags of the span take precedence over the shared tags with the
+        same name, whether they are string tags or metrics.
+        """
+        if self._shared_tags is not None:
+            self._unshare_tags()
+        self._shared_tags = prototype
+
+    def _unshare_tags(self):
+        # type: () -> None
+        """Copy the shared tags that are not overridden to the tags of the span."""
+        shared, self._shared_tags = self._shared_tags, None
+        if shared is None:
+            return
+        meta = self._meta
+        metrics = self._metrics
+        for k, v in iteritems(shared.meta):
+            if k not in meta and k not in metrics:
+                meta[k] = v
+        for k, v in iteritems(shared.metrics):
+            if k not in meta and k not in metrics:
+                metrics[k] = v
+
     def get_tag(self, key):
         # type: (_TagNameType) -> Optional[Text]
         """Return the given tag or None if it doesn't exist."""
-        return self._meta.get(key, None)
+        # DEV: Only format the pending exception stack when it is looked up
+        if self._exc_stack is not None and key == ERROR_STACK:
+            self._format_exc_stack()
+        value = self._meta.get(key, None)
+        if value is None and self._shared_tags is not None and key not in self._metrics:
+            return self._shared_tags.meta.get(key, None)
+        return value
 
     def get_tags(self):
         # type: () -> _MetaDictType
-        """Return all tags."""
-        return self._meta.copy()
+        """Return all tags.
+
+        This formats the pending exception stack, if any: use ``get_tag`` to
+        look up a few tags instead.
+        """
+        if self._exc_stack is not None:
+            self._format_exc_stack()
+        if self._shared_tags is None:
+            return self._meta.copy()
+        metrics = self._metrics
+        tags = {k: v for k, v in iteritems(self._shared_tags.meta) if k not in metrics}
+        tags.update(self._meta)
+        return tags
 
     def set_tags(self, tags):
         # type: (_MetaDictType) -> None
@@ -400,12 +449,20 @@ class Span(object):
     def get_metric(self, key):
         # type: (_TagNameType) -> Optional[NumericType]
         """Return the given metric or None if it doesn't exist."""
-        return self._metrics.get(key)
+        value = self._metrics.get(key)
+        if value is None and self._shared_tags is not None and key not in self._meta:
+            return self._shared_tags.metrics.get(key)
+        return value
 
     def get_metrics(self):
         # type: () -> _MetricDictType
         """Return all metrics."""
-        return self._metrics.copy()
+        if self._shared_tags is None:
+            return self._metrics.copy()
+        meta = self._meta
+        metrics = {k: v for k, v in iteritems(self._shared_tags.metrics) if k not in meta}
+        metrics.update(self._metrics)
+        return metrics
 
     def set_traceback(self, limit=20):
         # type: (int) -> None
@@ -431,22 +488,45 @@ class Span(object):
 
         self.error = 1
 
-        # get the traceback
-        buff = StringIO()
-        traceback.print_exception(exc_type, exc_val, exc_tb, file=buff, limit=20)
-        tb = buff.getvalue()
-
         # readable version of type (e.g. exceptions.ZeroDivisionError)
         exc_type_str = "%s.%s" % (exc_type.__module__, exc_type.__name__)
 
         self._meta[ERROR_MSG] = stringify(exc_val)
         self._meta[ERROR_TYPE] = exc_type_str
-        self._meta[ERROR_STACK] = tb
+
+        if PY2 or not isinstance(exc_val, BaseException):
+            # get the traceback
+            buff = StringIO()
+            traceback.print_exception(exc_type, exc_val, exc_tb, file=buff, limit=_EXC_STACK_LIMIT)
+            self._meta[ERROR_STACK] = buff.getvalue()
+            self._exc_stack = None
+            return
+
+        # The stack is formatted when it is needed, usually when the span is
+        # encoded, unless it is already known. Spans are encoded when their
+        # trace finishes, on the same thread unless the trace processing queue
+        # is enabled.
+        exc_stack = _capture_exc_stack(exc_type, exc_val, exc_tb)
+        if isinstance(exc_stack, six.string_types):
+            self._meta[ERROR_STACK] = exc_stack
+            self._exc_stack = None
+        else:
+            self._meta.pop(ERROR_STACK, None)
+            self._exc_stack = exc_stack
+
+    def _format_exc_stack(self):
+        # type: () -> None
+        """Format the stack of the exception set with ``set_exc_info`` if it is pending."""
+        exc_stack, self._exc_stack = self._exc_stack, None
+        # DEV: A stack set explicitly since then takes precedence
+        if exc_stack is not None and ERROR_STACK not in self._meta:
+            self._meta[ERROR_STACK] = _format_exc_stack(exc_stack)
 
     def _remove_exc_info(self):
         # type: () -> None
         """Remove all exception related information from the span."""
         self.error = 0
+        self._exc_stack = None
         self._remove_tag(ERROR_MSG)
         self._remove_tag(ERROR_TYPE)
         self._remove_tag(ERROR_STACK)
@@ -454,6 +534,8 @@ class Span(object):
     def _pprint(self):
         # type: () -> str
         """Return a human readable version of the span."""
+        if self._exc_stack is not None:
+            self._format_exc_stack()
         data = [
             ("name", self.name),
             ("id", self.span_id),
@@ -466,8 +548,8 @@ class Span(object):
             ("end", None if not self.duration else self.start + self.duration),
             ("duration", self.duration),
             ("error", self.error),
-            ("tags", dict(sorted(self._meta.items()))),
-            ("metrics", dict(sorted(self._metrics.items()))),
+            ("tags", dict(sorted(self.get_tags().items()))),
+            ("metrics", dict(sorted(self.get_metrics().items()))),
         ]
         return " ".join(
             # use a large column width to keep pprint output on one line
@@ -503,6 +585,138 @@ class Span(object):
         )
 
 
+# Stack of an exception captured by Span.set_exc_info that is not formatted
+# yet: either its cache key and the formatted exception, or a summary of a
+# chained exception.
+_PendingExcStack = Union[Tuple[Tuple[type, Tuple[Tuple[CodeType, int], ...]], str], "traceback.TracebackException"]
+
+# Formatted stacks of the exceptions, without the exceptions themselves, by
+# exception type and code location
+_exc_stack_cache = LRUCache(1024)  # type: LRUCache[Tuple[type, Tuple[Tuple[CodeType, int], ...]], str]
+# Budget of the stacks that can be formatted per second, excluding the cached
+# ones. The other stacks are reduced to the exception.
+_exc_stack_limiter = RateLimiter(_EXC_STACK_RATE_LIMIT)
+
+
+def _capture_exc_stack(exc_type, exc_val, exc_tb):
+    # type: (type, BaseException, TracebackType) -> Union[str, _PendingExcStack]
+    """Capture what is needed to format the stack of an exception later.
+
+    The stack is returned already formatted if the stack of an exception of
+    the same type raised from the same code location has been formatted
+    before.
+    """
+    if exc_val.__cause__ is not None or (exc_val.__context__ is not None and not exc_val.__suppress_context__):
+        # DEV: The stacks of chained exceptions are not cached
+        return traceback.TracebackException(exc_type, exc_val, exc_tb, limit=_EXC_STACK_LIMIT, lookup_lines=False)
+
+    locations = []
+    tb = exc_tb  # type: Optional[TracebackType]
+    while tb is not None and len(locations) < _EXC_STACK_LIMIT:
+        locations.append((tb.tb_frame.f_code, tb.tb_lineno))
+        tb = tb.tb_next
+    key = (exc_type, tuple(locations))
+    exc_only = "".join(traceback.format_exception_only(exc_type, exc_val))
+
+    stack = _exc_stack_cache.get(key)
+    if stack is not None:
+        return stack + exc_only
+    return key, exc_only
+
+
+def _format_exc_stack(exc_stack):
+    # type: (_PendingExcStack) -> str
+    """Format the stack of an exception captured with ``_capture_exc_stack``."""
+    if isinstance(exc_stack, traceback.TracebackException):
+        if _exc_stack_limiter.is_allowed(monotonic_ns()):
+            return "".join(exc_stack.format())
+        return "".join(exc_stack.format_exception_only())
+
+    key, exc_only = exc_stack
+    # DEV: The stack might have been formatted for another span in the meantime
+    stack = _exc_stack_cache.get(key)
+    if stack is None:
+        if not _exc_stack_limiter.is_allowed(monotonic_ns()):
+            return exc_only
+
+        frames = []
+        for code, lineno in key[1]:
+            linecache.checkcache(code.co_filename)
+            frames.append((code.co_filename, lineno, code.co_name, None))
+        stack = "Traceback (most recent call last):\n" + "".join(traceback.StackSummary.from_list(frames).format())
+        _exc_stack_cache.set(key, stack)
+
+    return stack + exc_only
+
+
+def _set_numeric_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    # Key should explicitly be converted to a float if needed
+    if value is None:
+        log.debug("ignoring not number metric %s:%s", key, value)
+        return True
+
+    try:
+        # DEV: `set_metric` will try to cast to `float()` for us
+        span.set_metric(key, value)
+    except (TypeError, ValueError):
+        log.warning("error setting numeric metric %s:%s", key, value)
+
+    return True
+
+
+def _set_manual_keep_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    span.context.sampling_priority = USER_KEEP
+    return True
+
+
+def _set_manual_drop_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    span.context.sampling_priority = USER_REJECT
+    return True
+
+
+def _set_service_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    span.service = value
+    return False
+
+
+def _set_service_version_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    # Also set the `version` tag to the same value
+    # DEV: Note that we do no return, we want to set both
+    span.set_tag(VERSION_KEY, value)
+    return False
+
+
+def _set_measured_tag(span, key, value):
+    # type: (Span, _TagNameType, Any) -> bool
+    # Set `_dd.measured` tag as a metric
+    # DEV: `set_metric` will ensure it is an integer 0 or 1
+    if value is None:
+        value = 1
+    span.set_metric(key, value)
+    return True
+
+
+# Tags that need special handling when their value is not a number. The
+# setters return whether the tag has been handled, or if it must also be set
+# as a string tag.
+_SPECIAL_TAG_SETTERS = {
+    MANUAL_KEEP_KEY: _set_manual_keep_tag,
+    MANUAL_DROP_KEY: _set_manual_drop_tag,
+    SERVICE_KEY: _set_service_tag,
+    SERVICE_VERSION_KEY: _set_service_version_tag,
+    SPAN_MEASURED_KEY: _set_measured_tag,
+}  # type: Dict[_TagNameType, Callable[[Span, _TagNameType, Any], bool]]
+_SPECIAL_TAG_SETTERS.update((key, _set_numeric_tag) for key in _NUMERIC_TAGS)
+
+# All the tags that need special handling, whatever their value
+_SPECIAL_TAGS = frozenset(_SPECIAL_TAG_SETTERS) | {http.STATUS_CODE} | _INT_TAGS
+
+
 def _is_top_level(span):
     # type: (Span) -> bool
     """Return whether the span is a "top level" span.
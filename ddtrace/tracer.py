@@ -46,6 +46,7 @@ from .internal.processor.trace import TraceTagsProcessor
 from .internal.processor.trace import TraceTopLevelSpanProcessor
 from .internal.runtime import get_runtime_id
 from .internal.service import ServiceStatusError
+from .internal.span_prototype import SpanPrototype
 from .internal.utils.formats import asbool
 from .internal.writer import AgentWriter
 from .internal.writer import LogWriter
@@ -176,6 +177,8 @@ class Tracer(object):
 
         # globally set tags
         self._tags = config.tags.copy()
+        # prototypes of the spans without and with the version tag
+        self._span_prototypes = [None, None]  # type: List[Optional[SpanPrototype]]
 
         # a buffer for service info so we don't perpetually send the same things
         self._services = set()  # type: Set[str]
@@ -392,6 +395,12 @@ class Tracer(object):
         if compute_stats_enabled is not None:
             self._compute_stats = compute_stats_enabled
 
+        # Hand the queued traces over to the current writer before stopping it.
+        # The processing queue restarts on the next trace if it is still used.
+        for processor in self._span_processors:
+            if isinstance(processor, SpanAggregator):
+                processor.stop_processing_queue()
+
         try:
             self._writer.stop()
         except ServiceStatusError:
@@ -662,16 +671,12 @@ class Tracer(object):
             span._set_str_tag("runtime-id", get_runtime_id())
             span._metrics[PID] = self._pid
 
-        # Apply default global tags.
-        if self._tags:
-            span.set_tags(self._tags)
-
-        if config.env:
-            span._set_str_tag(ENV_KEY, config.env)
-
         # Only set the version tag on internal spans.
+        version = None
         if config.version:
-            root_span = self.current_root_span()
+            # DEV: This is self.current_root_span(), inlined as it is on the hot path
+            active = self.context_provider.active()
+            root_span = active._local_root if isinstance(active, Span) else None
             # if: 1. the span is the root span and the span's service matches the global config; or
             #     2. the span is not the root, but the root span's service matches the span's service
             #        and the root span has a version tag
@@ -679,7 +684,11 @@ class Tracer(object):
             if (root_span is None and service == config.service) or (
                 root_span and root_span.service == service and root_span.get_tag(VERSION_KEY) is not None
             ):
-                span._set_str_tag(VERSION_KEY, config.version)
+                version = config.version
+
+        # Apply default global tags, the environment and the version. They are
+        # shared by the spans rather than copied to each of them.
+        self._get_span_prototype(version).share(span)
 
         if activate:
             self.context_provider.activate(span)
@@ -698,6 +707,25 @@ class Tracer(object):
 
     start_span = _start_span
 
+    def _get_span_prototype(self, version=None):
+        # type: (Optional[str]) -> SpanPrototype
+        """Return the prototype of the spans with the global tags, the environment and the given version.
+
+        The prototype is built again if any of them has changed since.
+        """
+        env = config.env
+        key = (env, version)
+        versioned = version is not None
+        prototype = self._span_prototypes[versioned]
+        if prototype is None or not prototype.matches(self._tags, key):
+            text_tags = {}
+            if env:
+                text_tags[ENV_KEY] = env
+            if version:
+                text_tags[VERSION_KEY] = version
+            prototype = self._span_prototypes[versioned] = SpanPrototype(self._tags, text_tags, key)
+        return prototype
+
     def _on_span_finish(self, span):
         # type: (Span) -> None
         active = self.current_span()
@@ -824,6 +852,9 @@ class Tracer(object):
 
     def flush(self):
         """Flush the buffer of the trace writer. This does nothing if an unbuffered trace writer is used."""
+        for processor in self._span_processors:
+            if isinstance(processor, SpanAggregator):
+                processor.flush_processing_queue()
         self._writer.flush_queue()
 
     def wrap(
@@ -13,3 +13,24 @@ def test_randbits_stdlib(benchmark):
     from ddtrace.internal.compat import getrandbits
 
     benchmark(getrandbits, 64)
+
+
+@pytest.mark.benchmark(group="span-id", min_time=0.005)
+def test_rand128bits(benchmark):
+    from ddtrace.internal import _rand
+
+    benchmark(_rand.rand128bits)
+
+
+@pytest.mark.benchmark(group="span-id-batch", min_time=0.005)
+def test_rand64bits_batch_of_100(benchmark):
+    from ddtrace.internal import _rand
+
+    benchmark(_rand.rand64bits_batch, 100)
+
+
+@pytest.mark.benchmark(group="span-id-batch", min_time=0.005)
+def test_rand64bits_100(benchmark):
+    from ddtrace.internal import _rand
+
+    benchmark(lambda: [_rand.rand64bits() for _ in range(100)])
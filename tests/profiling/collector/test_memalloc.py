@@ -334,6 +334,32 @@ def test_heap_stress():
     _memalloc.stop()
 
 
+def _allocate_many(n):
+    return [object() for _ in range(n)]
+
+
+def _count_heap_allocations(funcname):
+    return sum(1 for (stack, nframe, thread_id), size in _memalloc.heap() if stack[1][2] == funcname)
+
+
+def test_heap_untrack_many():
+    # Track enough allocations for the index of the tracked allocations to grow and to be rebuilt
+    _memalloc.start(8, 10, 16)
+    try:
+        kept = _allocate_many(20000)
+        freed = _allocate_many(20000)
+        nkept = _count_heap_allocations("_allocate_many")
+        assert nkept > 1000
+        del freed
+        gc.collect()
+        assert 0 < _count_heap_allocations("_allocate_many") < nkept
+        del kept
+        gc.collect()
+        assert _count_heap_allocations("_allocate_many") == 0
+    finally:
+        _memalloc.stop()
+
+
 @pytest.mark.parametrize("heap_sample_size", (0, 512 * 1024, 1024 * 1024, 2048 * 1024, 4096 * 1024))
 def test_memalloc_speed(benchmark, heap_sample_size):
     if heap_sample_size:
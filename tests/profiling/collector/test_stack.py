@@ -308,7 +308,7 @@ def test_exception_collection_threads():
     assert e.sampling_period > 0
     assert e.thread_id in {t.ident for t in threads}
     assert isinstance(e.thread_name, str)
-    assert e.frames == [("<string>", 5, "_f30")]
+    assert e.frames == (("<string>", 5, "_f30"),)
     assert e.nframes == 1
     assert e.exc_type == ValueError
     for t in threads:
@@ -332,7 +332,7 @@ def test_exception_collection():
     assert e.sampling_period > 0
     assert e.thread_id == nogevent.thread_get_ident()
     assert e.thread_name == "MainThread"
-    assert e.frames == [(__file__, 326, "test_exception_collection")]
+    assert e.frames == ((__file__, 326, "test_exception_collection"),)
     assert e.nframes == 1
     assert e.exc_type == ValueError
 
@@ -355,7 +355,7 @@ def test_exception_collection_trace(tracer):
     assert e.sampling_period > 0
     assert e.thread_id == nogevent.thread_get_ident()
     assert e.thread_name == "MainThread"
-    assert e.frames == [(__file__, 349, "test_exception_collection_trace")]
+    assert e.frames == ((__file__, 349, "test_exception_collection_trace"),)
     assert e.nframes == 1
     assert e.exc_type == ValueError
     assert e.span_id == span.span_id
@@ -19,7 +19,7 @@ def test_repr():
         collector_threading.ThreadingLockCollector,
         "ThreadingLockCollector(status=<ServiceStatus.STOPPED: 'stopped'>, "
         "recorder=Recorder(default_max_events=16384, max_events={}), capture_pct=1.0, nframes=64, "
-        "endpoint_collection_enabled=True, tracer=None)",
+        "endpoint_collection_enabled=True, sample_at_creation=False, tracer=None)",
     )
 
 
@@ -243,6 +243,35 @@ def test_lock_gevent_tasks():
         pytest.fail("Lock event not found")
 
 
+def test_lock_sample_at_creation():
+    r = recorder.Recorder()
+    with collector_threading.ThreadingLockCollector(r, capture_pct=50, sample_at_creation=True):
+        # Locks created in pairs, like two locks per object
+        locks = [(threading.Lock(), threading.Lock()) for _ in range(100)]
+        for pair in locks:
+            for lock in pair:
+                for _ in range(3):
+                    lock.acquire()
+                    lock.release()
+    # About half of the locks of each role are wrapped, and all of their events are captured
+    wrapped = [sum(isinstance(pair[i], collector_threading._ProfiledThreadingLock) for pair in locks) for i in (0, 1)]
+    assert all(20 <= n <= 80 for n in wrapped)
+    assert len(r.events[collector_threading.ThreadingLockAcquireEvent]) == 3 * sum(wrapped)
+    assert len(r.events[collector_threading.ThreadingLockReleaseEvent]) == 3 * sum(wrapped)
+    for event in r.events[collector_threading.ThreadingLockAcquireEvent]:
+        assert event.sampling_pct == 50
+
+
+def test_lock_sample_at_creation_not_sampled():
+    r = recorder.Recorder()
+    with collector_threading.ThreadingLockCollector(r, capture_pct=0, sample_at_creation=True):
+        lock = threading.Lock()
+        lock.acquire()
+        lock.release()
+    assert not isinstance(lock, collector_threading._ProfiledThreadingLock)
+    assert len(r.events[collector_threading.ThreadingLockAcquireEvent]) == 0
+
+
 @pytest.mark.benchmark(
     group="threading-lock-create",
 )
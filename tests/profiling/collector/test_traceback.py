@@ -22,3 +22,46 @@ def test_check_traceback_to_frames():
             "test_check_traceback_to_frames",
         ),
     ]
+
+
+def test_check_traceback_to_stack():
+    try:
+        _x()
+    except Exception:
+        exc_type, exc_value, traceback = sys.exc_info()
+    stack, same_stack = [_traceback.traceback_to_stack(traceback, 10) for _ in range(2)]
+    assert stack == same_stack
+    stack_id, frames, nframes = stack
+    assert nframes == 2
+    assert frames == (
+        (__file__, 7, "_x"),
+        (__file__, 32, "test_check_traceback_to_stack"),
+    )
+
+
+def test_frames_to_stack():
+    frames = [("foo.py", 1, "foo"), ("bar.py", 2, "bar")]
+    stack_id, interned_frames = _traceback.frames_to_stack(frames)
+    assert interned_frames == tuple(frames)
+    assert _traceback.frames_to_stack(list(frames)) == (stack_id, interned_frames)
+    assert _traceback.frames_to_stack(frames[:1])[0] != stack_id
+
+
+def _y():
+    return sys._getframe()
+
+
+def test_pyframe_to_stack():
+    frame = _y()
+    stack_id, frames, nframes = _traceback.pyframe_to_stack(frame, 1)
+    assert frames == ((__file__, 51, "_y"),)
+    assert nframes > 1
+
+    # The same frames are interned once
+    same_stack_id, same_frames, _ = _traceback.pyframe_to_stack(frame, 1)
+    assert same_stack_id == stack_id
+    assert same_frames is frames
+
+    other_stack_id, other_frames, _ = _traceback.pyframe_to_stack(frame, 2)
+    assert other_stack_id != stack_id
+    assert other_frames == ((__file__, 51, "_y"), (__file__, 65, "test_pyframe_to_stack"))
@@ -1,4 +1,5 @@
 import os
+import zlib
 
 import mock
 import six
@@ -705,3 +706,105 @@ def test_pprof_exporter_empty():
     exp = pprof.PprofExporter()
     export = exp.export({}, 0, 1)
     assert len(export.sample) == 0
+
+
+def test_pprof_exporter_group_stack_ids():
+    frames = (("foobar.py", 23, "func1"), ("foobar.py", 44, "func2"))
+    events = [
+        stack_event.StackSampleEvent(
+            thread_id=1,
+            thread_name="MainThread",
+            frames=frames,
+            nframes=2,
+            stack_id=stack_id,
+            cpu_time_ns=cpu_time_ns,
+            sampling_period=10,
+        )
+        for stack_id, cpu_time_ns in ((1, 10), (1, 20), (2, 40), (None, 80))
+    ]
+    # Another thread with the same stack
+    events.append(
+        stack_event.StackSampleEvent(
+            thread_id=2, frames=frames, nframes=2, stack_id=1, cpu_time_ns=160, sampling_period=10
+        )
+    )
+
+    exp = pprof.PprofExporter()
+    export = exp.export({stack_event.StackSampleEvent: events}, 0, 1)
+    assert len(export.sample) == 2
+    assert sorted(sample.value[1] for sample in export.sample) == [150, 160]
+    assert len(export.location) == 2
+
+
+def test_pprof_exporter_group_rounding():
+    # Buckets of events that end up in the same sample are rounded once summed
+    frames = (("foobar.py", 23, "func1"), ("foobar.py", 44, "func2"))
+    events = {
+        memalloc.MemoryAllocSampleEvent: [
+            memalloc.MemoryAllocSampleEvent(
+                thread_id=1, frames=frames, nframes=2, stack_id=stack_id, size=1, capture_pct=40, nevents=1
+            )
+            for stack_id in (1, 2)
+        ],
+        _lock.LockAcquireEvent: [
+            _lock.LockAcquireEvent(
+                lock_name="foobar.py:12",
+                thread_id=1,
+                frames=frames,
+                nframes=2,
+                trace_resource_container=[u"myresource"],
+                wait_time_ns=2,
+                sampling_pct=30,
+            )
+            for _ in range(2)
+        ],
+    }
+
+    exp = pprof.PprofExporter()
+    export = exp.export(events, 0, 1)
+    sample_types = [export.string_table[sample_type.type] for sample_type in export.sample_type]
+    values = [dict(zip(sample_types, sample.value)) for sample in export.sample]
+    assert len(values) == 2
+    assert sum(v["alloc-samples"] for v in values) == 1
+    assert sum(v["alloc-space"] for v in values) == 5
+    assert sum(v["lock-acquire"] for v in values) == 2
+    assert sum(v["lock-acquire-wait"] for v in values) == 13
+
+
+@mock.patch("ddtrace.internal.utils.config.get_application_name")
+def test_pprof_exporter_aggregate(gan):
+    gan.return_value = "bonjour"
+    exp = pprof.PprofExporter()
+    for event_class, events in TEST_EVENTS.items():
+        exp.aggregate({event_class: events[: len(events) // 2]})
+    exports = exp.export({event_class: events[len(events) // 2 :] for event_class, events in TEST_EVENTS.items()}, 1, 7)
+    assert exports == pprof.PprofExporter().export(TEST_EVENTS, 1, 7)
+    # Aggregated events are only exported once
+    assert len(exp.export({}, 1, 7).sample) == 0
+
+
+def test_pprof_exporter_serialize():
+    events = [
+        stack_event.StackSampleEvent(
+            thread_id=1,
+            frames=[("foobar%d.py" % i, i, "func%d" % i), ("main.py", 1, "main")],
+            nframes=3,
+            cpu_time_ns=i,
+            sampling_period=10,
+        )
+        for i in range(5000)
+    ]
+
+    exp = pprof.PprofExporter()
+    serialized = exp._serialize({stack_event.StackSampleEvent: events}, 1, 7)
+    compressed = exp._serialize({stack_event.StackSampleEvent: events}, 1, 7, compress=True)
+    # The compressed profile is larger than the buffer of the writer, so it is compressed in several chunks
+    assert len(serialized) > 64 * 1024
+    assert zlib.decompress(compressed, 31) == serialized
+
+    profile = pprof.pprof_pb2.Profile.FromString(serialized)
+    assert len(profile.sample) == 5000
+    assert len(profile.location) == 5002
+    assert profile.time_nanos == 1
+    assert profile.duration_nanos == 6
+    assert profile.period == 10
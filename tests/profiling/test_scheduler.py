@@ -1,6 +1,7 @@
 # -*- encoding: utf-8 -*-
 import logging
 
+from ddtrace.internal import compat
 from ddtrace.profiling import event
 from ddtrace.profiling import exporter
 from ddtrace.profiling import recorder
@@ -54,3 +55,50 @@ def test_before_flush_failure(caplog):
     assert caplog.record_tuples == [
         (("ddtrace.profiling.scheduler", logging.ERROR, "Scheduler before_flush hook failed"))
     ]
+
+
+class _AggregatingExporter(exporter.Exporter):
+    aggregates = True
+
+    def __init__(self):
+        self.aggregated = []
+        self.exported = []
+
+    def aggregate(self, events):
+        self.aggregated.append(events)
+
+    def export(self, events, start_time_ns, end_time_ns):
+        self.exported.append(events)
+
+
+def test_aggregate():
+    r = recorder.Recorder()
+    exp = _AggregatingExporter()
+    s = scheduler.Scheduler(r, [exp])
+    s._flush_at = compat.monotonic() + 60
+    r.push_events([event.Event()] * 10)
+    s.periodic()
+    assert len(exp.aggregated) == 1
+    assert len(exp.aggregated[0][event.Event]) == 10
+    assert exp.exported == []
+    assert 0 < s.interval <= s._aggregation_interval
+    assert len(r.events) == 0
+
+    s._flush_at = compat.monotonic()
+    r.push_events([event.Event()] * 5)
+    s.periodic()
+    assert len(exp.aggregated) == 1
+    assert len(exp.exported) == 1
+    assert len(exp.exported[0][event.Event]) == 5
+
+
+def test_no_aggregate():
+    r = recorder.Recorder()
+    exp = _AggregatingExporter()
+    s = scheduler.Scheduler(r, [exporter.NullExporter(), exp])
+    s._flush_at = compat.monotonic() + 60
+    r.push_events([event.Event()] * 10)
+    s.periodic()
+    assert exp.aggregated == []
+    assert len(exp.exported) == 1
+    assert s.interval > s._aggregation_interval
@@ -1,6 +1,13 @@
+import os
+import threading
+
+import mock
 import pytest
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
 
 from ddtrace.internal import agent
+from ddtrace.internal.compat import get_connection_response
 
 
 def test_trace_hostname(monkeypatch):
@@ -222,3 +229,139 @@ def test_verify_url():
     with pytest.raises(ValueError) as e:
         agent.verify_url("unix://")
     assert str(e.value) == "Invalid file path in Agent URL 'unix://'"
+
+
+class _KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    @staticmethod
+    def log_message(format, *args):  # noqa: A002
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def keep_alive_server():
+    server = _ThreadingHTTPServer(("localhost", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield "http://localhost:%d" % server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _put(conn):
+    conn.request("PUT", "/", b"data", {})
+    resp = get_connection_response(conn)
+    assert resp.read() == b"OK"
+
+
+def test_connection_pool_reuse(keep_alive_server):
+    pool = agent.ConnectionPool()
+
+    conn = pool.acquire(keep_alive_server)
+    _put(conn)
+    sock = conn.sock
+    pool.release(keep_alive_server, conn)
+
+    # The same connection, and the same socket, is handed out again
+    conn2 = pool.acquire(keep_alive_server)
+    assert conn2 is conn
+    _put(conn2)
+    assert conn2.sock is sock
+    pool.release(keep_alive_server, conn2)
+
+    pool.clear()
+    assert conn.sock is None
+
+
+def test_connection_pool_max_idle_connections(keep_alive_server):
+    pool = agent.ConnectionPool(max_idle_connections=1)
+
+    conns = [pool.acquire(keep_alive_server) for _ in range(2)]
+    for conn in conns:
+        _put(conn)
+        pool.release(keep_alive_server, conn)
+
+    # Only one connection is kept, the other one is closed
+    assert conns[0].sock is not None
+    assert conns[1].sock is None
+    assert pool.acquire(keep_alive_server) is conns[0]
+    pool.clear()
+
+
+def test_connection_pool_idle_timeout(keep_alive_server):
+    pool = agent.ConnectionPool(idle_timeout=10)
+
+    conn = pool.acquire(keep_alive_server)
+    _put(conn)
+    with mock.patch("ddtrace.internal.agent.monotonic", return_value=0):
+        pool.release(keep_alive_server, conn)
+
+    with mock.patch("ddtrace.internal.agent.monotonic", return_value=20):
+        conn2 = pool.acquire(keep_alive_server)
+
+    # The idle connection has expired and has been closed
+    assert conn2 is not conn
+    assert conn.sock is None
+    conn2.close()
+
+
+def test_connection_pool_stale_connection(keep_alive_server):
+    pool = agent.ConnectionPool()
+
+    conn = pool.acquire(keep_alive_server)
+    _put(conn)
+    pool.release(keep_alive_server, conn)
+
+    # Simulate the agent closing the connection on its side
+    with mock.patch("ddtrace.internal.agent._is_connection_stale", return_value=True):
+        conn2 = pool.acquire(keep_alive_server)
+
+    # The stale socket is closed and the connection reconnects on the next request
+    assert conn2 is conn
+    assert conn2.sock is None
+    _put(conn2)
+    conn2.close()
+
+
+def test_connection_pool_fork(keep_alive_server):
+    pool = agent.ConnectionPool()
+
+    conn = pool.acquire(keep_alive_server)
+    _put(conn)
+    pool.release(keep_alive_server, conn)
+
+    with mock.patch("os.getpid", return_value=os.getpid() + 1):
+        conn2 = pool.acquire(keep_alive_server)
+
+    # Connections inherited from the parent process are never reused
+    assert conn2 is not conn
+    assert conn.sock is not None
+    conn.close()
+    conn2.close()
+
+
+def test_pooled_connection_error(keep_alive_server):
+    with pytest.raises(RuntimeError):
+        with agent.pooled_connection(keep_alive_server) as conn:
+            _put(conn)
+            raise RuntimeError()
+
+    # The connection is not given back to the pool on errors
+    assert conn.sock is None
+    assert agent.get_connection_pool().acquire(keep_alive_server) is not conn
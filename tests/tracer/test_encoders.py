@@ -22,6 +22,9 @@ from ddtrace.internal._encoding import BufferFull
 from ddtrace.internal._encoding import BufferItemTooLarge
 from ddtrace.internal._encoding import ListStringTable
 from ddtrace.internal._encoding import MsgpackStringTable
+from ddtrace.internal._encoding import Packer
+from ddtrace.internal._encoding import pack_into
+from ddtrace.internal._encoding import packb
 from ddtrace.internal.compat import msgpack_type
 from ddtrace.internal.compat import string_type
 from ddtrace.internal.encoding import JSONEncoder
@@ -32,6 +35,7 @@ from ddtrace.internal.encoding import MsgpackEncoderV05
 from ddtrace.internal.encoding import _EncoderBase
 from ddtrace.span import Span
 from tests.utils import DummyTracer
+from tests.utils import override_global_config
 
 
 _ORIGIN_KEY = ORIGIN_KEY.encode()
@@ -354,6 +358,40 @@ def test_msgpack_span_property_variations(encoding, span):
     assert decode(refencoder.encode_traces([trace])) == decode(encoder.encode())
 
 
+@allencodings
+def test_custom_msgpack_encode_shared_tags(encoding):
+    encoder = MSGPACK_ENCODERS[encoding](1 << 20, 1 << 20)
+    refencoder = REF_MSGPACK_ENCODERS[encoding]()
+    tracer = DummyTracer()
+    tracer.set_tags({"a": "b", "n": 42})
+
+    with override_global_config(dict(env="prod")):
+        with tracer.trace("root"):
+            with tracer.trace("child") as child:
+                child.set_metric("a", 1)
+            with tracer.trace("child") as child:
+                child.set_tag("n", "m")
+            with tracer.trace("child"):
+                pass
+    trace = tracer._writer.pop()
+    assert all(span._shared_tags is not None for span in trace)
+
+    # The shared tags are packed once per payload
+    for _ in range(2):
+        encoder.put(trace)
+        encoder.put(trace)
+        assert decode(refencoder.encode_traces([trace, trace])) == decode(encoder.encode())
+
+    # The shared tags packed for a trace that does not fit are not reused
+    encoder = MSGPACK_ENCODERS[encoding](1 << 16, 1 << 12)
+    big = Span("big")
+    big.set_tag("big", "x" * (1 << 12))
+    with pytest.raises(BufferItemTooLarge):
+        encoder.put([trace[-1], big])
+    encoder.put(trace)
+    assert decode(refencoder.encode_traces([trace])) == decode(encoder.encode())
+
+
 class SubString(str):
     pass
 
@@ -510,6 +548,26 @@ def test_encoder_buffer_item_size_limit_v05():
         encoder.put([span] * (int(max_item_size / trace_size) + 2))
 
 
+def test_encoder_rollback_v05():
+    # A trace that does not fit must not leave the ids of its strings in
+    # the string table, as they are given to the strings of the next traces.
+    max_item_size = 1 << 10
+    encoder = MsgpackEncoderV05(max_item_size << 1, max_item_size)
+
+    encoder.put([Span(name="before", service="foo")])
+    with pytest.raises(BufferItemTooLarge):
+        encoder.put([Span(name="dropped", service="bar", resource="x" * max_item_size)])
+    encoder.put([Span(name="after", service="bar", resource="GET")])
+    assert len(encoder) == 2
+
+    st, ts = decode(encoder.flush(), reconstruct=False)
+    assert st == [b"", _ORIGIN_KEY, b"foo", b"before", b"bar", b"after", b"GET"]
+    assert [[[st[s[i]] for i in (0, 1, 2)] for s in t] for t in ts] == [
+        [[b"foo", b"before", b"before"]],
+        [[b"bar", b"after", b"GET"]],
+    ]
+
+
 def test_custom_msgpack_encode_v05():
     encoder = MsgpackEncoderV05(2 << 20, 2 << 20)
     assert encoder.max_size == 2 << 20
@@ -679,3 +737,79 @@ def test_json_encoder_traces_bytes():
         assert u"\ufffdspan.a" == span_a["name"], span_a["name"]
         assert u"\x80span.b" == span_b["name"]
         assert u"\ufffdspan.b" == span_c["name"]
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        None,
+        {u"key": [1, -1, 2 ** 64 - 1, 1.5, True, b"bytes", u"unicode"]},
+        [u"x" * 1024] * 1024,
+        {u"payload": b"x" * (4 << 20)},
+    ],
+)
+def test_packb(obj):
+    assert packb(obj) == msgpack.packb(obj, use_bin_type=True)
+    # The packer of the thread is reused
+    assert packb(obj) == msgpack.packb(obj, use_bin_type=True)
+
+
+def test_packb_threads():
+    results = []
+
+    def pack(i):
+        for _ in range(100):
+            results.append(msgpack.unpackb(packb({u"thread": [i] * i}), raw=False) == {u"thread": [i] * i})
+
+    threads = [threading.Thread(target=pack, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 800 and all(results)
+
+
+def test_packer_buffer_growth():
+    packer = Packer(buf_size=8, max_buf_size=64)
+    small = [1, 2, 3]
+    large = [u"x" * 16] * 16
+
+    assert packer.pack(small) == msgpack.packb(small)
+    # The buffer grows to fit the object, and is shrunk back afterwards
+    assert packer.pack(large) == msgpack.packb(large)
+    assert packer.pack(small) == msgpack.packb(small)
+
+    with pytest.raises(ValueError):
+        Packer(buf_size=0)
+
+
+@pytest.mark.parametrize("buffer_type", [bytearray, lambda size: memoryview(bytearray(size))])
+def test_pack_into(buffer_type):
+    obj = {u"key": [u"value"] * 100}
+    expected = msgpack.packb(obj)
+
+    buf = buffer_type(len(expected) + 10)
+    assert pack_into(obj, buf) == len(expected)
+    assert bytes(buf[: len(expected)]) == expected
+
+    assert Packer().pack_into(obj, buf, 10) == len(expected)
+    assert bytes(buf[10:]) == expected
+
+
+def test_pack_into_errors():
+    obj = [u"value"] * 100
+    buf = bytearray(10)
+
+    with pytest.raises(BufferFull):
+        pack_into(obj, buf)
+    assert buf == bytearray(10)
+
+    with pytest.raises(ValueError):
+        pack_into(obj, bytearray(1000), 1001)
+
+    with pytest.raises(BufferError):
+        pack_into(obj, b"read-only" * 100)
+
+    # The packer is still usable after a failure
+    assert packb(obj) == msgpack.packb(obj)
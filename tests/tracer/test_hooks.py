@@ -27,3 +27,20 @@ def test_deregister_unknown():
     hooks.deregister("key", test_deregister_unknown)
 
     hooks.emit("key")
+
+
+def test_has_hooks():
+    hooks = _hooks.Hooks()
+    assert not hooks.has_hooks()
+
+    def func():
+        pass
+
+    hooks.register("key", func)
+    hooks.register("other", func)
+    assert hooks.has_hooks()
+
+    hooks.deregister("key", func)
+    assert hooks.has_hooks()
+    hooks.deregister("other", func)
+    assert not hooks.has_hooks()
@@ -97,6 +97,24 @@ def test_periodic_error():
     assert "DOWN" not in x
 
 
+def test_periodic_awake():
+    x = {"count": 0}
+
+    thread_called = Event()
+
+    def _run_periodic():
+        x["count"] += 1
+        thread_called.set()
+
+    t = periodic.PeriodicRealThreadClass()(60, _run_periodic)
+    t.start()
+    t.awake()
+    thread_called.wait()
+    t.stop()
+    t.join()
+    assert x["count"] == 1
+
+
 def test_gevent_class():
     if os.getenv("DD_PROFILE_TEST_GEVENT", False):
         assert isinstance(periodic.PeriodicRealThreadClass()(1, sum), periodic._GeventPeriodicThread)
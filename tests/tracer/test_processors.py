@@ -1,16 +1,26 @@
+import threading
 from typing import Any
 
 import attr
+from ddsketch.pb.proto import DDSketchProto
 import mock
+import msgpack
 import pytest
 
 from ddtrace import Span
 from ddtrace import Tracer
+from ddtrace.internal._encoding import packb
 from ddtrace.internal.processor import SpanProcessor
+from ddtrace.internal.processor.stats import SpanAggrStats
+from ddtrace.internal.processor.stats import SpanStatsProcessorV06
+from ddtrace.internal.processor.stats import _serialize_sketch
 from ddtrace.internal.processor.trace import SpanAggregator
+from ddtrace.internal.processor.trace import TraceProcessingQueue
 from ddtrace.internal.processor.trace import TraceProcessor
 from ddtrace.internal.processor.trace import TraceTopLevelSpanProcessor
 from tests.utils import DummyWriter
+from tests.utils import override_env
+from tests.utils import override_global_config
 
 
 def test_no_impl():
@@ -225,6 +235,182 @@ def test_aggregator_partial_flush_2_spans():
     assert parent.get_metric("_dd.py.partial_flush") is None
 
 
+def test_aggregator_shards():
+    writer = DummyWriter()
+    aggr = SpanAggregator(
+        partial_flush_enabled=False, partial_flush_min_spans=0, trace_processors=[], writer=writer, num_shards=4
+    )
+
+    spans = [Span("span", trace_id=trace_id, on_finish=[aggr.on_span_finish]) for trace_id in range(1, 9)]
+    for span in spans:
+        aggr.on_span_start(span)
+
+    assert all(len(shard.traces) == 2 for shard in aggr._shards)
+
+    for span in spans:
+        span.finish()
+        assert writer.pop() == [span]
+
+    assert all(len(shard.traces) == 0 for shard in aggr._shards)
+
+
+def test_aggregator_shards_invalid():
+    with pytest.raises(ValueError):
+        SpanAggregator(
+            partial_flush_enabled=False,
+            partial_flush_min_spans=0,
+            trace_processors=[],
+            writer=DummyWriter(),
+            num_shards=0,
+        )
+
+
+def test_aggregator_write_outside_lock():
+    class Writer(DummyWriter):
+        def write(self, spans=None):
+            # The shard lock must not be held while writing the trace
+            assert not aggr._shard(spans[0].trace_id).lock.locked()
+            super(Writer, self).write(spans)
+
+    class Proc(TraceProcessor):
+        def process_trace(self, trace):
+            assert not aggr._shard(trace[0].trace_id).lock.locked()
+            return trace
+
+    writer = Writer()
+    aggr = SpanAggregator(
+        partial_flush_enabled=False, partial_flush_min_spans=0, trace_processors=[Proc()], writer=writer
+    )
+
+    span = Span("span", on_finish=[aggr.on_span_finish])
+    aggr.on_span_start(span)
+    span.finish()
+    assert writer.pop() == [span]
+
+
+def test_aggregator_multithreaded():
+    writer = DummyWriter()
+    aggr = SpanAggregator(partial_flush_enabled=False, partial_flush_min_spans=0, trace_processors=[], writer=writer)
+
+    def create_traces():
+        for _ in range(100):
+            parent = Span("parent", on_finish=[aggr.on_span_finish])
+            aggr.on_span_start(parent)
+            for _ in range(5):
+                child = Span(
+                    "child", trace_id=parent.trace_id, parent_id=parent.span_id, on_finish=[aggr.on_span_finish]
+                )
+                aggr.on_span_start(child)
+                child.finish()
+            parent.finish()
+
+    threads = [threading.Thread(target=create_traces) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(writer.pop_traces()) == 800
+    assert all(len(shard.traces) == 0 for shard in aggr._shards)
+
+
+def test_aggregator_processing_queue():
+    writer = DummyWriter()
+    processed = threading.Event()
+
+    class Proc(TraceProcessor):
+        def process_trace(self, trace):
+            assert threading.current_thread() is not threading.main_thread()
+            processed.set()
+            return trace
+
+    aggr = SpanAggregator(
+        partial_flush_enabled=False,
+        partial_flush_min_spans=0,
+        trace_processors=[Proc()],
+        writer=writer,
+        processing_queue_enabled=True,
+    )
+
+    span = Span("span", on_finish=[aggr.on_span_finish])
+    aggr.on_span_start(span)
+    span.finish()
+
+    assert processed.wait(5)
+    aggr.shutdown(timeout=5)
+    assert writer.pop() == [span]
+
+
+def test_aggregator_processing_queue_shutdown():
+    writer = DummyWriter()
+    aggr = SpanAggregator(
+        partial_flush_enabled=False,
+        partial_flush_min_spans=0,
+        trace_processors=[],
+        writer=writer,
+        processing_queue_enabled=True,
+    )
+
+    spans = [Span("span", on_finish=[aggr.on_span_finish]) for _ in range(10)]
+    for span in spans:
+        aggr.on_span_start(span)
+        span.finish()
+
+    # All the queued traces are written on shutdown
+    aggr.shutdown(timeout=5)
+    assert len(writer.pop_traces()) == 10
+
+
+@pytest.mark.parametrize(
+    "drop_policy,expected",
+    [
+        ("drop_newest", [1, 2]),
+        ("drop_oldest", [3, 4]),
+    ],
+)
+def test_processing_queue_drop_policy(drop_policy, expected):
+    writer = DummyWriter()
+    queue = TraceProcessingQueue(trace_processors=[], writer=writer, max_size=2, drop_policy=drop_policy)
+    spans = [Span("span", trace_id=i) for i in range(1, 5)]
+    # Do not start the background thread to keep the queue filled
+    with mock.patch.object(queue, "start"):
+        for span in spans:
+            queue.put([span])
+
+    assert queue.dropped == 2
+    queue.periodic()
+    assert [trace[0].trace_id for trace in writer.pop_traces()] == expected
+
+
+def test_processing_queue_invalid():
+    with pytest.raises(ValueError):
+        TraceProcessingQueue(trace_processors=[], writer=DummyWriter(), max_size=0)
+    with pytest.raises(ValueError):
+        TraceProcessingQueue(trace_processors=[], writer=DummyWriter(), drop_policy="block")
+
+
+def test_aggregator_processing_queue_env():
+    with override_env(
+        dict(
+            DD_TRACE_PROCESSING_QUEUE_ENABLED="true",
+            DD_TRACE_PROCESSING_QUEUE_SIZE="10",
+            DD_TRACE_PROCESSING_QUEUE_DROP_POLICY="drop_oldest",
+        )
+    ):
+        aggr = SpanAggregator(
+            partial_flush_enabled=False, partial_flush_min_spans=0, trace_processors=[], writer=DummyWriter()
+        )
+
+    assert aggr._processing_queue is not None
+    assert aggr._processing_queue._max_size == 10
+    assert aggr._processing_queue._drop_policy == "drop_oldest"
+
+    aggr = SpanAggregator(
+        partial_flush_enabled=False, partial_flush_min_spans=0, trace_processors=[], writer=DummyWriter()
+    )
+    assert aggr._processing_queue is None
+
+
 def test_trace_top_level_span_processor_partial_flushing():
     """Parent span and child span have the same service name"""
     tracer = Tracer()
@@ -305,3 +491,173 @@ def test_trace_top_level_span_processor_trace_return_val():
     trace = [Span("span1"), Span("span2"), Span("span3")]
     # Test return value contains all spans in the argument
     assert trace_processors.process_trace(trace[:]) == trace
+
+
+@pytest.fixture
+def stats_processor():
+    processor = SpanStatsProcessorV06("http://localhost:8126", interval=60.0, batch_size=4)
+    yield processor
+    processor.stop()
+    processor.join()
+
+
+def _collect_stats(processor):
+    payload = processor._serialize_buckets()
+    if payload is None:
+        return {}
+    return {
+        (stats["Name"], stats["Resource"]): stats
+        for bucket in msgpack.unpackb(payload, raw=False)["Stats"]
+        for stats in bucket["Stats"]
+    }
+
+
+def test_stats_processor_batches(stats_processor):
+    def create_spans():
+        for i in range(10):
+            span = Span("op", service="svc", resource="res-%d" % (i % 2))
+            span._local_root = span
+            span.error = i % 5 == 0
+            span.finish()
+            stats_processor.on_span_finish(span)
+
+    threads = [threading.Thread(target=create_spans) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Two full batches per thread have been handed over to the flush thread already
+    with stats_processor._lock:
+        stats_processor._aggregate_full_batches()
+        assert sum(stats.hits for bucket in stats_processor._buckets.values() for stats in bucket.values()) == 32
+
+    stats = _collect_stats(stats_processor)
+    assert stats.keys() == {("op", "res-0"), ("op", "res-1")}
+    for resource in ("res-0", "res-1"):
+        assert stats[("op", resource)]["Hits"] == 20
+        assert stats[("op", resource)]["TopLevelHits"] == 20
+        assert stats[("op", resource)]["Errors"] == 4
+
+    # The records of the threads that are gone are eventually unregistered
+    assert _collect_stats(stats_processor) == {}
+    assert stats_processor._all_records == []
+
+
+def test_stats_processor_reregister(stats_processor):
+    span = Span("op", service="svc")
+    span._local_root = span
+    span.finish()
+    stats_processor.on_span_finish(span)
+    assert _collect_stats(stats_processor)[("op", "op")]["Hits"] == 1
+
+    # The records of the thread are unregistered after an empty flush...
+    assert _collect_stats(stats_processor) == {}
+    assert stats_processor._all_records == []
+
+    # ...and registered again on the next span
+    stats_processor.on_span_finish(span)
+    assert _collect_stats(stats_processor)[("op", "op")]["Hits"] == 1
+
+
+def test_stats_processor_full_batch(stats_processor):
+    spans = [Span("op", service="svc", resource="res-%d" % (i % 2)) for i in range(5)]
+    for span in spans:
+        span._local_root = span
+        span.set_tag("http.status_code", "200")
+        span.finish()
+
+    # Full batches are aggregated by the flush thread
+    with mock.patch.object(stats_processor, "awake") as awake:
+        for span in spans:
+            stats_processor.on_span_finish(span)
+    awake.assert_called_once_with()
+    assert len(stats_processor._full_batches) == 1
+    keys, values = stats_processor._full_batches[0]
+    assert len(keys) == 2
+    assert len(values) == 4 * 4
+    assert stats_processor._buckets == {}
+
+    # The full batches are aggregated ahead of the next flush, without submitting the stats
+    with mock.patch.object(stats_processor, "_flush_stats") as flush_stats:
+        stats_processor.periodic()
+    flush_stats.assert_not_called()
+    assert len(stats_processor._full_batches) == 0
+    with stats_processor._lock:
+        assert sum(stats.hits for bucket in stats_processor._buckets.values() for stats in bucket.values()) == 4
+
+    stats = _collect_stats(stats_processor)
+    assert stats[("op", "res-0")]["Hits"] == 3
+    assert stats[("op", "res-1")]["Hits"] == 2
+    assert stats[("op", "res-0")]["HTTPStatusCode"] == 200
+
+
+def test_stats_processor_invalid_batch_size():
+    with pytest.raises(ValueError):
+        SpanStatsProcessorV06("http://localhost:8126", batch_size=0)
+
+
+@pytest.mark.parametrize("env,version", [(None, None), ("prod", "1.2.3")])
+def test_stats_processor_payload(stats_processor, env, version):
+    spans = [
+        Span("op", service="svc", resource="res", span_type="web"),
+        Span("op", service="svc", resource="res"),
+        Span("op", resource="res"),
+        Span(u"op\u00e9", service="svc", resource="r" * 100),
+    ]
+    spans[0].set_tag("http.status_code", 500)
+    spans[1].error = 1
+    for i, span in enumerate(spans):
+        span._local_root = span
+        span.start_ns = i * 10 ** 9
+        span.finish(i + 1.5)
+    stats_processor._bucket_size_ns = 2 * 10 ** 9
+    for span in spans * 3:
+        stats_processor.on_span_finish(span)
+
+    # The payload must be the same as a dictionary-based serialization of the buckets
+    with stats_processor._lock:
+        stats_processor._aggregate_all()
+        buckets = stats_processor._buckets
+        assert len(buckets) == 3
+        serialized_buckets = []
+        for bucket_time_ns, bucket in buckets.items():
+            serialized_stats = []
+            for (name, service, resource, _type, http_status, synthetics), stats in bucket.items():
+                serialized = {
+                    u"Name": name,
+                    u"Resource": resource,
+                    u"Synthetics": synthetics,
+                    u"HTTPStatusCode": http_status,
+                    u"Hits": stats.hits,
+                    u"TopLevelHits": stats.top_level_hits,
+                    u"Duration": stats.duration,
+                    u"Errors": stats.errors,
+                    u"OkSummary": _serialize_sketch(stats.ok_distribution),
+                    u"ErrorSummary": _serialize_sketch(stats.err_distribution),
+                }
+                if service:
+                    serialized[u"Service"] = service
+                if _type:
+                    serialized[u"Type"] = _type
+                serialized_stats.append(serialized)
+            serialized_buckets.append(
+                {u"Start": bucket_time_ns, u"Duration": stats_processor._bucket_size_ns, u"Stats": serialized_stats}
+            )
+        expected = {u"Stats": serialized_buckets, u"Hostname": stats_processor._hostname}
+        if env:
+            expected[u"Env"] = env
+        if version:
+            expected[u"Version"] = version
+
+    with override_global_config(dict(env=env, version=version)):
+        assert stats_processor._serialize_buckets() == packb(expected)
+    assert stats_processor._buckets == {}
+    assert stats_processor._serialize_buckets() is None
+
+
+def test_serialize_sketch():
+    sketch = SpanAggrStats().err_distribution
+    assert _serialize_sketch(sketch) == DDSketchProto.to_proto(sketch).SerializeToString()
+    sketch.add(42)
+    assert _serialize_sketch(sketch) == DDSketchProto.to_proto(sketch).SerializeToString()
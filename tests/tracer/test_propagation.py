@@ -4,6 +4,7 @@ import os
 
 import pytest
 
+from ddtrace import config
 from ddtrace.context import Context
 from ddtrace.internal.constants import PROPAGATION_STYLE_ALL
 from ddtrace.internal.constants import PROPAGATION_STYLE_B3
@@ -835,6 +836,7 @@ def test_propagation_inject(name, styles, context, expected_headers, run_python_
     code = """
 import json
 
+from ddtrace import config
 from ddtrace.context import Context
 from ddtrace.propagation.http import HTTPPropagator
 
@@ -867,3 +869,82 @@ print(json.dumps(headers))
         headers = {}
         HTTPPropagator.inject(ctx, headers)
         assert headers == expected_headers
+
+
+def test_propagation_styles_changed():
+    """The headers follow the propagation styles set after previous injections and extractions."""
+    ctx = Context(**VALID_DATADOG_CONTEXT)
+    b3_headers = {_HTTP_HEADER_B3_TRACE_ID: "b5a2814f70060771", _HTTP_HEADER_B3_SPAN_ID: "7197677932a62370"}
+    with override_global_config(
+        dict(
+            _propagation_style_inject={PROPAGATION_STYLE_DATADOG},
+            _propagation_style_extract={PROPAGATION_STYLE_DATADOG},
+        )
+    ):
+        headers = {}
+        HTTPPropagator.inject(ctx, headers)
+        assert _HTTP_HEADER_B3_TRACE_ID not in headers
+        assert HTTPPropagator.extract(b3_headers) == Context()
+
+        config._propagation_style_inject.add(PROPAGATION_STYLE_B3)
+        config._propagation_style_extract.add(PROPAGATION_STYLE_B3)
+
+        headers = {}
+        HTTPPropagator.inject(ctx, headers)
+        assert headers[_HTTP_HEADER_B3_TRACE_ID] == "b5a2814f70060771"
+        assert headers[HTTP_HEADER_TRACE_ID] == "13088165645273925489"
+        assert HTTPPropagator.extract(b3_headers) == Context(trace_id=13088165645273925489, span_id=8185124618007618416)
+
+
+@pytest.mark.parametrize("header_name", [str, str.upper, str.title, get_wsgi_header])
+def test_extract_header_names(header_name):
+    headers = {
+        "Content-Type": "text/plain",
+        header_name(HTTP_HEADER_TRACE_ID): "1234",
+        header_name(HTTP_HEADER_PARENT_ID): "5678",
+        header_name(HTTP_HEADER_ORIGIN): "synthetics",
+        header_name(_HTTP_HEADER_B3_SINGLE): "b5a2814f70060771-7197677932a62370-d",
+    }
+    with override_global_config(dict(_propagation_style_extract=PROPAGATION_STYLE_ALL)):
+        assert HTTPPropagator.extract(headers) == Context(trace_id=1234, span_id=5678, dd_origin="synthetics")
+    with override_global_config(dict(_propagation_style_extract={PROPAGATION_STYLE_B3_SINGLE_HEADER})):
+        assert HTTPPropagator.extract(headers) == Context(
+            trace_id=13088165645273925489, span_id=8185124618007618416, sampling_priority=2
+        )
+
+
+def test_extract_from_environ():
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "wsgi.input": object(),
+        get_wsgi_header(HTTP_HEADER_TRACE_ID): "1234",
+        get_wsgi_header(HTTP_HEADER_PARENT_ID): "5678",
+        get_wsgi_header(HTTP_HEADER_SAMPLING_PRIORITY): "1",
+        get_wsgi_header(_HTTP_HEADER_B3_SINGLE): "b5a2814f70060771-7197677932a62370-d",
+    }
+    assert HTTPPropagator._extract_from_environ(environ) == Context(trace_id=1234, span_id=5678, sampling_priority=1)
+    assert HTTPPropagator._extract_from_environ({"REQUEST_METHOD": "GET"}) == Context()
+    with override_global_config(dict(_propagation_style_extract={PROPAGATION_STYLE_B3_SINGLE_HEADER})):
+        assert HTTPPropagator._extract_from_environ(environ) == Context(
+            trace_id=13088165645273925489, span_id=8185124618007618416, sampling_priority=2
+        )
+
+
+@pytest.mark.parametrize("encode", [lambda s: s.encode(), str])
+def test_extract_from_asgi_headers(encode):
+    headers = [
+        (encode("content-type"), encode("text/plain")),
+        (encode(HTTP_HEADER_TRACE_ID), encode("1234")),
+        (encode(HTTP_HEADER_PARENT_ID), encode("5678")),
+        (encode(HTTP_HEADER_ORIGIN), encode("synthetics")),
+        (encode(_HTTP_HEADER_B3_TRACE_ID), encode("b5a2814f70060771")),
+        (encode(_HTTP_HEADER_B3_SPAN_ID), encode("7197677932a62370")),
+    ]
+    assert HTTPPropagator._extract_from_asgi_headers(headers) == Context(
+        trace_id=1234, span_id=5678, dd_origin="synthetics"
+    )
+    assert HTTPPropagator._extract_from_asgi_headers([]) == Context()
+    with override_global_config(dict(_propagation_style_extract={PROPAGATION_STYLE_B3})):
+        assert HTTPPropagator._extract_from_asgi_headers(headers) == Context(
+            trace_id=13088165645273925489, span_id=8185124618007618416
+        )
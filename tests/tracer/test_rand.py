@@ -9,6 +9,7 @@ except ImportError:
 
 import os
 import threading
+import time
 
 from ddtrace import Span
 from ddtrace import tracer
@@ -155,6 +156,41 @@ def test_threadsafe():
     assert len(ids) > 0
 
 
+def test_threads_states():
+    states = []
+
+    def _target():
+        states.append(_rand._getstate())
+        _rand.rand64bits()
+        # The state of the thread is not changed by the other threads
+        states.append(_rand._getstate())
+
+    ts = [threading.Thread(target=_target) for _ in range(10)]
+    for t in ts:
+        t.start()
+        t.join()
+
+    states.append(_rand._getstate())
+    assert len(set(states)) == len(states)
+
+
+def test_rand128bits():
+    now = int(time.time())
+    ids = [_rand.rand128bits() for _ in range(1000)]
+    assert len(set(ids)) == len(ids)
+    for n in ids:
+        assert 0 <= n < 2 ** 128
+        assert now <= n >> 96 <= now + 60
+        assert (n >> 64) & 0xFFFFFFFF == 0
+
+
+def test_rand64bits_batch():
+    assert _rand.rand64bits_batch(0) == []
+    ids = _rand.rand64bits_batch(1000) + [_rand.rand64bits() for _ in range(1000)] + _rand.rand64bits_batch(1000)
+    assert len(set(ids)) == len(ids) == 3000
+    assert all(0 <= n < 2 ** 64 for n in ids)
+
+
 def test_tracer_usage_fork():
     q = MPQueue()
     pid = os.fork()
@@ -1,5 +1,7 @@
 from __future__ import division
 
+import itertools
+import random
 import re
 import unittest
 
@@ -22,6 +24,7 @@ from ddtrace.sampler import DatadogSampler
 from ddtrace.sampler import RateByServiceSampler
 from ddtrace.sampler import RateSampler
 from ddtrace.sampler import SamplingRule
+from ddtrace.sampler import SamplingRuleMatcher
 from ddtrace.span import Span
 
 from ..utils import DummyTracer
@@ -585,6 +588,98 @@ def test_sampling_rule_matches_exception():
         )
 
 
+def test_sampling_rule_matcher_first_match():
+    rules = [
+        SamplingRule(sample_rate=0.1, service="svc", name="op"),
+        SamplingRule(sample_rate=0.2, service=re.compile("svc")),
+        SamplingRule(sample_rate=0.3, name="op"),
+        SamplingRule(sample_rate=0.4, service="other"),
+        SamplingRule(sample_rate=0.5, name=lambda name: name.startswith("web.")),
+        SamplingRule(sample_rate=0.6),
+        SamplingRule(sample_rate=0.7, service="late"),
+    ]
+    matcher = SamplingRuleMatcher(rules)
+
+    for service, name, expected in [
+        ("svc", "op", 0),
+        ("svc-2", "other", 1),
+        ("foo", "op", 2),
+        ("other", "op", 2),
+        ("other", "web.request", 3),
+        ("foo", "web.request", 4),
+        ("foo", "bar", 5),
+        ("late", "bar", 5),
+    ]:
+        # Check both the computed and the cached decisions
+        for _ in range(2):
+            assert matcher.match(create_span(service=service, name=name)) is rules[expected], (service, name)
+
+
+def test_sampling_rule_matcher_no_match():
+    rules = [SamplingRule(sample_rate=0.1, service="svc"), SamplingRule(sample_rate=0.2, name=re.compile("op"))]
+    matcher = SamplingRuleMatcher(rules)
+    assert matcher.match(create_span(service="foo", name="bar")) is None
+    assert SamplingRuleMatcher([]).match(create_span()) is None
+
+
+def test_sampling_rule_matcher_linear_scan():
+    services = ["svc-%d" % i for i in range(5)] + [None]
+    names = ["op-%d" % i for i in range(5)]
+    rules = [SamplingRule(sample_rate=0.5, service=s, name=n) for s, n in zip(services[::2], names[1::2])]
+    rules += [SamplingRule(sample_rate=0.5, service=s) for s in services[1::2]]
+    rules += [SamplingRule(sample_rate=0.5, name=re.compile(r"op-[03]"))]
+    rules += [SamplingRule(sample_rate=0.5, service=lambda s: s and s.endswith("4"))]
+    rules += [SamplingRule(sample_rate=0.5, name=n) for n in names]
+
+    # The matcher must agree with the first rule found by a linear scan for any
+    # ordering of the rules.
+    for _ in range(20):
+        random.shuffle(rules)
+        matcher = SamplingRuleMatcher(rules, cache_size=4)
+        for service, name in itertools.product(services, names + ["unknown"]):
+            span = create_span(service=service, name=name)
+            expected = next((r for r in rules if r.matches(span)), None)
+            assert matcher.match(span) is expected
+
+
+def test_sampling_rule_matcher_custom_matches():
+    rules = [SamplingRule(sample_rate=0.5, service="svc"), MatchSample(0.1), SamplingRule(sample_rate=0.3)]
+    matcher = SamplingRuleMatcher(rules)
+    assert matcher.match(create_span(service="svc")) is rules[0]
+    assert matcher.match(create_span(service="foo")) is rules[1]
+
+    rules = [NoMatch(0.1), SamplingRule(sample_rate=0.3)]
+    matcher = SamplingRuleMatcher(rules)
+    assert matcher.match(create_span(service="foo")) is rules[1]
+
+
+def test_datadog_sampler_rules_updated():
+    sampler = DatadogSampler(rules=[SamplingRule(sample_rate=0.5, service="svc")])
+    span = create_span(service="foo")
+    sampler.sample(span)
+    assert span.get_metric(SAMPLING_RULE_DECISION) is None
+
+    sampler.rules.append(SamplingRule(sample_rate=0.25))
+    sampler.sample(span)
+    assert span.get_metric(SAMPLING_RULE_DECISION) == 0.25
+
+    # A rule replaced in place is used right away
+    sampler.rules[0] = SamplingRule(sample_rate=0.75, service="foo")
+    span = create_span(service="foo")
+    sampler.sample(span)
+    assert span.get_metric(SAMPLING_RULE_DECISION) == 0.75
+
+    del sampler.rules[0]
+    span = create_span(service="foo")
+    sampler.sample(span)
+    assert span.get_metric(SAMPLING_RULE_DECISION) == 0.25
+
+    sampler.rules = [SamplingRule(sample_rate=0.5, service="foo")]
+    span = create_span(service="foo")
+    sampler.sample(span)
+    assert span.get_metric(SAMPLING_RULE_DECISION) == 0.5
+
+
 @pytest.mark.parametrize("sample_rate", [0.01, 0.1, 0.15, 0.25, 0.5, 0.75, 0.85, 0.9, 0.95, 0.991])
 def test_sampling_rule_sample(sample_rate):
     rule = SamplingRule(sample_rate=sample_rate)
@@ -2,21 +2,33 @@
 import re
 import sys
 import time
+import traceback
 from unittest.case import SkipTest
 
 import mock
 import pytest
 import six
 
+import ddtrace
 from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
 from ddtrace.constants import ENV_KEY
 from ddtrace.constants import ERROR_MSG
 from ddtrace.constants import ERROR_STACK
 from ddtrace.constants import ERROR_TYPE
+from ddtrace.constants import MANUAL_KEEP_KEY
+from ddtrace.constants import SERVICE_KEY
 from ddtrace.constants import SERVICE_VERSION_KEY
 from ddtrace.constants import SPAN_MEASURED_KEY
+from ddtrace.constants import USER_KEEP
 from ddtrace.constants import VERSION_KEY
 from ddtrace.ext import SpanTypes
+from ddtrace.ext import http
+from ddtrace.ext import net
+from ddtrace.internal.encoding import JSONEncoder
+from ddtrace.internal.encoding import MsgpackEncoderV03
+from ddtrace.internal.encoding import MsgpackEncoderV05
+from ddtrace.internal.rate_limiter import RateLimiter
+from ddtrace.internal.utils.cache import LRUCache
 from ddtrace.span import Span
 from tests.utils import TracerTestCase
 from tests.utils import assert_is_measured
@@ -94,6 +106,24 @@ class SpanTestCase(TracerTestCase):
         assert s.get_tags() == dict()
         assert s.get_metrics() == dict(test=1)
 
+        s.set_tag("test", "value")
+        assert s.get_tags() == dict(test="value")
+        assert s.get_metrics() == dict()
+
+    def test_set_tag_special_string_values(self):
+        s = Span(name="test.span")
+
+        s.set_tag(SERVICE_KEY, "new-service")
+        s.set_tag(http.STATUS_CODE, "200")
+        s.set_tag(net.TARGET_PORT, "8080")
+        s.set_tag(SPAN_MEASURED_KEY, "")
+        s.set_tag(MANUAL_KEEP_KEY, "")
+
+        assert s.service == "new-service"
+        assert s.get_tags() == {SERVICE_KEY: "new-service", http.STATUS_CODE: "200"}
+        assert s.get_metrics() == {net.TARGET_PORT: 8080, SPAN_MEASURED_KEY: 0}
+        assert s.context.sampling_priority == USER_KEEP
+
     def test_set_valid_metrics(self):
         s = Span(name="test.span")
         s.set_metric("a", 0)
@@ -627,3 +657,94 @@ def test_set_exc_info_with_unicode():
     if six.PY3:
         exception_span = get_exception_span(Exception("DataDog/水"))
         assert "DataDog/水" == exception_span.get_tag(ERROR_MSG)
+
+
+def _raise_error(value):
+    raise ValueError(value)
+
+
+def _exc_info_span(f, *args):
+    span = Span("span")
+    try:
+        f(*args)
+    except Exception:
+        exc_info = sys.exc_info()
+        span.set_exc_info(*exc_info)
+    return span, "".join(traceback.format_exception(*exc_info, limit=20))
+
+
+@pytest.mark.skipif(six.PY2, reason="Exception stacks are formatted eagerly on Python 2")
+def test_set_exc_info_deferred_stack():
+    with mock.patch.object(ddtrace.span, "_exc_stack_cache", LRUCache(16)):
+        span, expected = _exc_info_span(_raise_error, "first")
+        # The stack is formatted when needed
+        assert span._exc_stack is not None
+        assert span.get_tag(ERROR_STACK) == expected
+        assert span._exc_stack is None
+
+        # The stack of an exception raised from the same location is known
+        span, expected = _exc_info_span(_raise_error, "second")
+        assert span._exc_stack is None
+        assert span.get_tag(ERROR_STACK) == expected
+        assert expected.endswith("ValueError: second\n")
+
+
+@pytest.mark.skipif(six.PY2, reason="Exception stacks are formatted eagerly on Python 2")
+def test_set_exc_info_get_other_tag():
+    with mock.patch.object(ddtrace.span, "_exc_stack_cache", LRUCache(16)):
+        span, expected = _exc_info_span(_raise_error, "other tag")
+        span.set_tag("http.status_code", "500")
+        # Looking up other tags does not format the stack
+        assert span.get_tag("http.status_code") == "500"
+        assert span.get_tag(ERROR_MSG) == "other tag"
+        assert span._exc_stack is not None
+        assert span.get_tag(ERROR_STACK) == expected
+        assert span._exc_stack is None
+
+
+@pytest.mark.skipif(six.PY2, reason="Exception stacks are formatted eagerly on Python 2")
+def test_set_exc_info_chained_exception():
+    def raise_chained():
+        try:
+            _raise_error("cause")
+        except ValueError as e:
+            six.raise_from(RuntimeError("chained"), e)
+
+    span, expected = _exc_info_span(raise_chained)
+    assert "The above exception was the direct cause" in expected
+    assert span.get_tags()[ERROR_STACK] == expected
+
+
+@pytest.mark.skipif(six.PY2, reason="Exception stacks are formatted eagerly on Python 2")
+def test_set_exc_info_stack_budget():
+    with mock.patch.object(ddtrace.span, "_exc_stack_limiter", RateLimiter(0)):
+        span, _ = _exc_info_span(_raise_error, "over budget")
+        assert span.get_tag(ERROR_STACK) == "ValueError: over budget\n"
+
+
+@pytest.mark.skipif(six.PY2, reason="Exception stacks are formatted eagerly on Python 2")
+def test_set_exc_info_stack_overridden():
+    span, _ = _exc_info_span(_raise_error, "overridden")
+    span.set_tag(ERROR_STACK, "custom stack")
+    assert span.get_tag(ERROR_STACK) == "custom stack"
+
+    span, _ = _exc_info_span(_raise_error, "removed")
+    span._remove_exc_info()
+    assert span.get_tag(ERROR_STACK) is None
+    assert not span.error
+
+
+@pytest.mark.parametrize(
+    "encode",
+    [
+        lambda trace: JSONEncoder().encode_traces([trace]),
+        lambda trace: MsgpackEncoderV03(1 << 20, 1 << 20).put(trace),
+        lambda trace: MsgpackEncoderV05(1 << 20, 1 << 20).put(trace),
+    ],
+)
+def test_set_exc_info_encoded_stack(encode):
+    span, expected = _exc_info_span(_raise_error, "encoded")
+    span.finish()
+    encode([span])
+    assert span._exc_stack is None
+    assert span._meta[ERROR_STACK] == expected
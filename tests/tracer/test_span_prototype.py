@@ -0,0 +1,163 @@
+import pytest
+
+from ddtrace import Pin
+from ddtrace.constants import ENV_KEY
+from ddtrace.constants import MANUAL_KEEP_KEY
+from ddtrace.constants import SERVICE_KEY
+from ddtrace.constants import SERVICE_VERSION_KEY
+from ddtrace.constants import USER_KEEP
+from ddtrace.constants import VERSION_KEY
+from ddtrace.internal.span_prototype import SpanPrototype
+from ddtrace.span import Span
+from tests.utils import DummyTracer
+from tests.utils import override_global_config
+
+
+def _span():
+    span = Span("span")
+    span.set_tag("str_then_int", "value")
+    span.set_metric("int_then_str", 1)
+    span.set_tag("untouched", "value")
+    return span
+
+
+_TAGS = [
+    {},
+    {"str": "value", "int": 42, "float": 1.5, "bool": True, "none": None, "big": 2 ** 60},
+    {"str_then_int": 2, "int_then_str": "2"},
+    {"str": "value", SERVICE_KEY: "service", SERVICE_VERSION_KEY: "1.0", VERSION_KEY: "2.0"},
+    {"str": "value", MANUAL_KEEP_KEY: None},
+]
+
+
+@pytest.mark.parametrize("tags", _TAGS)
+def test_span_prototype_apply(tags):
+    expected = _span()
+    expected.set_tags(tags)
+    expected._set_str_tag(ENV_KEY, "prod")
+
+    span = _span()
+    SpanPrototype(tags, {ENV_KEY: "prod"}).apply(span)
+
+    assert span.get_tags() == expected.get_tags()
+    assert span.get_metrics() == expected.get_metrics()
+    assert span.service == expected.service
+    assert span.context.sampling_priority == expected.context.sampling_priority
+
+
+@pytest.mark.parametrize("tags", _TAGS)
+def test_span_prototype_share(tags):
+    expected = Span("span")
+    SpanPrototype(tags, {ENV_KEY: "prod"}).apply(expected)
+
+    span = Span("span")
+    SpanPrototype(tags, {ENV_KEY: "prod"}).share(span)
+
+    for s in (expected, span):
+        s.set_tag("str", 1)
+        s.set_tag("int", "value")
+        s.set_tag("other", "value")
+
+    assert span.get_tags() == expected.get_tags()
+    assert span.get_metrics() == expected.get_metrics()
+    for key in list(tags) + [ENV_KEY, "other"]:
+        assert span.get_tag(key) == expected.get_tag(key)
+        assert span.get_metric(key) == expected.get_metric(key)
+    assert span.service == expected.service
+    assert span.context.sampling_priority == expected.context.sampling_priority
+
+
+def test_span_shared_tags_are_not_copied():
+    prototype = SpanPrototype({"a": "b", "n": 1}, {ENV_KEY: "prod"})
+    span = Span("span")
+    prototype.share(span)
+    assert span._meta == {}
+    assert span._metrics == {}
+    assert span.get_tags() == {"a": "b", ENV_KEY: "prod"}
+    assert span.get_metrics() == {"n": 1}
+
+    span._remove_tag("a")
+    assert span._shared_tags is None
+    assert span.get_tags() == {ENV_KEY: "prod"}
+    assert span.get_metrics() == {"n": 1}
+    assert prototype.meta == {"a": "b", ENV_KEY: "prod"}
+
+    span = Span("span")
+    prototype.share(span)
+    SpanPrototype({"c": "d"}).share(span)
+    assert span.get_tags() == {"a": "b", "c": "d", ENV_KEY: "prod"}
+    assert span.get_metrics() == {"n": 1}
+
+
+def test_span_prototype_special_tags():
+    span = Span("span")
+    SpanPrototype({MANUAL_KEEP_KEY: None, SERVICE_KEY: "service"}).apply(span)
+    assert span.context.sampling_priority == USER_KEEP
+    assert span.service == "service"
+
+
+def test_span_prototype_matches():
+    tags = {"a": "b"}
+    prototype = SpanPrototype(tags, key="key")
+    assert prototype.matches(tags, "key")
+    assert prototype.matches({"a": "b"}, "key")
+    assert not prototype.matches(tags, "other")
+    assert not prototype.matches({"a": "c"}, "key")
+
+    tags["a"] = "c"
+    assert not prototype.matches(tags, "key")
+
+    assert SpanPrototype().matches(None)
+    assert SpanPrototype().matches({})
+    assert not SpanPrototype().matches(tags)
+
+
+def test_pin_span_prototype():
+    pin = Pin(tags={"a": "b"})
+    prototype = pin._get_span_prototype()
+    assert pin._get_span_prototype() is prototype
+
+    pin.tags["a"] = "c"
+    span = Span("span")
+    pin._get_span_prototype().apply(span)
+    assert span.get_tag("a") == "c"
+    assert pin._get_span_prototype() is not prototype
+
+    span = Span("span")
+    Pin()._get_span_prototype().apply(span)
+    assert span.get_tags() == {}
+
+
+def test_tracer_span_prototype():
+    tracer = DummyTracer()
+    tracer.set_tags({"a": "b"})
+    with override_global_config(dict(env="prod")):
+        with tracer.trace("span") as span:
+            assert span.get_tag("a") == "b"
+            assert span.get_tag(ENV_KEY) == "prod"
+            assert span._shared_tags is tracer._get_span_prototype()
+
+        tracer.set_tags({"a": "c"})
+        with tracer.trace("span") as span:
+            assert span.get_tag("a") == "c"
+
+    with override_global_config(dict(env="staging")):
+        with tracer.trace("span") as span:
+            assert span.get_tag(ENV_KEY) == "staging"
+
+    with override_global_config(dict(env=None)):
+        with tracer.trace("span") as span:
+            assert span.get_tag(ENV_KEY) is None
+
+
+def test_tracer_span_prototype_version():
+    tracer = DummyTracer()
+    with override_global_config(dict(env="prod", service="svc", version="1.0")):
+        with tracer.trace("root", service="svc") as root:
+            with tracer.trace("child", service="other") as child:
+                pass
+    assert root.get_tag(VERSION_KEY) == "1.0"
+    assert root.get_tag(ENV_KEY) == "prod"
+    assert child.get_tag(VERSION_KEY) is None
+    assert child.get_tag(ENV_KEY) == "prod"
+    assert root._shared_tags is not child._shared_tags
@@ -446,6 +446,38 @@ def test_set_http_meta_no_headers(mock_store_headers, span, int_config):
     mock_store_headers.assert_not_called()
 
 
+def test_set_http_meta_traced_headers_changed(tracer, int_config):
+    headers = [("Content-Type", "text/plain"), ("X-Request-Id", "1234")]
+    int_config.myint.http.trace_headers(["content-type"])
+    for _ in range(2):
+        with tracer.trace("request") as span:
+            trace_utils.set_http_meta(span, int_config.myint, request_headers=headers, response_headers=dict(headers))
+        assert span.get_tag("http.request.headers.content-type") == "text/plain"
+        assert span.get_tag("http.response.headers.content-type") == "text/plain"
+        assert span.get_tag("http.request.headers.x-request-id") is None
+
+    int_config.http.trace_headers(["x-request-id"])
+    with tracer.trace("request") as span:
+        trace_utils.set_http_meta(span, int_config.myint, request_headers=headers)
+    assert span.get_tag("http.request.headers.content-type") == "text/plain"
+    assert span.get_tag("http.request.headers.x-request-id") == "1234"
+
+
+def test_set_http_meta_traced_header_tag_renamed(tracer, int_config):
+    headers = {"Content-Type": "text/plain"}
+    int_config.myint.http.trace_headers(["content-type"])
+    with tracer.trace("request") as span:
+        trace_utils.set_http_meta(span, int_config.myint, request_headers=headers)
+    assert span.get_tag("http.request.headers.content-type") == "text/plain"
+
+    # The number of traced headers does not change, only their tag name
+    int_config.myint.http._header_tags["content-type"] = "content_type"
+    with tracer.trace("request") as span:
+        trace_utils.set_http_meta(span, int_config.myint, request_headers=headers)
+    assert span.get_tag("http.request.headers.content-type") is None
+    assert span.get_tag("content_type") == "text/plain"
+
+
 @mock.patch("ddtrace.contrib.trace_utils.log")
 @pytest.mark.parametrize(
     "val, bad",
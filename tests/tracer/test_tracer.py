@@ -1600,6 +1600,49 @@ def test_closing_other_context_spans_multi_spans(tracer, test_spans):
     assert len(spans) == 2
 
 
+def test_closing_other_context_spans_nested_spans(tracer, test_spans):
+    """
+    Ensure that the active span skips all the ancestors finished in another
+    thread.
+    """
+
+    def _target(spans):
+        for span in reversed(spans):
+            span.finish()
+
+    root = tracer.trace("root span")
+    spans = [tracer.trace("child span %d" % i) for i in range(5)]
+    assert tracer.current_span() is spans[-1]
+    t1 = threading.Thread(target=_target, args=(spans[1:],))
+    t1.start()
+    t1.join()
+    assert tracer.current_span() is spans[0]
+    assert tracer.current_root_span() is root
+    spans[0].finish()
+    assert tracer.current_span() is root
+    root.finish()
+    assert tracer.current_span() is None
+
+    spans = test_spans.pop()
+    assert len(spans) == 6
+
+
+def test_on_activate_hooks(tracer):
+    activated = []
+    tracer.context_provider._on_activate(activated.append)
+    try:
+        with tracer.trace("root") as root:
+            with tracer.trace("child") as child:
+                pass
+    finally:
+        tracer.context_provider._deregister_on_activate(activated.append)
+    assert activated == [root, child, root, None]
+
+    with tracer.trace("root"):
+        pass
+    assert activated == [root, child, root, None]
+
+
 def test_fork_manual_span_same_context(tracer):
     span = tracer.trace("test")
     pid = os.fork()
@@ -9,6 +9,9 @@ import pytest
 from ddtrace.internal.utils import ArgumentError
 from ddtrace.internal.utils import get_argument_value
 from ddtrace.internal.utils import time
+from ddtrace.internal.utils.cache import CacheInfo
+from ddtrace.internal.utils.cache import LFUCache
+from ddtrace.internal.utils.cache import LRUCache
 from ddtrace.internal.utils.cache import cached
 from ddtrace.internal.utils.cache import cachedmethod
 from ddtrace.internal.utils.formats import asbool
@@ -293,17 +296,23 @@ def cached_test_recipe(expensive, cheap, witness, cache_size):
 
     assert witness.call_count == 1 + cache_size
 
-    MAX_FOO = "Foo%d" % (cache_size - 1)
+    LEAST_FOO = "Foo%d" % (cache_size >> 1)
 
-    cheap("last drop")  # Forces least frequent elements out of the cache
+    cheap("last drop")  # Forces the oldest of the least frequent elements out of the cache
     assert witness.call_count == 2 + cache_size
 
-    cheap(MAX_FOO)  # Check MAX_FOO was dropped
+    cheap(LEAST_FOO)  # Check LEAST_FOO was dropped
     assert witness.call_count == 3 + cache_size
 
+    cheap("Foo0")  # Check the most frequent elements were retained
     cheap("last drop")  # Check last drop was retained
     assert witness.call_count == 3 + cache_size
 
+    info = cheap.cache_info()
+    assert info.misses == witness.call_count
+    assert info.evictions == 2
+    assert info.currsize == info.maxsize == cache_size
+
 
 def test_cached():
     witness = mock.Mock()
@@ -336,6 +345,59 @@ def test_cachedmethod():
     cached_test_recipe(expensive, Foo().cheap, witness, cache_size)
 
 
+def test_lru_cache():
+    cache = LRUCache(4)
+    for i in range(4):
+        cache.set(i, str(i))
+    assert len(cache) == 4
+
+    # Keys that have been used since the last eviction are kept
+    assert cache.get(0) == "0"
+    assert cache.get(2) == "2"
+    cache.set(4, "4")
+    cache.set(5, "5")
+
+    assert len(cache) == 4
+    assert 1 not in cache and 3 not in cache
+    assert [cache.get(i) for i in (0, 2, 4, 5)] == ["0", "2", "4", "5"]
+    assert cache.get(1, "missing") == "missing"
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get(0) is None
+
+
+def test_lfu_cache():
+    cache = LFUCache(4)
+    for i in range(4):
+        cache.set(i, str(i))
+
+    # Key 0 is used more often than key 1, which is used more than the others
+    for _ in range(3):
+        cache.get(0)
+    cache.get(1)
+
+    # The unused keys go first, then key 1 once its single use has been
+    # accounted for by the first sweep of the ring
+    cache.set(4, "4")
+    cache.set(5, "5")
+    assert 0 in cache and 1 in cache
+    assert 2 not in cache and 3 not in cache
+
+    cache.set(6, "6")
+    assert 0 in cache and 4 in cache and 5 in cache
+    assert 1 not in cache
+
+    assert cache.info() == CacheInfo(hits=4, misses=0, evictions=3, maxsize=4, currsize=4)
+    assert cache.get(2) is None
+    assert cache.info().misses == 1
+
+
+def test_lru_cache_invalid_size():
+    with pytest.raises(ValueError):
+        LRUCache(0)
+
+
 @pytest.mark.parametrize(
     "version_str,expected",
     [
@@ -3,6 +3,7 @@ import socket
 import tempfile
 import threading
 import time
+import zlib
 
 import mock
 import msgpack
@@ -11,6 +12,7 @@ from six.moves import BaseHTTPServer
 from six.moves import socketserver
 
 from ddtrace.constants import KEEP_SPANS_RATE_KEY
+from ddtrace.internal import agent
 from ddtrace.internal.compat import PY3
 from ddtrace.internal.compat import get_connection_response
 from ddtrace.internal.compat import httplib
@@ -284,6 +286,146 @@ class AgentWriterTests(BaseTestCase):
         for trace in payload:
             assert 0.6 == trace[0]["metrics"].get(KEEP_SPANS_RATE_KEY, -1)
 
+    def test_buffer_count(self):
+        writer_put = mock.Mock()
+        writer_put.return_value = Response(status=200)
+        writer = AgentWriter(agent_url="http://asdf:1234", buffer_count=2)
+        writer._put = writer_put
+
+        first_encoder = writer._encoder
+        assert len(writer._spare_encoders) == 1
+
+        writer.write([Span(name="name", trace_id=1, span_id=1)])
+        writer.flush_queue()
+
+        # The active buffer has been swapped and the old one put back in the ring
+        assert writer._encoder is not first_encoder
+        assert list(writer._spare_encoders) == [first_encoder]
+        assert 1 == len(msgpack.unpackb(writer_put.call_args.args[0]))
+
+        writer.write([Span(name="name", trace_id=2, span_id=1)])
+        writer.write([Span(name="name", trace_id=3, span_id=1)])
+        writer.flush_queue()
+
+        assert writer._encoder is first_encoder
+        assert 2 == len(msgpack.unpackb(writer_put.call_args.args[0]))
+
+    def test_buffer_count_late_write(self):
+        writer_put = mock.Mock()
+        writer_put.return_value = Response(status=200)
+        writer = AgentWriter(agent_url="http://asdf:1234", buffer_count=2)
+        writer._put = writer_put
+
+        writer.write([Span(name="name", trace_id=1, span_id=1)])
+        writer.flush_queue()
+        assert writer_put.call_count == 1
+
+        # Simulate a write that lands in the old buffer right after the swap
+        writer._spare_encoders[0].put([Span(name="name", trace_id=2, span_id=1)])
+        writer.flush_queue()
+        assert writer_put.call_count == 1
+
+        # The trace is sent when the buffer comes around the ring again
+        writer.flush_queue()
+        assert writer_put.call_count == 2
+        assert 1 == len(msgpack.unpackb(writer_put.call_args.args[0]))
+
+    def test_buffer_count_shutdown(self):
+        writer_put = mock.Mock()
+        writer_put.return_value = Response(status=200)
+        writer = AgentWriter(agent_url="http://asdf:1234", buffer_count=2)
+        writer._put = writer_put
+
+        writer.write([Span(name="name", trace_id=1, span_id=1)])
+        writer._spare_encoders[0].put([Span(name="name", trace_id=2, span_id=1)])
+        writer.stop()
+        writer.join()
+
+        # All the buffers are flushed on shutdown
+        assert writer_put.call_count == 2
+
+    def test_buffer_flush_threshold(self):
+        flushed = threading.Event()
+
+        def _put(*args):
+            flushed.set()
+            return Response(status=200)
+
+        writer = AgentWriter(
+            agent_url="http://asdf:1234", buffer_size=5300, buffer_flush_threshold=0.5, processing_interval=60
+        )
+        writer._put = _put
+        writer._metrics_reset = mock.Mock()
+        for i in range(10):
+            writer.write([Span(name="name", trace_id=i, span_id=j, parent_id=j - 1 or None) for j in range(5)])
+
+        # The buffer is flushed well before the end of the processing interval
+        assert flushed.wait(5)
+        writer.stop()
+        writer.join()
+
+        assert writer._metrics["buffer.flush.early"]["count"] >= 1
+        assert "reason:threshold" in writer._metrics["buffer.flush.early"]["tags"]
+        assert 0 == writer._metrics["buffer.dropped.traces"]["count"]
+
+    def test_buffer_flush_threshold_invalid(self):
+        for threshold in (0, -0.5, 1.5):
+            with pytest.raises(ValueError):
+                AgentWriter(agent_url="http://asdf:1234", buffer_flush_threshold=threshold)
+
+    def test_buffer_count_invalid(self):
+        with pytest.raises(ValueError):
+            AgentWriter(agent_url="http://asdf:1234", buffer_count=0)
+
+    def test_compression_gzip(self):
+        writer_put = mock.Mock()
+        writer_put.return_value = Response(status=200)
+        writer = AgentWriter(agent_url="http://asdf:1234", compression="gzip", compression_min_size=0)
+        writer._put = writer_put
+        writer._metrics_reset = mock.Mock()
+        for i in range(10):
+            writer.write([Span(name="name", trace_id=i, span_id=j, parent_id=j - 1 or None) for j in range(5)])
+        writer.flush_queue()
+
+        writer_put.assert_called_once()
+        payload, headers = writer_put.call_args.args
+        assert "gzip" == headers["Content-Encoding"]
+        assert 10 == len(msgpack.unpackb(zlib.decompress(payload, 16 + zlib.MAX_WBITS)))
+        assert writer._metrics["http.compressed.bytes"]["count"] > 0
+
+    def test_compression_below_min_size(self):
+        writer_put = mock.Mock()
+        writer_put.return_value = Response(status=200)
+        writer = AgentWriter(agent_url="http://asdf:1234", compression="gzip", compression_min_size=1 << 20)
+        writer._put = writer_put
+        writer.write([Span(name="name", trace_id=1, span_id=1, parent_id=None)])
+        writer.flush_queue()
+
+        writer_put.assert_called_once()
+        payload, headers = writer_put.call_args.args
+        assert "Content-Encoding" not in headers
+        assert 1 == len(msgpack.unpackb(payload))
+
+    def test_compression_env(self):
+        with override_env(dict(DD_TRACE_WRITER_COMPRESSION="gzip", DD_TRACE_WRITER_COMPRESSION_MIN_SIZE_BYTES="1024")):
+            writer = AgentWriter(agent_url="http://asdf:1234")
+        assert "gzip" == writer._compression
+        assert 1024 == writer._compression_min_size
+        writer = writer.recreate()
+        assert "gzip" == writer._compression
+        assert 1024 == writer._compression_min_size
+
+    def test_compression_invalid(self):
+        with pytest.raises(ValueError):
+            AgentWriter(agent_url="http://asdf:1234", compression="brotli")
+        with pytest.raises(ValueError):
+            AgentWriter(agent_url="http://asdf:1234", compression="gzip", compression_min_size=-1)
+
+    def test_compression_zstd_unavailable(self):
+        with mock.patch("ddtrace.internal.writer.zstandard", None):
+            writer = AgentWriter(agent_url="http://asdf:1234", compression="zstd")
+        assert writer._compression is None
+
 
 class LogWriterTests(BaseTestCase):
     N_TRACES = 11
@@ -562,22 +704,23 @@ def test_writer_reuse_connections_envvar(monkeypatch):
     assert writer._reuse_connections
 
 
-def test_writer_reuse_connections():
-    # Ensure connection is not reused
-    writer = AgentWriter(agent_url="http://localhost:9126", reuse_connections=True)
-    # Do an initial flush to get a connection
-    writer.flush_queue()
-    assert writer._conn is None
-    writer.flush_queue()
-    assert writer._conn is None
-
-
-def test_writer_reuse_connections_false():
-    # Ensure connection is reused
-    writer = AgentWriter(agent_url="http://localhost:9126", reuse_connections=False)
-    # Do an initial flush to get a connection
-    writer.flush_queue()
-    conn = writer._conn
-    # And another to potentially have it reset
-    writer.flush_queue()
-    assert writer._conn is conn
+@pytest.mark.parametrize("reuse_connections", [True, False])
+def test_writer_reuse_connections(reuse_connections):
+    conn = mock.Mock(sock=None)
+    conn.getresponse.return_value.status = 200
+    conn.getresponse.return_value.read.return_value = b"{}"
+    writer = AgentWriter(agent_url="http://localhost:9126", reuse_connections=reuse_connections)
+
+    with mock.patch("ddtrace.internal.agent.get_connection", return_value=conn) as get_connection:
+        for _ in range(2):
+            writer.write([Span("foobar")])
+            writer.flush_queue(raise_exc=True)
+
+    if reuse_connections:
+        # The connection is taken back from the pool on the second flush
+        get_connection.assert_called_once()
+        conn.close.assert_not_called()
+    else:
+        assert get_connection.call_count == 2
+        assert conn.close.call_count == 2
+    agent.get_connection_pool().clear()
@@ -603,7 +603,7 @@ class TestSpan(Span):
             return self.get_tags() == meta
 
         for key, value in meta.items():
-            if key not in self._meta:
+            if key not in self.get_tags():
                 return False
             if self.get_tag(key) != value:
                 return False
@@ -653,7 +653,7 @@ class TestSpan(Span):
             assert self.get_tags() == meta
         else:
             for key, value in meta.items():
-                assert key in self._meta, "{0} meta does not have property {1!r}".format(self, key)
+                assert key in self.get_tags(), "{0} meta does not have property {1!r}".format(self, key)
                 assert self.get_tag(key) == value, "{0} meta property {1!r}: {2!r} != {3!r}".format(
                     self, key, self.get_tag(key), value
                 )
@@ -674,12 +674,12 @@ class TestSpan(Span):
         :raises: AssertionError
         """
         if exact:
-            assert self._metrics == metrics
+            assert self.get_metrics() == metrics
         else:
             for key, value in metrics.items():
-                assert key in self._metrics, "{0} metrics does not have property {1!r}".format(self, key)
-                assert self._metrics[key] == value, "{0} metrics property {1!r}: {2!r} != {3!r}".format(
-                    self, key, self._metrics[key], value
+                assert key in self.get_metrics(), "{0} metrics does not have property {1!r}".format(self, key)
+                assert self.get_metric(key) == value, "{0} metrics property {1!r}: {2!r} != {3!r}".format(
+                    self, key, self.get_metric(key), value
                 )
 
 